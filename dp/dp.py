@@ -1,21 +1,91 @@
 import click
-from flinkop.flinkop import flinkop
-from redpanda_helm.redpanda import redpanda
-from scylladb.scylladb import scylladb
-from sparkop.sparkop import sparkop
-from miniop.miniop import miniop
-from strimzi_kafka.kafkaop import kafkaop
-from os import path
+import os
+import sys
+import utils.tracing as tracing
+from functools import partial
+from typing import TYPE_CHECKING
+from utils.lazy_group import LazyGroup
 
-@click.group()
-def dp():
-    pass
+if TYPE_CHECKING:
+    # never executed, the imports let PyInstaller find the modules loaded by LazyGroup
+    import flinkop.flinkop
+    import redpanda_helm.redpanda
+    import scylladb.scylladb
+    import sparkop.sparkop
+    import miniop.miniop
+    import strimzi_kafka.kafkaop
+    import platform_stack.platform
+    import platform_stack.status
+
+# every component module is imported only when its subcommand runs
+SUBCOMMANDS = {
+    'flinkop': 'flinkop.flinkop.flinkop',
+    'redpanda': 'redpanda_helm.redpanda.redpanda',
+    'scylladb': 'scylladb.scylladb.scylladb',
+    'sparkop': 'sparkop.sparkop.sparkop',
+    'miniop': 'miniop.miniop.miniop',
+    'kafkaop': 'strimzi_kafka.kafkaop.kafkaop',
+    'platform': 'platform_stack.platform.platform',
+    'status': 'platform_stack.status.status',
+}
+# shown by `dp --help` instead of importing every module, test_dp checks them against the docstrings of the groups
+SUBCOMMAND_HELP = {
+    'flinkop': 'Install flink operator command',
+    'redpanda': 'Install redpanda helm chart command',
+    'scylladb': 'Install scyllaDB cluster command',
+    'sparkop': 'Install spark operator command',
+    'miniop': 'Install MinIO operator command',
+    'kafkaop': 'Install strimzi kafka operator command.',
+    'platform': 'Deploy the whole data platform from a single spec',
+    'status': 'Show the helm releases, operators and custom resources of the components and whether they are ready',
+}
+
+@click.group(cls=LazyGroup, lazy_subcommands=SUBCOMMANDS, lazy_help=SUBCOMMAND_HELP)
+@click.option('--profile', is_flag=True, help='Print where the time of the command goes and export a Chrome trace')
+@click.option('--profile-output', default='dp-trace.json', help='File where the --profile trace is written')
+@click.option('--backend', type=click.Choice(['kubectl', 'api']), default=None,
+              help='Talk to kubernetes forking kubectl (default) or through the in-process API client, also $DP_KUBE_BACKEND')
+@click.option('--retries', type=click.IntRange(min=0), default=None,
+              help='Times a command failing with a transient error is run again, also $DP_RETRY_ATTEMPTS minus one')
+@click.option('--context', 'contexts', multiple=True,
+              help='Kubeconfig context to run the command against, repeat it to run against several contexts at once')
+@click.option('--contexts-file', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='File with a kubeconfig context per line, the command runs against all of them')
+@click.option('--max-parallel', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Maximum number of contexts handled at the same time')
+@click.pass_context
+def dp(ctx: click.Context, profile: bool, profile_output: str, backend: str, retries: int, contexts: tuple,
+       contexts_file: str, max_parallel: int):
+    # read by utils.kube_api, utils.retry and utils.executor when a command runs, the subcommand modules are
+    # already imported at this point
+    if backend is not None:
+        os.environ['DP_KUBE_BACKEND'] = backend
+    if retries is not None:
+        os.environ['DP_RETRY_ATTEMPTS'] = str(retries + 1)
+    if profile:
+        ctx.call_on_close(partial(report_profile, tracing.enable(), profile_output))
+    if contexts or contexts_file:
+        import utils.fanout as fanout
+        selected = fanout.read_contexts(contexts, contexts_file)
+        if len(selected) == 1:
+            os.environ['DP_KUBE_CONTEXT'] = selected[0]
+        elif selected:
+            # every context runs in its own dp process, this one only prints their output and the summary
+            ctx.exit(fanout.fan_out(selected, sys.argv[1:], ctx.invoked_subcommand, max_parallel))
+
+def report_profile(tracer: tracing.Tracer, profile_output: str):
+    """Print the time breakdown of the command and export the trace, also when the command fails.
+
+    Args:
+        tracer (tracing.Tracer): tracer with the spans of the command.
+        profile_output (str): file where the Chrome trace is written.
+    """
+    click.echo('-------------------------------------------', err=True)
+    for line in tracer.breakdown():
+        click.echo(line, err=True)
+    tracer.export(profile_output)
+    click.echo(f'Trace written to {profile_output} (open it in chrome://tracing or ui.perfetto.dev)', err=True)
+    click.echo('-------------------------------------------', err=True)
 
 if __name__ == '__main__':
-    dp.add_command(flinkop)
-    dp.add_command(redpanda)
-    dp.add_command(scylladb)
-    dp.add_command(sparkop)
-    dp.add_command(miniop)
-    dp.add_command(kafkaop)
     dp()
\ No newline at end of file
@@ -2,6 +2,10 @@ import click
 import utils.subprocess_com as utils
 import utils.helm_const as h
 import utils.constants as c
+from functools import partial
+from utils.planner import InstallPlan, run_plan
+import utils.teardown as teardown
+import utils.readiness as ready
 @click.group()
 def flinkop():
     """
@@ -10,28 +14,68 @@ def flinkop():
 
 @flinkop.command(name='install')
 @click.option('--version', '-v', type=str, default='1.8.0', help='Version of the flink operator that you want to deploy')
-def install(version: str):
+@click.option('--plan', 'show_plan', is_flag=True, help='Show the install steps graph and critical path without running it')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum number of install steps running at the same time')
+def install(version: str, show_plan: bool, workers: int):
     """Install flink operator in kubernetes
 
     Args:
         v (str, optional): version that you want to install in kubernetes Defaults to '1.8.0'.
+        show_plan (bool, optional): only print the install plan. Defaults to False.
+        workers (int, optional): maximum number of steps running at the same time. Defaults to no limit.
     
     """
-    utils.create_ns(c.FLINK_OP_NS)
-    utils.create_ns(c.FLINK_NS)
-    utils.add_repo(c.FLINK_REPO, h.HELM_FLINK_REPO+version)
-    utils.apply_cert_manager()
-    utils.install_repo(c.FLINK_REPO, c.FLINK_REPO, c.FLINK_OP, c.FLINK_VALUES)
+    run_plan(install_plan(version), show_plan, workers)
 
+def install_plan(version: str = '1.8.0', plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to install the flink operator
+
+    Args:
+        version (str, optional): version of the flink operator. Defaults to '1.8.0'.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the flink operator steps.
+    """
+    plan = plan or InstallPlan('flinkop install')
+    plan.add(f'namespace:{c.FLINK_OP_NS}', partial(utils.create_ns, c.FLINK_OP_NS))
+    plan.add(f'namespace:{c.FLINK_NS}', partial(utils.create_ns, c.FLINK_NS))
+    plan.add(f'repo:{c.FLINK_REPO}', partial(utils.add_repo, c.FLINK_REPO, h.HELM_FLINK_REPO+version), estimate=2)
+    plan.add(c.CERT_MANAGER_STEP, utils.apply_cert_manager, estimate=120)
+    plan.add(f'install:{c.FLINK_REPO}', partial(utils.install_repo, c.FLINK_REPO, c.FLINK_REPO, c.FLINK_OP, c.FLINK_VALUES),
+             after=[f'namespace:{c.FLINK_OP_NS}', f'namespace:{c.FLINK_NS}', f'repo:{c.FLINK_REPO}', c.CERT_MANAGER_STEP],
+             estimate=10)
+    plan.add(f'wait:{c.FLINK_REPO}', partial(ready.wait_for, [ready.deployment(c.FLINK_OP_DEPLOYMENT, c.FLINK_OP_NS)]),
+             after=[f'install:{c.FLINK_REPO}'], estimate=30)
+    return plan
     
 @flinkop.command(name="delete")
-def delete():
+@click.option('--fast', is_flag=True, help='Kill the pods without graceful termination, for throwaway test clusters')
+@click.option('--timeout', default=teardown.DEFAULT_TIMEOUT, type=int, help='Seconds to wait until the namespaces are gone')
+def delete(fast: bool, timeout: int):
     """Uninstall flink operator from kubernetes
     """
-    utils.uninstall_repo(c.FLINK_REPO, c.FLINK_REPO)
-    utils.delete_repo(c.FLINK_REPO)
-    utils.delete_ns(c.FLINK_OP_NS)
-    utils.delete_ns(c.FLINK_NS)
+    run_plan(delete_plan(fast=fast, timeout=timeout))
+
+def delete_plan(fast: bool = False, timeout: int = teardown.DEFAULT_TIMEOUT, plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to uninstall the flink operator
+
+    Args:
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until every namespace is gone. Defaults to 300.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the flink operator delete steps.
+    """
+    plan = plan or InstallPlan('flinkop delete')
+    plan.add(f'uninstall:{c.FLINK_REPO}', partial(utils.uninstall_repo, c.FLINK_REPO, c.FLINK_REPO), estimate=5)
+    plan.add(f'repo-remove:{c.FLINK_REPO}', partial(utils.delete_repo, c.FLINK_REPO), after=[f'uninstall:{c.FLINK_REPO}'])
+    plan.add(f'delete-namespace:{c.FLINK_OP_NS}', partial(teardown.delete_namespace, c.FLINK_OP_NS, timeout, fast),
+             after=[f'uninstall:{c.FLINK_REPO}'], estimate=10)
+    plan.add(f'delete-namespace:{c.FLINK_NS}', partial(teardown.delete_namespace, c.FLINK_NS, timeout, fast),
+             after=[f'uninstall:{c.FLINK_REPO}'], estimate=10)
+    return plan
 
 @flinkop.command(name="revision")
 def status():
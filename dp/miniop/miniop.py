@@ -2,6 +2,10 @@ import click
 import utils.subprocess_com as utils
 import utils.helm_const as h
 import utils.constants as c
+import utils.readiness as ready
+from functools import partial
+from utils.planner import InstallPlan, run_plan
+import utils.teardown as teardown
 
 @click.group()
 def miniop():
@@ -10,23 +14,66 @@ def miniop():
     """
 
 @miniop.command(name='install')
-def install():
+@click.option('--plan', 'show_plan', is_flag=True, help='Show the install steps graph and critical path without running it')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum number of install steps running at the same time')
+def install(show_plan: bool, workers: int):
     """Install MinIO operator in kubernetes
+
+    Args:
+        show_plan (bool, optional): only print the install plan. Defaults to False.
+        workers (int, optional): maximum number of steps running at the same time. Defaults to no limit.
+    """
+    run_plan(install_plan(), show_plan, workers)
+
+def install_plan(plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to install the MinIO operator
+
+    Args:
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the MinIO operator steps.
     """
-    utils.create_ns(c.MINIO_NS)
-    utils.add_repo(c.MINIO_REPO, h.HELM_MINIO_REPO)
+    plan = plan or InstallPlan('miniop install')
+    plan.add(f'namespace:{c.MINIO_NS}', partial(utils.create_ns, c.MINIO_NS))
+    plan.add(f'repo:{c.MINIO_REPO}', partial(utils.add_repo, c.MINIO_REPO, h.HELM_MINIO_REPO), estimate=2)
+    plan.add(f'install:{c.MINIO_NS}', _install_operator, after=[f'namespace:{c.MINIO_NS}', f'repo:{c.MINIO_REPO}'],
+             estimate=10)
+    plan.add(f'wait:{c.MINIO_NS}', partial(ready.wait_for, [ready.deployment(c.MINIO_OP_DEPLOYMENT, c.MINIO_NS)]),
+             after=[f'install:{c.MINIO_NS}'], estimate=30)
+    return plan
+
+def _install_operator():
     result = utils.install_repo(c.MINIO_REPO, c.MINIO_REPO, c.MINIO_OP)
     click.echo('-------------------------------------------')
     click.echo(f"{(result.stdout).decode()}")
     click.echo('-------------------------------------------')   
 
 @miniop.command(name="delete")
-def delete():
+@click.option('--fast', is_flag=True, help='Kill the pods without graceful termination, for throwaway test clusters')
+@click.option('--timeout', default=teardown.DEFAULT_TIMEOUT, type=int, help='Seconds to wait until the namespaces are gone')
+def delete(fast: bool, timeout: int):
     """Uninstall MinIO operator from kubernetes
     """
-    utils.uninstall_repo(c.MINIO_REPO, c.MINIO_REPO)
-    utils.delete_repo(c.MINIO_REPO)
-    utils.delete_ns(c.MINIO_NS)
+    run_plan(delete_plan(fast=fast, timeout=timeout))
+
+def delete_plan(fast: bool = False, timeout: int = teardown.DEFAULT_TIMEOUT, plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to uninstall the MinIO operator
+
+    Args:
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until every namespace is gone. Defaults to 300.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the MinIO operator delete steps.
+    """
+    plan = plan or InstallPlan('miniop delete')
+    plan.add(f'uninstall:{c.MINIO_NS}', partial(utils.uninstall_repo, c.MINIO_REPO, c.MINIO_REPO), estimate=5)
+    plan.add(f'repo-remove:{c.MINIO_REPO}', partial(utils.delete_repo, c.MINIO_REPO), after=[f'uninstall:{c.MINIO_NS}'])
+    plan.add(f'delete-namespace:{c.MINIO_NS}', partial(teardown.delete_namespace, c.MINIO_NS, timeout, fast),
+             after=[f'uninstall:{c.MINIO_NS}'], estimate=10)
+    return plan
 
 @miniop.command(name="get-jwt")
 def get_jwt():
@@ -58,16 +105,20 @@ def create_tenant(namespace: str):
 
 @miniop.command(name="delete-tenant")
 @click.option('--namespace', '-n', default='minio-tenant', help='Namespace where MinIO tenant will be deleted')
-def delete_tenant(namespace: str):
+@click.option('--fast', is_flag=True, help='Kill the pods without graceful termination, for throwaway test clusters')
+@click.option('--timeout', default=teardown.DEFAULT_TIMEOUT, type=int, help='Seconds to wait until the namespace is gone')
+def delete_tenant(namespace: str, fast: bool, timeout: int):
     """Delte a tenant using the MinIO operator
 
     Args:
         namespace (str): namespace where MinIO tenant will be deployed
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until the namespace is gone. Defaults to 300.
     """
 
     utils.uninstall_repo(namespace, c.MINIO_T_REPO)
     #utils.delete_repo('minio-operator')
-    utils.delete_ns(namespace)
+    teardown.delete_namespace(namespace, timeout, fast)
     
 @miniop.command(name="revision")
 def status():
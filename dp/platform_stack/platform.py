@@ -0,0 +1,185 @@
+import click
+import inspect
+import os
+import utils.subprocess_com as utils
+import utils.constants as c
+from os import path
+from pathlib import Path
+from utils.planner import InstallPlan, run_plan
+import flinkop.flinkop as flinkop
+import miniop.miniop as miniop
+import redpanda_helm.redpanda as redpanda
+import scylladb.scylladb as scylladb
+import sparkop.sparkop as sparkop
+import strimzi_kafka.kafkaop as kafkaop
+
+COMPONENTS = {
+    'flinkop': flinkop,
+    'kafkaop': kafkaop,
+    'miniop': miniop,
+    'scylladb': scylladb,
+    'sparkop': sparkop,
+    'redpanda': redpanda,
+}
+SHARED_STEPS = (c.CERT_MANAGER_STEP, c.HELM_UPDATE_STEP)
+DEFAULT_SPEC = path.join(str(Path(__file__).parent.parent), 'resources', 'platform.yaml')
+DEFAULT_CONCURRENCY = 4
+RETRY_SETTINGS = {'attempts': 'DP_RETRY_ATTEMPTS', 'base_delay': 'DP_RETRY_BASE_DELAY', 'max_delay': 'DP_RETRY_MAX_DELAY'}
+
+@click.group()
+def platform():
+    """
+        Deploy the whole data platform from a single spec
+    """
+
+@platform.command(name='up')
+@click.option('--spec', '-f', 'spec_path', default=DEFAULT_SPEC, type=click.Path(exists=True, dir_okay=False),
+              help='YAML file with the components to deploy')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum number of steps running at the same time')
+@click.option('--plan', 'show_plan', is_flag=True, help='Show the steps graph and critical path without running it')
+def up(spec_path: str, workers: int, show_plan: bool):
+    """Deploy every component of the spec, independent components in parallel
+
+    Args:
+        spec_path (str, optional): YAML file with the components to deploy. Defaults to resources/platform.yaml.
+        workers (int, optional): maximum number of steps running at the same time. Defaults to the spec concurrency.
+        show_plan (bool, optional): only print the plan. Defaults to False.
+    """
+    spec = load_spec(spec_path)
+    configure_retry(spec)
+    run_plan(up_plan(spec), show_plan, workers or spec.get('concurrency', DEFAULT_CONCURRENCY))
+
+@platform.command(name='down')
+@click.option('--spec', '-f', 'spec_path', default=DEFAULT_SPEC, type=click.Path(exists=True, dir_okay=False),
+              help='YAML file with the components to delete')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum number of steps running at the same time')
+@click.option('--plan', 'show_plan', is_flag=True, help='Show the steps graph and critical path without running it')
+@click.option('--fast', is_flag=True, help='Kill the pods without graceful termination, for throwaway test clusters')
+@click.option('--timeout', type=int, default=None, help='Seconds to wait until every namespace is gone')
+def down(spec_path: str, workers: int, show_plan: bool, fast: bool, timeout: int):
+    """Delete every component of the spec in reverse dependency order, independent components in parallel
+
+    Args:
+        spec_path (str, optional): YAML file with the components to delete. Defaults to resources/platform.yaml.
+        workers (int, optional): maximum number of steps running at the same time. Defaults to the spec concurrency.
+        show_plan (bool, optional): only print the plan. Defaults to False.
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until every namespace is gone. Defaults to the component default.
+    """
+    spec = load_spec(spec_path)
+    for options in spec['components'].values():
+        if fast:
+            options['fast'] = True
+        if timeout is not None:
+            options['timeout'] = timeout
+    configure_retry(spec)
+    run_plan(down_plan(spec), show_plan, workers or spec.get('concurrency', DEFAULT_CONCURRENCY))
+
+def load_spec(spec_path: str) -> dict:
+    """Read and validate a platform spec
+
+    Args:
+        spec_path (str): path of the YAML spec.
+
+    Raises:
+        click.BadParameter: the spec references unknown components or dependencies.
+
+    Returns:
+        dict: spec with the disabled components removed.
+    """
+    import yaml
+    with open(spec_path) as f:
+        spec = yaml.safe_load(f) or {}
+    components = {name: options or {} for name, options in (spec.get('components') or {}).items()}
+    unknown = sorted(set(components) - set(COMPONENTS))
+    if unknown:
+        raise click.BadParameter(f'Unknown components: {", ".join(unknown)}. Valid components: {", ".join(COMPONENTS)}')
+    components = {name: options for name, options in components.items() if options.get('enabled', True)}
+    for name, options in components.items():
+        missing = [dependency for dependency in options.get('depends_on', []) if dependency not in components]
+        if missing:
+            raise click.BadParameter(f'{name} depends on components that are not deployed: {", ".join(missing)}')
+    spec['components'] = components
+    return spec
+
+def configure_retry(spec: dict) -> None:
+    """Apply the `retry` section of the spec (attempts, base_delay, max_delay) to every command of the run,
+    the environment variables set by the user take precedence.
+    """
+    for key, value in (spec.get('retry') or {}).items():
+        if key not in RETRY_SETTINGS:
+            raise click.BadParameter(f'Unknown retry setting {key}. Valid settings: {", ".join(RETRY_SETTINGS)}')
+        os.environ.setdefault(RETRY_SETTINGS[key], str(value))
+
+def up_plan(spec: dict) -> InstallPlan:
+    """Merge the install plans of every component.
+
+    cert-manager is checked once, every repository is added before a single helm repo update and the charts are
+    installed after it.
+
+    Args:
+        spec (dict): validated platform spec.
+
+    Returns:
+        InstallPlan: plan that deploys the whole platform.
+    """
+    plan = InstallPlan('platform up')
+    groups = _add_components(plan, spec, 'install_plan')
+    repos = [name for name in plan.steps if name.startswith('repo:')]
+    if repos:
+        plan.add(c.HELM_UPDATE_STEP, utils.update_helm, after=repos, estimate=5)
+        for name in list(plan.steps):
+            if name.startswith('install:'):
+                plan.add_dependency(name, c.HELM_UPDATE_STEP)
+    for name, options in spec['components'].items():
+        for dependency in options.get('depends_on', []):
+            _chain(plan, groups[dependency], groups[name])
+    return plan
+
+def down_plan(spec: dict) -> InstallPlan:
+    """Merge the delete plans of every component, a component is deleted after the ones that depend on it.
+
+    Args:
+        spec (dict): validated platform spec.
+
+    Returns:
+        InstallPlan: plan that deletes the whole platform.
+    """
+    plan = InstallPlan('platform down')
+    groups = _add_components(plan, spec, 'delete_plan')
+    for name, options in spec['components'].items():
+        for dependency in options.get('depends_on', []):
+            _chain(plan, groups[name], groups[dependency])
+    # repos are removed one by one, so two helm processes never rewrite the repositories file at the same time
+    repos = [name for name in plan.steps if name.startswith('repo-remove:')]
+    for previous, name in zip(repos, repos[1:]):
+        plan.add_dependency(name, previous)
+    return plan
+
+def _add_components(plan: InstallPlan, spec: dict, builder: str) -> dict[str, list[str]]:
+    """Add the steps of every component to the plan and return the steps owned by each one.
+    """
+    groups = {}
+    for name, options in spec['components'].items():
+        before = set(plan.steps)
+        build = getattr(COMPONENTS[name], builder)
+        accepted = inspect.signature(build).parameters
+        kwargs = {key: value for key, value in options.items() if key in accepted and key != 'plan'}
+        if 'version' in kwargs:
+            kwargs['version'] = str(kwargs['version'])
+        if builder == 'install_plan':
+            unknown = set(options) - set(accepted) - {'depends_on', 'enabled'}
+            if unknown:
+                raise click.BadParameter(f'Unknown options for {name}: {", ".join(sorted(unknown))}')
+        build(plan=plan, **kwargs)
+        groups[name] = [step for step in plan.steps if step not in before and step not in SHARED_STEPS]
+    return groups
+
+def _chain(plan: InstallPlan, first: list[str], then: list[str]) -> None:
+    """Make every step of the `then` group wait for the last steps of the `first` group.
+    """
+    referenced = {dependency for name in first for dependency in plan.steps[name].after}
+    last = [name for name in first if name not in referenced]
+    for name in then:
+        for dependency in last:
+            plan.add_dependency(name, dependency)
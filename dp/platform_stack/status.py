@@ -0,0 +1,40 @@
+import click
+import json
+import time
+import utils.health as health
+
+@click.command(name='status')
+@click.argument('components', nargs=-1, type=click.Choice(sorted(health.COMPONENTS)))
+@click.option('--all', 'all_components', is_flag=True, help='Check every component, the default when none is given')
+@click.option('--output', '-o', type=click.Choice(['table', 'json']), default='table', help='Output format')
+@click.option('--refresh', is_flag=True, help='Ignore the results cached by previous calls')
+@click.option('--ttl', type=float, default=health.STATUS_TTL, show_default=True,
+              help='Seconds the results are reused by the next calls, 0 disables the cache')
+@click.pass_context
+def status(ctx: click.Context, components: tuple, all_components: bool, output: str, refresh: bool, ttl: float):
+    """Show the helm releases, operators and custom resources of the components and whether they are ready
+
+    Args:
+        components (tuple, optional): components to check. Defaults to all of them.
+        all_components (bool, optional): check every component. Defaults to False.
+        output (str, optional): table or json. Defaults to table.
+        refresh (bool, optional): ignore the cached results. Defaults to False.
+        ttl (float, optional): seconds the results are cached. Defaults to 10.
+    """
+    if all_components or not components:
+        components = sorted(health.COMPONENTS)
+    cache = health.StatusCache(ttl=ttl) if ttl > 0 else None
+    start = time.monotonic()
+    rows = health.collect(list(components), cache=cache, refresh=refresh)
+    elapsed = time.monotonic() - start
+    ok = health.healthy(rows)
+    if output == 'json':
+        click.echo(json.dumps({'healthy': ok, 'elapsed_seconds': round(elapsed, 3), 'resources': rows}, indent=2))
+    else:
+        click.echo('-------------------------------------------')
+        for line in health.format_table(rows):
+            click.echo(line)
+        click.echo('-------------------------------------------')
+        click.echo(f"{'All installed components are ready' if ok else 'Some components are not ready'} ({elapsed:.2f}s)")
+    if not ok:
+        ctx.exit(1)
@@ -1,13 +1,26 @@
 import click
-import yaml
 import utils.subprocess_com as utils
-from os import path
-from pathlib import Path
+import utils.readiness as ready
+import utils.render as render
+import utils.helm_const as h
+import utils.perf as perf
+import utils.streaming as streaming
+import threading
+import time
+from array import array
+from collections import deque
+from functools import partial
+from utils.benchmark import record_run, split
+from utils.executor import get_executor, run_parallel
+from utils.planner import InstallPlan, run_plan
+import utils.teardown as teardown
+from redpanda_helm import rpk
+from strimzi_kafka.topics import parse_catalog, parse_settings
 
 @click.group()
 def redpanda():
     """
-    Install redpanda helm chart commad
+    Install redpanda helm chart command
     """
     pass
 
@@ -16,8 +29,9 @@ def redpanda():
 @click.option('--version', '-v', default='5.8.5', help='Redpanda helm chart version')
 @click.option('--namespace', '-n', default='redpanda', help='Namespace where redpanda will be deployed')
 @click.option('--brokers', '-b', default=1, help="How many replica pods (redpanda brokers) will be deployed")
-
-def install(tls: str,  version: str, namespace: str, brokers: str):
+@click.option('--plan', 'show_plan', is_flag=True, help='Show the install steps graph and critical path without running it')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum number of install steps running at the same time')
+def install(tls: str,  version: str, namespace: str, brokers: str, show_plan: bool, workers: int):
     """Deploy Redpanda on Kubernetes using Helm.
 
     Args:
@@ -25,95 +39,151 @@ def install(tls: str,  version: str, namespace: str, brokers: str):
         version (str, optional): Install the redpanda helm chart with the version specified. Defaults to "5.8.5".
         namespace (str, optional): Install the redpanda cluster in the namespace specified. Defaults to "default".
         brokers (int, optional): How many Pod replicas (Redpanda brokers) will be deployed. Defaults to 1.
+        show_plan (bool, optional): only print the install plan. Defaults to False.
+        workers (int, optional): maximum number of steps running at the same time. Defaults to no limit.
+    """
+    run_plan(install_plan(tls, version, namespace, brokers), show_plan, workers)
+
+def install_plan(tls: str = 'false', version: str = '5.8.5', namespace: str = 'redpanda', brokers: int = 1,
+                 plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to deploy Redpanda
+
+    Args:
+        tls (str, optional): "false" to deploy Redpanda without TLS. Defaults to "false".
+        version (str, optional): Redpanda helm chart version. Defaults to "5.8.5".
+        namespace (str, optional): namespace where Redpanda is deployed. Defaults to "redpanda".
+        brokers (int, optional): How many Pod replicas (Redpanda brokers) will be deployed. Defaults to 1.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the Redpanda steps.
     """
-    utils.create_ns(namespace)
-    utils.add_repo('redpanda', "https://charts.redpanda.com")
-    if tls.lower() == 'false':
-            data = {
-                'tls': {
-                    'enabled': False
-                },
-                "statefulset": {
-                    "replicas": brokers
-                }
-            }
-            absolute = str(Path(__file__).parent.parent)
-            values_path = path.join(absolute, 'resources', 'values-redpanda.yaml')
-            with open(values_path, 'w') as file:
-                yaml.dump(data, file, default_flow_style=False)
-
-    utils.install_repo(namespace, 'redpanda', 'redpanda/redpanda', "values-redpanda.yaml")
+    plan = plan or InstallPlan('redpanda install')
+    plan.add(f'namespace:{namespace}', partial(utils.create_ns, namespace))
+    plan.add('repo:redpanda', partial(utils.add_repo, 'redpanda', h.HELM_REDPANDA_REPO), estimate=2)
+    plan.add(f'install:{namespace}', partial(_install_chart, tls, version, namespace, brokers),
+             after=[f'namespace:{namespace}', 'repo:redpanda'], estimate=10)
+    plan.add(f'wait:{namespace}', partial(ready.wait_for, [ready.statefulset('redpanda', namespace)], timeout=600),
+             after=[f'install:{namespace}'], estimate=120)
+    return plan
+
+def _install_chart(tls: str, version: str, namespace: str, brokers: int):
+    data = render.load_template('values-redpanda.yaml')
+    data['tls']['enabled'] = tls.lower() != 'false'
+    data['statefulset']['replicas'] = brokers
+    utils.install_repo(namespace, 'redpanda', 'redpanda/redpanda', version=version, values=data)
     
 @redpanda.command()
-@click.option('--namespace', '-n', default='default', help='Namespace where Redpanda will be deleted')
-def delete(namespace):
+@click.option('--namespace', '-n', default='redpanda', help='Namespace where Redpanda will be deleted')
+@click.option('--fast', is_flag=True, help='Kill the pods without graceful termination, for throwaway test clusters')
+@click.option('--timeout', default=teardown.DEFAULT_TIMEOUT, type=int, help='Seconds to wait until the namespace is gone')
+def delete(namespace, fast, timeout):
     """Delete Redpanda in Kubernetes using Helm
 
     Args:
-        namespace (str, optional): Delete the Redpanda cluster in the namespace specified. Defaults to 'default'
+        namespace (str, optional): Delete the Redpanda cluster in the namespace specified. Defaults to 'redpanda'
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until the namespace is gone. Defaults to 300.
+    """
+    run_plan(delete_plan(namespace, fast, timeout))
+
+def delete_plan(namespace: str = 'redpanda', fast: bool = False, timeout: int = teardown.DEFAULT_TIMEOUT,
+                plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to delete Redpanda
+
+    Args:
+        namespace (str, optional): namespace where Redpanda is deployed. Defaults to 'redpanda'.
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until the namespace is gone. Defaults to 300.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the Redpanda delete steps.
     """
-    utils.uninstall_repo('redpanda', 'redpanda')
+    plan = plan or InstallPlan('redpanda delete')
+    plan.add(f'uninstall:{namespace}', partial(utils.uninstall_repo, namespace, 'redpanda'), estimate=5)
 
     # Al borrar el repo siguen quedando un pod de configuración y un job dentro del namespace donde se despliega Redpanda que hay que borrar manualmente. También quedan los PVC si son configurados.
-    resources_to_delete = [
-        ("pod", "--all"),
-        ("pvc", "--all"),
-        ("secret", "--all"),
-        ("job", "redpanda-configuration")
-    ]
-
-    for resource_type, resource_name in resources_to_delete:
-        utils.run_kubectl_delete_with_res(resource_type=resource_type, namespace=namespace, resource_name=resource_name)
-    
-    utils.delete_repo('redpanda')
-    utils.delete_ns('redpanda')
+    # pods, pvcs and secrets go in a single kubectl call, the job in parallel with it
+    plan.add(f'delete-resources:{namespace}', partial(teardown.delete_kinds, namespace, ['pod', 'pvc', 'secret'], fast),
+             after=[f'uninstall:{namespace}'], estimate=3)
+    plan.add(f'delete-job:{namespace}/redpanda-configuration',
+             partial(utils.run_kubectl_delete_with_res, resource_type='job', namespace=namespace,
+                     resource_name='redpanda-configuration'), after=[f'uninstall:{namespace}'], estimate=3)
+
+    plan.add('repo-remove:redpanda', partial(utils.delete_repo, 'redpanda'), after=[f'uninstall:{namespace}'])
+    plan.add(f'delete-namespace:{namespace}', partial(teardown.delete_namespace, namespace, timeout, fast),
+             after=[f'delete-resources:{namespace}', f'delete-job:{namespace}/redpanda-configuration'], estimate=10)
+    return plan
 
 @redpanda.command()
 @click.option('--namespace', '-n', default='default', help='Namespace where redpanda is installed')
-@click.argument('topic_name', type=str, required=True)
-def create_topic(namespace: str, topic_name: str):
-    """Create a topic in Redpanda
+@click.option('--partitions', '-p', default=1, type=int, help='Number of topic partitions')
+@click.option('--replicas', '-r', default=1, type=int, help='Number of topic replicas')
+@click.option('--config', '-c', 'configs', multiple=True, help='Topic config as key=value, can be repeated')
+@click.option('--catalog', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='YAML or CSV catalog with the topics to create')
+@click.argument('topic_names', type=str, nargs=-1)
+def create_topic(namespace: str, topic_names: tuple, partitions: int, replicas: int, configs: tuple, catalog: str):
+    """Create one or many topics in Redpanda
+
+    Topics with the same partitions, replicas and config are created by a single rpk call, and the calls for
+    different settings run at the same time.
 
     Args:
         namespace (str, optional): Namespace where the Redpanda cluster is created.
-        topic_name (str, required): Name of the Topic
+        topic_names (tuple, optional): Names of the Topics
+        partitions (int, optional): number of topic partitions. Defaults to 1.
+        replicas (int, optional): number of topic replicas. Defaults to 1.
+        configs (tuple, optional): topic configs as key=value.
+        catalog (str, optional): YAML or CSV catalog with name, partitions, replicas and config of every topic.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
     """
-    create_command = ["kubectl", "--namespace", namespace, "exec", "-i", "-t", "redpanda-0", "-c", "redpanda", "--", "rpk", "topic", "create", topic_name]
-    result = utils.__run_subprocess(create_command)
-    
-    if result.returncode != 0:
-        click.echo('-------------------------------------------')
-        click.echo(f'Failed creating the topic {topic_name}')
-        click.echo(f'Error: {result.stderr}')
-        click.echo('-------------------------------------------')
-        raise SystemError(result.stderr)
-    else:
-        click.echo('-------------------------------------------')
-        click.echo(f'Topic {topic_name} created!')
-        click.echo('-------------------------------------------')
+    try:
+        config = parse_settings(configs)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    topics = [{'name': name, 'partitions': partitions, 'replicas': replicas, 'config': config} for name in topic_names]
+    if catalog is not None:
+        try:
+            topics += parse_catalog(catalog, partitions, replicas)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--catalog')
+    if not topics:
+        raise click.UsageError('Give the topic names or a --catalog')
+    run_parallel(*[partial(_run_rpk_topics, namespace, command, rpk.CREATE_OK, 'created')
+                   for command in rpk.topic_create_commands(topics)])
 
 @redpanda.command()
 @click.option('--namespace', '-n', default='default', help='Namespace where redpanda is installed')
-@click.argument('topic_name', type=str, required=True)
-def delete_topic(namespace: str, topic_name: str):
-    """Delete a topic in Redpanda
+@click.argument('topic_names', type=str, nargs=-1, required=True)
+def delete_topic(namespace: str, topic_names: tuple):
+    """Delete one or many topics in Redpanda with a single rpk call
 
     Args:
         namespace (str, optional): Namespace where the Redpanda cluster is created.
-        topic_name (str, required): Name of the Topic
+        topic_names (tuple, required): Names of the Topics
     """
-    delete_command = ["kubectl", "--namespace", namespace, "exec", "-i", "-t", "redpanda-0", "-c", "redpanda", "--", "rpk", "topic", "delete", topic_name]
-    result = utils.__run_subprocess(delete_command)
-    
-    if result.returncode != 0:
+    _run_rpk_topics(namespace, rpk.topic_delete_command(list(topic_names)), rpk.DELETE_OK, 'deleted')
+
+def _run_rpk_topics(namespace: str, command: list, ok: tuple, action: str):
+    exec_command = ["kubectl", "--namespace", namespace, "exec", "redpanda-0", "-c", "redpanda", "--"] + command
+    result = utils.__run_subprocess(exec_command)
+    statuses = rpk.parse_status_table(result.stdout.decode('utf-8', errors='replace'))
+    failed = rpk.failed_topics(statuses, ok)
+    if failed or not statuses:
         click.echo('-------------------------------------------')
-        click.echo(f'Failed deleting the topic {topic_name}')
+        for name, status in failed.items():
+            click.echo(f'Failed with the topic {name}: {status}')
         click.echo(f'Error: {result.stderr}')
         click.echo('-------------------------------------------')
-        raise SystemError(result.stderr)
+        raise SystemError(result.stderr or str(failed))
     else:
         click.echo('-------------------------------------------')
-        click.echo(f'Topic {topic_name} deleted!')
+        for name, status in statuses.items():
+            click.echo(f'Topic {name} {action}!' if status == 'OK' else f'Topic {name}: {status}')
         click.echo('-------------------------------------------')
 
 @redpanda.command()
@@ -149,6 +219,112 @@ def produce_messages(namespace: str, topic_name: str, message: str, count: int):
         click.echo(f'Messages sent to topic {topic_name}!')
         click.echo('-------------------------------------------')
         
+@redpanda.command()
+@click.option('--namespace', '-n', default='redpanda', help='Namespace where redpanda is installed')
+@click.option('--topic', '-t', default='dp-benchmark', help='Benchmark topic, created when it does not exist')
+@click.option('--partitions', '-p', default=6, type=int, help='Partitions of the benchmark topic')
+@click.option('--replicas', default=1, type=int, help='Replicas of the benchmark topic')
+@click.option('--records', default=100000, type=int, help='Total number of records')
+@click.option('--record-size', '-s', default=1024, type=int, help='Size of every record in bytes')
+@click.option('--rate', default=None, type=float, help='Maximum records/sec of every producer')
+@click.option('--acks', default='all', type=click.Choice(['0', '1', 'all']), help='Producer acks')
+@click.option('--compression', default='none', type=click.Choice(['none', 'gzip', 'snappy', 'lz4', 'zstd']),
+              help='Producer compression')
+@click.option('--producers', default=1, type=click.IntRange(min=1), help='Number of parallel producers')
+@click.option('--consumers', default=1, type=click.IntRange(min=1), help='Number of parallel consumers')
+@click.option('--warmup', default=5, type=float, help='Seconds given to the consumers to join the group')
+@click.option('--timeout', default=300, type=float, help='Seconds to wait until all the records are consumed')
+@click.option('--history', 'history_file', default=perf.HISTORY_FILE, help='JSON lines file where the runs are stored')
+def benchmark(namespace: str, topic: str, partitions: int, replicas: int, records: int, record_size: int, rate: float,
+              acks: str, compression: str, producers: int, consumers: int, warmup: float, timeout: float,
+              history_file: str):
+    """Measure the throughput and end-to-end latency of Redpanda with concurrent rpk producers and consumers
+
+    Every record carries the time it was written to the producer and the latency is measured when a consumer
+    reads it back, both times taken on this machine. The result has the same format as `kafkaop benchmark`.
+
+    Args:
+        namespace (str, optional): namespace where redpanda is running. Defaults to redpanda.
+        topic (str, optional): benchmark topic. Defaults to dp-benchmark.
+        partitions (int, optional): partitions of the benchmark topic. Defaults to 6.
+        replicas (int, optional): replicas of the benchmark topic. Defaults to 1.
+        records (int, optional): total number of records. Defaults to 100000.
+        record_size (int, optional): size of every record in bytes. Defaults to 1024.
+        rate (float, optional): maximum records/sec of every producer. Defaults to no limit.
+        acks (str, optional): producer acks. Defaults to all.
+        compression (str, optional): producer compression. Defaults to none.
+        producers (int, optional): number of parallel producers. Defaults to 1.
+        consumers (int, optional): number of parallel consumers. Defaults to 1.
+        warmup (float, optional): seconds given to the consumers to join the group. Defaults to 5.
+        timeout (float, optional): seconds to wait until all the records are consumed. Defaults to 300.
+        history_file (str, optional): file where the runs are stored and compared.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
+    """
+    params = {'topic': topic, 'records': records, 'record_size': record_size, 'rate': rate, 'acks': acks,
+              'compression': compression, 'producers': producers, 'consumers': consumers}
+    # only the producers read stdin, the consumers run without -i
+    exec_prefix = ["kubectl", "--namespace", namespace, "exec", "redpanda-0", "-c", "redpanda", "--"]
+    produce_prefix = ["kubectl", "--namespace", namespace, "exec", "-i", "redpanda-0", "-c", "redpanda", "--"]
+    _run_rpk_topics(namespace, rpk.topic_create_commands(
+        [{'name': topic, 'partitions': partitions, 'replicas': replicas}])[0], rpk.CREATE_OK, 'created')
+
+    executor = get_executor()
+    latencies = array('d')
+    consumed = {'records': 0, 'bytes': 0, 'first': None, 'last': None}
+    all_consumed = threading.Event()
+    errors = deque(maxlen=20)
+
+    def on_record(line: bytes):
+        # stdout callbacks run in the executor event loop thread, one at a time
+        now = time.time_ns()
+        latency = perf.message_latency_ms(line, now)
+        if latency is None:
+            return
+        latencies.append(latency)
+        consumed['records'] += 1
+        consumed['bytes'] += len(line)
+        consumed['first'] = consumed['first'] or now
+        consumed['last'] = now
+        if consumed['records'] >= records:
+            all_consumed.set()
+
+    group = f'dp-benchmark-{int(time.time())}'
+    readers = [executor.submit(executor.run(exec_prefix + rpk.consume_command(topic, group), capture=False,
+                                            on_stdout=on_record, on_stderr=errors.append, bounded=False))
+               for _ in range(consumers)]
+    try:
+        time.sleep(warmup)
+        click.echo('-------------------------------------------')
+        click.echo(f'Producing {records} records of {record_size} bytes with {producers} producers')
+        click.echo('-------------------------------------------')
+        start = time.monotonic()
+        results = run_parallel(*[partial(
+            executor.run_sync, produce_prefix + rpk.produce_command(topic, acks, compression),
+            input=streaming.chunk_messages(perf.benchmark_messages(share, record_size),
+                                           limiter=streaming.RateLimiter(rate)),
+            capture=False, on_stdout=lambda line: None, on_stderr=errors.append) for share in split(records, producers)])
+        produce_seconds = time.monotonic() - start
+        failed = [result for result in results if result.returncode != 0]
+        if failed:
+            raise SystemError(b''.join(errors))
+        if not all_consumed.wait(timeout):
+            click.echo(f'Only {consumed["records"]} of {records} records consumed after {timeout:.0f}s')
+    finally:
+        for reader in readers:
+            reader.cancel()
+
+    consume_seconds = ((consumed['last'] or 0) - (consumed['first'] or 0)) / 1e9
+    producer = {'clients': producers, 'records': records, 'records_per_sec': round(records / produce_seconds, 3),
+                'mb_per_sec': round(records * (record_size + 1) / 1024 / 1024 / produce_seconds, 3)}
+    consumer = {'clients': consumers, 'records': consumed['records'], 'mb': round(consumed['bytes'] / 1024 / 1024, 3)}
+    if consume_seconds > 0:
+        consumer['records_per_sec'] = round(consumed['records'] / consume_seconds, 3)
+        consumer['mb_per_sec'] = round(consumer['mb'] / consume_seconds, 3)
+    consumer.update(perf.latency_stats(latencies))
+    record_run(perf.new_run('redpanda', params, producer, consumer), history_file)
+
 @redpanda.command(name="revision")
 @click.option('--namespace', '-n', default='redpanda', help='Namespace where redpanda is installed')
 def status(namespace: str):
@@ -0,0 +1,69 @@
+CREATE_OK = ('OK', 'TOPIC_ALREADY_EXISTS')
+DELETE_OK = ('OK', 'UNKNOWN_TOPIC_OR_PARTITION')
+ACKS = {'0': '0', '1': '1', 'all': '-1'}
+
+
+def topic_create_commands(topics: list[dict]) -> list[list[str]]:
+    """`rpk topic create` calls for many topics, one call for every group of topics with the same settings.
+
+    Args:
+        topics (list[dict]): topics with the keys name, partitions, replicas and config.
+
+    Returns:
+        list[list[str]]: rpk commands, in the order the groups first appear.
+    """
+    groups = {}
+    for topic in topics:
+        config = tuple(sorted((key, _config_value(value)) for key, value in (topic.get('config') or {}).items()))
+        groups.setdefault((topic['partitions'], topic['replicas'], config), []).append(topic['name'])
+    commands = []
+    for (partitions, replicas, config), names in groups.items():
+        command = ['rpk', 'topic', 'create', *names, '--partitions', str(partitions), '--replicas', str(replicas)]
+        for key, value in config:
+            command += ['--topic-config', f'{key}={value}']
+        commands.append(command)
+    return commands
+
+
+def topic_delete_command(names: list[str]) -> list[str]:
+    return ['rpk', 'topic', 'delete', *names]
+
+
+def produce_command(topic: str, acks: str = 'all', compression: str = 'none') -> list[str]:
+    """`rpk topic produce` reading one record value per stdin line.
+    """
+    return ['rpk', 'topic', 'produce', topic, '--acks', ACKS[acks], '--compression', compression,
+            '--format', '%v\\n']
+
+
+def consume_command(topic: str, group: str) -> list[str]:
+    """`rpk topic consume` writing one record value per line, new consumer groups start at the end of the topic.
+    """
+    return ['rpk', 'topic', 'consume', topic, '--group', group, '--offset', 'end', '--format', '%v\\n']
+
+
+def parse_status_table(output: str) -> dict[str, str]:
+    """Parse the TOPIC/STATUS table written by `rpk topic create` and `rpk topic delete`.
+
+    Args:
+        output (str): stdout of rpk.
+
+    Returns:
+        dict[str, str]: status of every topic, e.g. 'OK' or 'TOPIC_ALREADY_EXISTS'.
+    """
+    statuses = {}
+    for line in output.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2 and parts[0] != 'TOPIC':
+            statuses[parts[0]] = parts[1].split(':', 1)[0].strip()
+    return statuses
+
+
+def failed_topics(statuses: dict[str, str], ok: tuple = CREATE_OK) -> dict[str, str]:
+    return {name: status for name, status in statuses.items() if status not in ok}
+
+
+def _config_value(value) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
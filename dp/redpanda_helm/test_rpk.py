@@ -0,0 +1,44 @@
+from unittest import TestCase, main
+from . import rpk
+
+CREATE_OUTPUT = '''TOPIC   STATUS
+orders  OK
+events  TOPIC_ALREADY_EXISTS: The topic has already been created.
+logs    INVALID_REPLICATION_FACTOR: Replication factor is below 1 or larger than the number of available brokers.
+'''
+
+
+class TestTopicCommands(TestCase):
+    def test_topics_with_the_same_settings_share_a_call(self):
+        topics = [
+            {'name': 'a', 'partitions': 3, 'replicas': 1, 'config': {'cleanup.policy': 'compact'}},
+            {'name': 'b', 'partitions': 1, 'replicas': 1, 'config': {}},
+            {'name': 'c', 'partitions': 3, 'replicas': 1, 'config': {'cleanup.policy': 'compact'}},
+        ]
+        self.assertEqual(rpk.topic_create_commands(topics), [
+            ['rpk', 'topic', 'create', 'a', 'c', '--partitions', '3', '--replicas', '1',
+             '--topic-config', 'cleanup.policy=compact'],
+            ['rpk', 'topic', 'create', 'b', '--partitions', '1', '--replicas', '1'],
+        ])
+
+    def test_boolean_config(self):
+        topics = [{'name': 'a', 'partitions': 1, 'replicas': 1, 'config': {'redpanda.remote.read': True}}]
+        self.assertIn('redpanda.remote.read=true', rpk.topic_create_commands(topics)[0])
+
+    def test_produce_acks(self):
+        self.assertIn('-1', rpk.produce_command('t', acks='all'))
+
+
+class TestStatusTable(TestCase):
+    def test_statuses(self):
+        statuses = rpk.parse_status_table(CREATE_OUTPUT)
+        self.assertEqual(statuses['events'], 'TOPIC_ALREADY_EXISTS')
+        self.assertEqual(rpk.failed_topics(statuses), {'logs': 'INVALID_REPLICATION_FACTOR'})
+
+    def test_deleted_topics(self):
+        statuses = rpk.parse_status_table('TOPIC  STATUS\na      OK\nb      UNKNOWN_TOPIC_OR_PARTITION: missing\n')
+        self.assertEqual(rpk.failed_topics(statuses, rpk.DELETE_OK), {})
+
+
+if __name__ == '__main__':
+    main()
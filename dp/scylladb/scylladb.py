@@ -2,10 +2,13 @@ import click
 import utils.subprocess_com as utils
 import utils.helm_const as h
 import utils.constants as c
-import time
-from pathlib import Path
-from os import path
-import yaml
+from functools import partial
+from utils.planner import InstallPlan, run_plan
+import utils.teardown as teardown
+from utils.retry import RetryPolicy
+import utils.readiness as ready
+import utils.render as render
+from scylladb import sizing
 
 @click.group()
 def scylladb():
@@ -15,31 +18,152 @@ def scylladb():
 
 @scylladb.command(name='install')
 @click.option('--nodes', '-n', default=1, help='Number of nodes for the scylladb cluster')
-def install(nodes: int):
+@click.option('--profile', default='dev', type=click.Choice(list(sizing.PROFILES)),
+              help='Size of every member: dev, small, production, or auto to size them from the scylla nodes')
+@click.option('--cpu', default=None, help='Cores of every member, replaces the profile value')
+@click.option('--memory', default=None, help='Memory of every member, e.g. 16Gi. Replaces the profile value')
+@click.option('--storage', default=None, help='Data volume of every member, e.g. 200Gi. Replaces the profile value')
+@click.option('--storage-class', default=None, help='Storage class of the data volumes, ideally local NVMe disks')
+@click.option('--racks', default=None, help='Comma separated rack names, the members are spread over them')
+@click.option('--datacenter', default=None, help='Datacenter name. Defaults to us-east-1')
+@click.option('--zone-racks', is_flag=True, help='The racks are availability zones, their members are placed in them')
+@click.option('--node-selector', default=None,
+              help=f'key=value label of the scylla nodes, used by the auto profile. '
+                   f'Defaults to {sizing.NODE_LABEL} with --profile auto')
+@click.option('--cpuset/--no-cpuset', default=None, help='Pin the shards to dedicated cores. Defaults to the profile value')
+@click.option('--plan', 'show_plan', is_flag=True, help='Show the install steps graph and critical path without running it')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum number of install steps running at the same time')
+def install(nodes: int, profile: str, cpu: str, memory: str, storage: str, storage_class: str, racks: str,
+            datacenter: str, zone_racks: bool, node_selector: str, cpuset: bool, show_plan: bool, workers: int):
     """Install scylladb cluster in kubernetes
     
     Args: 
         nodes (int, optional): How many scylladb nodes will be deployed in Kubernetes. Default to 1.
+        profile (str, optional): dev, small, production or auto. Defaults to dev.
+        cpu (str, optional): cores of every member. Defaults to the profile value.
+        memory (str, optional): memory of every member. Defaults to the profile value.
+        storage (str, optional): data volume of every member. Defaults to the profile value.
+        storage_class (str, optional): storage class of the data volumes. Defaults to the cluster default class.
+        racks (str, optional): comma separated rack names. Defaults to us-east-1a.
+        datacenter (str, optional): datacenter name. Defaults to us-east-1.
+        zone_racks (bool, optional): place the members of every rack in the zone with its name. Defaults to False.
+        node_selector (str, optional): key=value label of the scylla nodes. Defaults to none.
+        cpuset (bool, optional): pin the shards to dedicated cores. Defaults to the profile value.
+        show_plan (bool, optional): only print the install plan. Defaults to False.
+        workers (int, optional): maximum number of steps running at the same time. Defaults to no limit.
     """
-    utils.create_ns(c.SCYLLA_NS_OP)
-    utils.create_ns(c.SCYLLA_NS)
-    utils.add_repo(c.SCYLLA_REPO, h.HELM_SCYLLA_REPO)
-    utils.update_helm()
-    utils.apply_cert_manager()
-    utils.install_repo(namespace=c.SCYLLA_NS_OP, repo_name=c.SCYLLA_REPO, operator_name=c.SCYLLA_OP)
-    time.sleep(15)
-    load_yaml(nodes)
-    utils.install_repo(namespace=c.SCYLLA_NS, repo_name=c.SCYLLA_REPO, operator_name=c.SCYLLA_SC_OP, values_yaml=c.SCYLLA_VALUES)
+    rack_names = [rack.strip() for rack in racks.split(',') if rack.strip()] if racks else None
+    run_plan(install_plan(nodes, profile, cpu, memory, storage, storage_class, rack_names, datacenter, zone_racks,
+                          node_selector, cpuset), show_plan, workers)
+
+def install_plan(nodes: int = 1, profile: str = 'dev', cpu: str = None, memory: str = None, storage: str = None,
+                 storage_class: str = None, racks: list[str] = None, datacenter: str = None, zone_racks: bool = False,
+                 node_selector: str = None, cpuset: bool = None, plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to install the scylla operator and a scylladb cluster
+
+    Args:
+        nodes (int, optional): How many scylladb nodes will be deployed in Kubernetes. Default to 1.
+        profile (str, optional): dev, small, production or auto. Defaults to dev.
+        cpu (str, optional): cores of every member. Defaults to the profile value.
+        memory (str, optional): memory of every member. Defaults to the profile value.
+        storage (str, optional): data volume of every member. Defaults to the profile value.
+        storage_class (str, optional): storage class of the data volumes. Defaults to the cluster default class.
+        racks (list[str], optional): rack names. Defaults to us-east-1a.
+        datacenter (str, optional): datacenter name. Defaults to us-east-1.
+        zone_racks (bool, optional): place the members of every rack in the zone with its name. Defaults to False.
+        node_selector (str, optional): key=value label of the scylla nodes. Defaults to none, or to the scylla
+            node label with the auto profile.
+        cpuset (bool, optional): pin the shards to dedicated cores. Defaults to the profile value.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Raises:
+        click.BadParameter: the sizing options are not valid.
+
+    Returns:
+        InstallPlan: plan with the scylladb steps.
+    """
+    if profile == 'auto':
+        if cpu is not None or memory is not None:
+            raise click.BadParameter('cpu and memory are taken from the nodes with the auto profile')
+        node_selector = node_selector or sizing.NODE_LABEL
+    layout = {'racks': racks, 'datacenter': datacenter, 'storage_class': storage_class, 'zone_racks': zone_racks,
+              'node_selector': node_selector}
+    try:
+        size = None if profile == 'auto' else sizing.profile_size(profile, cpu, memory, storage, cpuset)
+        sizing.cluster_values({}, nodes, size or sizing.profile_size('dev'), **layout)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    plan = plan or InstallPlan('scylladb install')
+    plan.add(f'namespace:{c.SCYLLA_NS_OP}', partial(utils.create_ns, c.SCYLLA_NS_OP))
+    plan.add(f'namespace:{c.SCYLLA_NS}', partial(utils.create_ns, c.SCYLLA_NS))
+    plan.add(f'repo:{c.SCYLLA_REPO}', partial(utils.add_repo, c.SCYLLA_REPO, h.HELM_SCYLLA_REPO), estimate=2)
+    plan.add(c.HELM_UPDATE_STEP, utils.update_helm, after=[f'repo:{c.SCYLLA_REPO}'], estimate=5)
+    plan.add(c.CERT_MANAGER_STEP, utils.apply_cert_manager, estimate=120)
+    plan.add(f'install:{c.SCYLLA_NS_OP}',
+             partial(utils.install_repo, namespace=c.SCYLLA_NS_OP, repo_name=c.SCYLLA_REPO, operator_name=c.SCYLLA_OP),
+             after=[f'namespace:{c.SCYLLA_NS_OP}', c.HELM_UPDATE_STEP, c.CERT_MANAGER_STEP], estimate=10)
+    operator_ready = [ready.deployment(c.SCYLLA_OP_DEPLOYMENT, c.SCYLLA_NS_OP), ready.crd(c.SCYLLA_CRD),
+                      ready.webhook(c.SCYLLA_OP_WEBHOOK)]
+    plan.add(f'wait:{c.SCYLLA_NS_OP}', partial(ready.wait_for, operator_ready), after=[f'install:{c.SCYLLA_NS_OP}'],
+             estimate=15)
+    # the webhook can still refuse connections for a few seconds after its CA bundle is injected
+    plan.add(f'install:{c.SCYLLA_NS}', partial(_install_cluster, nodes, size, layout, storage, cpuset),
+             after=[f'namespace:{c.SCYLLA_NS}', f'wait:{c.SCYLLA_NS_OP}'], estimate=10,
+             retry=RetryPolicy(attempts=8, max_delay=15))
+    return plan
+
+def _install_cluster(nodes: int, size: sizing.Size, layout: dict, storage: str = None, cpuset: bool = None):
+    if size is None:
+        scylla_nodes = utils.list_resources('node', selector=layout['node_selector'])
+        try:
+            size = sizing.auto_size(scylla_nodes, nodes, storage, cpuset)
+        except ValueError as e:
+            raise SystemError(str(e))
+    click.echo('-------------------------------------------')
+    click.echo(f'ScyllaDB members: {nodes} x {size.cpu} cores, {size.memory} memory, {size.storage} storage'
+               f'{", pinned cores" if size.cpuset else ""}')
+    for reason in size.reasons:
+        click.echo(f'  {reason}')
+    for warning in sizing.warnings(size):
+        click.echo(f'  Warning: {warning}')
+    click.echo('-------------------------------------------')
+    utils.install_repo(namespace=c.SCYLLA_NS, repo_name=c.SCYLLA_REPO, operator_name=c.SCYLLA_SC_OP,
+                       values=load_yaml(nodes, size, **layout))
 
 @scylladb.command(name="delete")
-def uninstall():
+@click.option('--fast', is_flag=True, help='Kill the pods without graceful termination, for throwaway test clusters')
+@click.option('--timeout', default=teardown.DEFAULT_TIMEOUT, type=int, help='Seconds to wait until the namespaces are gone')
+def uninstall(fast: bool, timeout: int):
     """Uninstall scylladb cluster in kubernetes
     """
-    utils.uninstall_repo(namespace=c.SCYLLA_NS, operator_name=c.SCYLLA_REPO)
-    utils.uninstall_repo(namespace=c.SCYLLA_NS_OP, operator_name=c.SCYLLA_REPO)
-    utils.delete_repo(repo_name=c.SCYLLA_REPO)
-    utils.delete_ns(c.SCYLLA_NS)
-    utils.delete_ns(c.SCYLLA_NS_OP)
+    run_plan(delete_plan(fast=fast, timeout=timeout))
+
+def delete_plan(fast: bool = False, timeout: int = teardown.DEFAULT_TIMEOUT, plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to uninstall the scylladb cluster and the scylla operator.
+    The operator is removed once the cluster namespace is gone, so it can still clean up the cluster resources.
+
+    Args:
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until every namespace is gone. Defaults to 300.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the scylladb delete steps.
+    """
+    plan = plan or InstallPlan('scylladb delete')
+    plan.add(f'uninstall:{c.SCYLLA_NS}', partial(utils.uninstall_repo, namespace=c.SCYLLA_NS, operator_name=c.SCYLLA_REPO),
+             estimate=5)
+    plan.add(f'uninstall:{c.SCYLLA_NS_OP}',
+             partial(utils.uninstall_repo, namespace=c.SCYLLA_NS_OP, operator_name=c.SCYLLA_REPO),
+             after=[f'delete-namespace:{c.SCYLLA_NS}'], estimate=5)
+    plan.add(f'repo-remove:{c.SCYLLA_REPO}', partial(utils.delete_repo, repo_name=c.SCYLLA_REPO),
+             after=[f'uninstall:{c.SCYLLA_NS_OP}'])
+    plan.add(f'delete-namespace:{c.SCYLLA_NS}', partial(teardown.delete_namespace, c.SCYLLA_NS, timeout, fast),
+             after=[f'uninstall:{c.SCYLLA_NS}'], estimate=10)
+    plan.add(f'delete-namespace:{c.SCYLLA_NS_OP}', partial(teardown.delete_namespace, c.SCYLLA_NS_OP, timeout, fast),
+             after=[f'uninstall:{c.SCYLLA_NS_OP}'], estimate=10)
+    return plan
 
 
 @scylladb.command(name="revision")
@@ -49,30 +173,16 @@ def status():
     utils.run_helm_revision(c.SCYLLA_NS_OP)
 
     
-def load_yaml(nodes: int):
-    absolute = str(Path(__file__).parent.parent)
-    values_path = path.join(absolute, 'resources', 'scylla-values.yaml')
-    with open(values_path) as f:
-        doc = yaml.safe_load(f)
-    doc['racks'] = [{
-        'name': "us-east-1a",
-        'scyllaConfig': 'scylla-config',
-        'scyllaAgentConfig': 'scylla-agent-config',
-        'members': nodes,
-        'storage': {
-          'capacity': '10Gi'
-        },
-        'resources': {
-           'limits': {
-             'cpu': 1,
-             'memory': '4Gi'
-           },
-           'requests': {
-             'cpu': 1,
-             'memory': '4Gi'
-           }
-        }
-    }]
-    with open(values_path, 'w') as f:
-        yaml.safe_dump(doc, f, default_flow_style=False)
-        
\ No newline at end of file
+def load_yaml(nodes: int, size: sizing.Size = None, **layout) -> dict:
+    """Build the scylla cluster values from the packaged template, the template file is not modified.
+
+    Args:
+        nodes (int): How many scylladb nodes will be deployed in Kubernetes.
+        size (sizing.Size, optional): resources of every member. Defaults to the dev profile.
+        layout: racks, datacenter, storage_class, zone_racks and node_selector of `sizing.cluster_values`.
+
+    Returns:
+        dict: helm values for the scylla cluster chart.
+    """
+    return sizing.cluster_values(render.load_template(c.SCYLLA_VALUES), nodes, size or sizing.profile_size('dev'),
+                                 **layout)
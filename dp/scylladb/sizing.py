@@ -0,0 +1,220 @@
+import copy
+import math
+import re
+
+DEFAULT_DATACENTER = 'us-east-1'
+DEFAULT_RACKS = ['us-east-1a']
+# label of the nodes dedicated to scylla in the scylla operator docs
+NODE_LABEL = 'scylla.scylladb.com/node-type=scylla'
+ZONE_LABEL = 'topology.kubernetes.io/zone'
+# scylla-manager-agent sidecar, requests equal to limits so the pod keeps the Guaranteed QoS class
+AGENT_RESOURCES = {'cpu': '100m', 'memory': '200Mi'}
+# left on every node for the kubelet, the daemonsets and the agent when the members are sized from the nodes
+RESERVED_CPU = 1
+RESERVED_MEMORY_FRACTION = 0.1
+RESERVED_MEMORY = 1024 ** 3
+# scylla needs about 2 GiB for every core it runs a shard on
+MEMORY_PER_CPU = 2 * 1024 ** 3
+
+PROFILES = {
+    # the former defaults: enough for a laptop, shards share the cores with other pods
+    'dev': {'cpu': 1, 'memory': '4Gi', 'storage': '10Gi', 'cpuset': False},
+    'small': {'cpu': 2, 'memory': '8Gi', 'storage': '50Gi', 'cpuset': True},
+    'production': {'cpu': 8, 'memory': '32Gi', 'storage': '500Gi', 'cpuset': True},
+    # cpu and memory taken from the allocatable resources of the scylla nodes
+    'auto': {'storage': '100Gi', 'cpuset': True},
+}
+
+_QUANTITY = re.compile(r'^(\d+(?:\.\d+)?)(m|Ki|Mi|Gi|Ti|k|K|M|G|T)?$')
+_FACTORS = {None: 1, 'm': 0.001, 'k': 1000, 'K': 1000, 'M': 1000 ** 2, 'G': 1000 ** 3, 'T': 1000 ** 4,
+            'Ki': 1024, 'Mi': 1024 ** 2, 'Gi': 1024 ** 3, 'Ti': 1024 ** 4}
+
+
+class Size:
+    """Resources of every scylla member.
+
+    Args:
+        cpu (int): cores of every member, requests equal to limits.
+        memory (str): memory of every member, e.g. '8Gi'.
+        storage (str): capacity of the data volume of every member, e.g. '100Gi'.
+        cpuset (bool): pin the shards to dedicated cores, needs the static CPU manager policy in the kubelet.
+        reasons (list[str], optional): how the size was chosen.
+    """
+
+    def __init__(self, cpu: int, memory: str, storage: str, cpuset: bool, reasons: list[str] = None):
+        self.cpu = cpu
+        self.memory = memory
+        self.storage = storage
+        self.cpuset = cpuset
+        self.reasons = reasons or []
+
+
+def quantity(value) -> float:
+    """Number of a kubernetes quantity: cores for '500m' or '4', bytes for '8Gi' or '16000000Ki'.
+
+    Raises:
+        ValueError: the quantity is not valid.
+    """
+    match = _QUANTITY.match(str(value))
+    if match is None:
+        raise ValueError(f'invalid quantity {value}, use values like 2, 500m, 8Gi or 100G')
+    return float(match.group(1)) * _FACTORS[match.group(2)]
+
+
+def profile_size(profile: str, cpu: str = None, memory: str = None, storage: str = None,
+                 cpuset: bool = None) -> Size:
+    """Size of a profile with the given values replacing the profile ones.
+
+    Args:
+        profile (str): one of PROFILES except auto.
+        cpu (str, optional): cores of every member. Defaults to the profile value.
+        memory (str, optional): memory of every member. Defaults to the profile value.
+        storage (str, optional): data volume of every member. Defaults to the profile value.
+        cpuset (bool, optional): pin the shards to dedicated cores. Defaults to the profile value.
+
+    Raises:
+        ValueError: the profile is unknown or the values are not valid.
+
+    Returns:
+        Size: resources of every member.
+    """
+    if profile not in PROFILES or profile == 'auto':
+        raise ValueError(f'unknown profile {profile}, valid profiles: {", ".join(PROFILES)}')
+    values = PROFILES[profile]
+    return _checked(Size(cpu if cpu is not None else values['cpu'], memory or values['memory'],
+                         storage or values['storage'], values['cpuset'] if cpuset is None else cpuset,
+                         [f'{profile} profile']))
+
+
+def auto_size(nodes: list[dict], members: int, storage: str = None, cpuset: bool = None) -> Size:
+    """Size the members from the allocatable resources of the scylla nodes, one member per node.
+
+    The smallest node decides, so a member fits on any of them. A core and a tenth of the memory plus 1 GiB are
+    left to the kubelet, the daemonsets and the scylla-manager-agent sidecar.
+
+    Args:
+        nodes (list[dict]): Node resources, e.g. the items of `kubectl get nodes -l <label> -o json`.
+        members (int): members of the cluster.
+        storage (str, optional): data volume of every member. Defaults to the auto profile value.
+        cpuset (bool, optional): pin the shards to dedicated cores. Defaults to True.
+
+    Raises:
+        ValueError: there are fewer nodes than members, or the nodes are too small.
+
+    Returns:
+        Size: resources of every member with the reasons.
+    """
+    if len(nodes) < members:
+        raise ValueError(f'{members} members need {members} scylla nodes, found {len(nodes)}. '
+                         f'Label the nodes with {NODE_LABEL} or use --node-selector')
+    allocatable = [node.get('status', {}).get('allocatable', {}) for node in nodes]
+    smallest = min(allocatable, key=lambda resources: (quantity(resources.get('cpu', 0)),
+                                                       quantity(resources.get('memory', 0))))
+    node_cpu = quantity(smallest.get('cpu', 0))
+    node_memory = quantity(smallest.get('memory', 0))
+    cpu = math.floor(node_cpu) - RESERVED_CPU
+    memory_gib = math.floor((node_memory * (1 - RESERVED_MEMORY_FRACTION) - RESERVED_MEMORY) / 1024 ** 3)
+    if cpu < 1 or memory_gib < 1:
+        raise ValueError(f'the smallest scylla node has {node_cpu:g} cores and {node_memory / 1024 ** 3:.1f}Gi '
+                         f'allocatable, too small for a dedicated member')
+    reasons = [f'smallest of {len(nodes)} scylla nodes: {node_cpu:g} cores, {node_memory / 1024 ** 3:.1f}Gi allocatable',
+               f'{RESERVED_CPU} core and {RESERVED_MEMORY_FRACTION:.0%} of the memory + 1Gi left to the node']
+    return _checked(Size(cpu, f'{memory_gib}Gi', storage or PROFILES['auto']['storage'],
+                         True if cpuset is None else cpuset, reasons))
+
+
+def warnings(size: Size) -> list[str]:
+    """Sizes that work but starve scylla.
+    """
+    found = []
+    if quantity(size.memory) < size.cpu * MEMORY_PER_CPU:
+        found.append(f'{size.memory} is less than 2Gi for every one of the {size.cpu} cores')
+    if not size.cpuset:
+        found.append('the shards are not pinned to dedicated cores, latency suffers when other pods use them')
+    return found
+
+
+def rack_members(members: int, racks: int) -> list[int]:
+    """Members of every rack, the first racks get one more when they can't be even.
+    """
+    return [members // racks + (1 if rack < members % racks else 0) for rack in range(racks)]
+
+
+def cluster_values(template: dict, members: int, size: Size, racks: list[str] = None, datacenter: str = None,
+                   storage_class: str = None, zone_racks: bool = False, node_selector: str = None) -> dict:
+    """Helm values of the scylla chart with the members spread over the racks.
+
+    Every member gets the same requests and limits, integer cores and a sidecar with requests equal to limits, so
+    the pods have the Guaranteed QoS class and, with cpuset, the kubelet gives them dedicated cores. Developer
+    mode stays off so scylla tunes the I/O of the node.
+
+    Args:
+        template (dict): packaged values, it is not modified.
+        members (int): members of the cluster.
+        size (Size): resources of every member.
+        racks (list[str], optional): rack names. Defaults to DEFAULT_RACKS.
+        datacenter (str, optional): datacenter name. Defaults to the template value.
+        storage_class (str, optional): storage class of the data volumes. Defaults to the cluster default class.
+        zone_racks (bool, optional): the racks are availability zones, their members are placed in them.
+        node_selector (str, optional): `key=value` label of the nodes where the members are placed.
+
+    Raises:
+        ValueError: there are more racks than members.
+
+    Returns:
+        dict: helm values.
+    """
+    racks = racks or DEFAULT_RACKS
+    if len(racks) > members:
+        raise ValueError(f'{len(racks)} racks need at least {len(racks)} members')
+    values = copy.deepcopy(template)
+    values['developerMode'] = False
+    values['cpuset'] = size.cpuset
+    if datacenter:
+        values['datacenter'] = datacenter
+    resources = {'cpu': size.cpu, 'memory': size.memory}
+    values['racks'] = []
+    for name, rack_size in zip(racks, rack_members(members, len(racks))):
+        storage = {'capacity': size.storage}
+        if storage_class:
+            storage['storageClassName'] = storage_class
+        rack = {
+            'name': name,
+            'scyllaConfig': 'scylla-config',
+            'scyllaAgentConfig': 'scylla-agent-config',
+            'members': rack_size,
+            'storage': storage,
+            'resources': {'limits': dict(resources), 'requests': dict(resources)},
+            'agentResources': {'limits': dict(AGENT_RESOURCES), 'requests': dict(AGENT_RESOURCES)},
+        }
+        placement = _placement(name if zone_racks else None, node_selector)
+        if placement:
+            rack['placement'] = placement
+        values['racks'].append(rack)
+    return values
+
+
+def _placement(zone: str, node_selector: str) -> dict:
+    expressions = []
+    if zone is not None:
+        expressions.append({'key': ZONE_LABEL, 'operator': 'In', 'values': [zone]})
+    if node_selector:
+        key, _, value = node_selector.partition('=')
+        expressions.append({'key': key, 'operator': 'In', 'values': [value]} if value else
+                           {'key': key, 'operator': 'Exists'})
+    if not expressions:
+        return {}
+    return {'nodeAffinity': {'requiredDuringSchedulingIgnoredDuringExecution': {
+        'nodeSelectorTerms': [{'matchExpressions': expressions}]}}}
+
+
+def _checked(size: Size) -> Size:
+    cores = quantity(size.cpu)
+    if cores <= 0:
+        raise ValueError('the members need some cpu')
+    if size.cpuset and cores != int(cores):
+        raise ValueError(f'cpuset needs whole cores, got {size.cpu}')
+    size.cpu = int(cores) if cores == int(cores) else str(size.cpu)
+    if quantity(size.memory) <= 0 or quantity(size.storage) <= 0:
+        raise ValueError('memory and storage must be greater than 0')
+    return size
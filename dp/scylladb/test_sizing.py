@@ -0,0 +1,78 @@
+from unittest import TestCase, main
+from .sizing import AGENT_RESOURCES, auto_size, cluster_values, profile_size, quantity, rack_members, warnings
+
+TEMPLATE = {'datacenter': 'us-east-1', 'developerMode': True, 'cpuset': False, 'racks': [{'name': 'us-east-1a'}]}
+
+
+def node(cpu: str, memory: str) -> dict:
+    return {'metadata': {'name': f'node-{cpu}'}, 'status': {'allocatable': {'cpu': cpu, 'memory': memory}}}
+
+
+class TestQuantity(TestCase):
+    def test_units(self):
+        self.assertEqual(quantity('3920m'), 3.92)
+        self.assertEqual(quantity('16Gi'), 16 * 1024 ** 3)
+        self.assertEqual(quantity(4), 4)
+        with self.assertRaises(ValueError):
+            quantity('four')
+
+
+class TestProfiles(TestCase):
+    def test_profile_values_can_be_replaced(self):
+        size = profile_size('small', cpu='4', storage='200Gi')
+        self.assertEqual((size.cpu, size.memory, size.storage, size.cpuset), (4, '8Gi', '200Gi', True))
+        self.assertEqual(profile_size('dev', cpu='500m').cpu, '500m')
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(ValueError):
+            profile_size('small', cpu='1.5')
+        with self.assertRaises(ValueError):
+            profile_size('auto')
+        with self.assertRaises(ValueError):
+            profile_size('dev', memory='0')
+
+    def test_warnings(self):
+        self.assertEqual(warnings(profile_size('production')), [])
+        self.assertEqual(len(warnings(profile_size('dev', cpu='4'))), 2)
+
+
+class TestAutoSize(TestCase):
+    def test_smallest_node_decides(self):
+        size = auto_size([node('16', '64Gi'), node('7910m', '32Gi')], members=2)
+        self.assertEqual((size.cpu, size.memory, size.storage, size.cpuset), (6, '27Gi', '100Gi', True))
+        self.assertIn('7.91 cores', size.reasons[0])
+
+    def test_not_enough_nodes(self):
+        with self.assertRaisesRegex(ValueError, '3 members need 3 scylla nodes'):
+            auto_size([node('16', '64Gi')], members=3)
+        with self.assertRaises(ValueError):
+            auto_size([node('1', '2Gi')], members=1)
+
+
+class TestClusterValues(TestCase):
+    def test_members_spread_over_racks(self):
+        self.assertEqual(rack_members(5, 3), [2, 2, 1])
+        values = cluster_values(TEMPLATE, 5, profile_size('small'), racks=['a', 'b', 'c'], datacenter='eu-west-1',
+                                storage_class='local-nvme')
+        self.assertEqual([rack['members'] for rack in values['racks']], [2, 2, 1])
+        self.assertEqual((values['datacenter'], values['developerMode'], values['cpuset']), ('eu-west-1', False, True))
+        rack = values['racks'][0]
+        self.assertEqual(rack['resources']['limits'], rack['resources']['requests'])
+        self.assertEqual(rack['agentResources']['limits'], AGENT_RESOURCES)
+        self.assertEqual(rack['storage'], {'capacity': '50Gi', 'storageClassName': 'local-nvme'})
+        self.assertNotIn('placement', rack)
+        self.assertEqual(TEMPLATE['racks'], [{'name': 'us-east-1a'}])
+
+    def test_placement(self):
+        rack = cluster_values(TEMPLATE, 1, profile_size('dev'), racks=['eu-west-1b'], zone_racks=True,
+                              node_selector='scylla.scylladb.com/node-type=scylla')['racks'][0]
+        terms = rack['placement']['nodeAffinity']['requiredDuringSchedulingIgnoredDuringExecution']['nodeSelectorTerms']
+        self.assertEqual(terms[0]['matchExpressions'],
+                         [{'key': 'topology.kubernetes.io/zone', 'operator': 'In', 'values': ['eu-west-1b']},
+                          {'key': 'scylla.scylladb.com/node-type', 'operator': 'In', 'values': ['scylla']}])
+        with self.assertRaises(ValueError):
+            cluster_values(TEMPLATE, 1, profile_size('dev'), racks=['a', 'b'])
+
+
+if __name__ == '__main__':
+    main()
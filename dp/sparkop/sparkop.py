@@ -2,6 +2,10 @@ import click
 import utils.subprocess_com as utils
 import utils.helm_const as h
 import utils.constants as c
+from functools import partial
+from utils.planner import InstallPlan, run_plan
+import utils.teardown as teardown
+import utils.readiness as ready
 
 @click.group()
 def sparkop():
@@ -10,24 +14,65 @@ def sparkop():
     """
 
 @sparkop.command(name='install')
-def install():
+@click.option('--plan', 'show_plan', is_flag=True, help='Show the install steps graph and critical path without running it')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum number of install steps running at the same time')
+def install(show_plan: bool, workers: int):
     """Install spark operator in kubernetes
+
+    Args:
+        show_plan (bool, optional): only print the install plan. Defaults to False.
+        workers (int, optional): maximum number of steps running at the same time. Defaults to no limit.
+    """
+    run_plan(install_plan(), show_plan, workers)
+
+def install_plan(plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to install the spark operator
+
+    Args:
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the spark operator steps.
     """
-    utils.create_ns(c.SPARK_NS_OP)
-    utils.create_ns(c.SPARK_NS)
-    utils.add_repo(c.SPARK_REPO, h.HELM_SPARK_REPO)
+    plan = plan or InstallPlan('sparkop install')
+    plan.add(f'namespace:{c.SPARK_NS_OP}', partial(utils.create_ns, c.SPARK_NS_OP))
+    plan.add(f'namespace:{c.SPARK_NS}', partial(utils.create_ns, c.SPARK_NS))
+    plan.add(f'repo:{c.SPARK_REPO}', partial(utils.add_repo, c.SPARK_REPO, h.HELM_SPARK_REPO), estimate=2)
     """The spark operator chart helm points to an image that is not found in the kubeflow/spark-operator registry for now.
     So the version of the image in the resources/sparkop-values.yaml is modified with the correct version."""
-    utils.install_repo(c.SPARK_NS_OP, c.SPARK_REPO, c.SPARK_OP, c.SPARK_VALUES)
+    plan.add(f'install:{c.SPARK_NS_OP}', partial(utils.install_repo, c.SPARK_NS_OP, c.SPARK_REPO, c.SPARK_OP, c.SPARK_VALUES),
+             after=[f'namespace:{c.SPARK_NS_OP}', f'namespace:{c.SPARK_NS}', f'repo:{c.SPARK_REPO}'], estimate=10)
+    plan.add(f'wait:{c.SPARK_NS_OP}', partial(ready.wait_for, [ready.deployment(c.SPARK_OP_DEPLOYMENT, c.SPARK_NS_OP)]),
+             after=[f'install:{c.SPARK_NS_OP}'], estimate=30)
+    return plan
 
 @sparkop.command(name="delete")
-def delete():
+@click.option('--fast', is_flag=True, help='Kill the pods without graceful termination, for throwaway test clusters')
+@click.option('--timeout', default=teardown.DEFAULT_TIMEOUT, type=int, help='Seconds to wait until the namespaces are gone')
+def delete(fast: bool, timeout: int):
     """Uninstall spark operator from kubernetes
     """
-    utils.uninstall_repo(c.SPARK_NS_OP, c.SPARK_REPO)
-    utils.delete_repo(c.SPARK_REPO)
-    utils.delete_ns(c.SPARK_NS_OP)
-    utils.delete_ns(c.SPARK_NS)
+    run_plan(delete_plan(fast=fast, timeout=timeout))
+
+def delete_plan(fast: bool = False, timeout: int = teardown.DEFAULT_TIMEOUT, plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to uninstall the spark operator
+
+    Args:
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until every namespace is gone. Defaults to 300.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the spark operator delete steps.
+    """
+    plan = plan or InstallPlan('sparkop delete')
+    plan.add(f'uninstall:{c.SPARK_NS_OP}', partial(utils.uninstall_repo, c.SPARK_NS_OP, c.SPARK_REPO), estimate=5)
+    plan.add(f'repo-remove:{c.SPARK_REPO}', partial(utils.delete_repo, c.SPARK_REPO), after=[f'uninstall:{c.SPARK_NS_OP}'])
+    plan.add(f'delete-namespace:{c.SPARK_NS_OP}', partial(teardown.delete_namespace, c.SPARK_NS_OP, timeout, fast),
+             after=[f'uninstall:{c.SPARK_NS_OP}'], estimate=10)
+    plan.add(f'delete-namespace:{c.SPARK_NS}', partial(teardown.delete_namespace, c.SPARK_NS, timeout, fast),
+             after=[f'uninstall:{c.SPARK_NS_OP}'], estimate=10)
+    return plan
 
 @sparkop.command(name="revision")
 def status():
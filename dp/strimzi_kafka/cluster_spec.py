@@ -0,0 +1,248 @@
+import re
+
+KAFKA_VERSION = '3.7.0'
+API_VERSION = 'kafka.strimzi.io/v1beta2'
+MODES = ('kraft', 'zookeeper')
+
+# broker settings of every profile, the replication settings are derived from the number of brokers
+PROFILES = {
+    'default': {},
+    # big batches: more network and disk threads, large socket buffers, compressed logs and parallel replication
+    'throughput': {
+        'num.network.threads': 8,
+        'num.io.threads': 16,
+        'socket.send.buffer.bytes': 1048576,
+        'socket.receive.buffer.bytes': 1048576,
+        'socket.request.max.bytes': 104857600,
+        'queued.max.requests': 1000,
+        'compression.type': 'lz4',
+        'num.replica.fetchers': 4,
+        'replica.fetch.max.bytes': 10485760,
+        'replica.socket.receive.buffer.bytes': 1048576,
+    },
+    # small requests answered at once: followers fetch without waiting, no recompression in the broker
+    'low-latency': {
+        'num.network.threads': 8,
+        'num.io.threads': 8,
+        'compression.type': 'producer',
+        'num.replica.fetchers': 2,
+        'replica.fetch.wait.max.ms': 50,
+        'replica.fetch.min.bytes': 1,
+        'group.initial.rebalance.delay.ms': 0,
+    },
+    # no acknowledged write is lost while a single broker is down
+    'durable': {
+        'unclean.leader.election.enable': False,
+        'auto.create.topics.enable': False,
+        'num.replica.fetchers': 2,
+        'replica.lag.time.max.ms': 30000,
+        'compression.type': 'producer',
+    },
+}
+
+_QUANTITY = re.compile(r'^(\d+(?:\.\d+)?)(Ki|Mi|Gi|Ti|K|M|G|T)?$')
+_BYTES = {None: 1, 'K': 1000, 'M': 1000 ** 2, 'G': 1000 ** 3, 'T': 1000 ** 4,
+          'Ki': 1024, 'Mi': 1024 ** 2, 'Gi': 1024 ** 3, 'Ti': 1024 ** 4}
+
+
+def replication_config(brokers: int, profile: str = 'default') -> dict:
+    """Replication factors that fit the number of brokers: 3 replicas and 2 in-sync replicas when possible.
+
+    Args:
+        brokers (int): number of brokers.
+        profile (str, optional): tuning profile, `durable` needs at least 3 brokers. Defaults to 'default'.
+
+    Raises:
+        ValueError: the durable profile is used with less than 3 brokers.
+
+    Returns:
+        dict: broker config with the replication factors of the internal and new topics.
+    """
+    if profile == 'durable' and brokers < 3:
+        raise ValueError('the durable profile needs at least 3 brokers')
+    replicas = min(brokers, 3)
+    min_isr = max(replicas - 1, 1)
+    return {
+        'offsets.topic.replication.factor': replicas,
+        'transaction.state.log.replication.factor': replicas,
+        'transaction.state.log.min.isr': min_isr,
+        'default.replication.factor': replicas,
+        'min.insync.replicas': min_isr,
+    }
+
+
+def storage_spec(size: str = None, storage_class: str = None, volumes: int = 1, delete_claim: bool = False) -> dict:
+    """Strimzi storage: ephemeral without a size, otherwise a JBOD of persistent volumes.
+
+    Args:
+        size (str, optional): size of every volume, e.g. '100Gi'. Defaults to None (ephemeral).
+        storage_class (str, optional): storage class of the volumes. Defaults to the cluster default class.
+        volumes (int, optional): number of JBOD volumes per broker. Defaults to 1.
+        delete_claim (bool, optional): delete the volumes with the cluster. Defaults to False.
+
+    Returns:
+        dict: `storage` section of the Kafka or KafkaNodePool spec.
+    """
+    if size is None:
+        return {'type': 'ephemeral'}
+    _bytes(size)
+    claims = []
+    for volume in range(volumes):
+        claim = {'id': volume, 'type': 'persistent-claim', 'size': size, 'deleteClaim': delete_claim}
+        if storage_class:
+            claim['class'] = storage_class
+        claims.append(claim)
+    return {'type': 'jbod', 'volumes': claims}
+
+
+def resources_spec(cpu: str = None, memory: str = None) -> dict:
+    """Requests of every broker, the memory limit equals the request so the broker is never throttled by the
+    node memory pressure.
+    """
+    if cpu is None and memory is None:
+        return None
+    requests = {}
+    limits = {}
+    if cpu is not None:
+        requests['cpu'] = str(cpu)
+    if memory is not None:
+        requests['memory'] = limits['memory'] = memory
+    spec = {'requests': requests}
+    if limits:
+        spec['limits'] = limits
+    return spec
+
+
+def jvm_options(memory: str) -> dict:
+    """Java heap of half the broker memory, the rest is left to the page cache that Kafka relies on.
+    """
+    if memory is None:
+        return None
+    heap = f'{max(_bytes(memory) // 2 // 1024 ** 2, 256)}m'
+    return {'-Xms': heap, '-Xmx': heap}
+
+
+def build_cluster(name: str = 'my-cluster', brokers: int = 3, mode: str = 'kraft', controllers: int = 0,
+                  storage_size: str = None, storage_class: str = None, volumes: int = 1, delete_claim: bool = False,
+                  cpu: str = None, memory: str = None, profile: str = 'default', config: dict = None,
+                  kafka_version: str = KAFKA_VERSION, namespace: str = None, cruise_control: bool = False) -> list[dict]:
+    """Build the Strimzi resources of a Kafka cluster.
+
+    In KRaft mode the brokers are described by KafkaNodePools: a single pool with the broker and controller
+    roles, or a broker pool plus a dedicated controller pool when `controllers` is set. In ZooKeeper mode the
+    brokers are described in the Kafka resource and a ZooKeeper ensemble of up to 3 nodes is added.
+
+    Args:
+        name (str, optional): name of the cluster. Defaults to 'my-cluster'.
+        brokers (int, optional): number of brokers. Defaults to 3.
+        mode (str, optional): 'kraft' or 'zookeeper'. Defaults to 'kraft'.
+        controllers (int, optional): dedicated KRaft controllers, 0 makes the brokers controllers too. Defaults to 0.
+        storage_size (str, optional): size of every JBOD volume, e.g. '100Gi'. Defaults to None (ephemeral).
+        storage_class (str, optional): storage class of the volumes. Defaults to the cluster default class.
+        volumes (int, optional): JBOD volumes per broker. Defaults to 1.
+        delete_claim (bool, optional): delete the volumes with the cluster. Defaults to False.
+        cpu (str, optional): CPU request of every broker, e.g. '2'. Defaults to None.
+        memory (str, optional): memory of every broker, e.g. '8Gi'. Defaults to None.
+        profile (str, optional): broker tuning profile, one of PROFILES. Defaults to 'default'.
+        config (dict, optional): broker config applied over the profile. Defaults to None.
+        kafka_version (str, optional): Kafka version. Defaults to KAFKA_VERSION.
+        namespace (str, optional): namespace written in the metadata. Defaults to None.
+        cruise_control (bool, optional): deploy Cruise Control to rebalance the partitions. Defaults to False.
+
+    Raises:
+        ValueError: an option is out of range or unknown.
+
+    Returns:
+        list[dict]: the KafkaNodePools (KRaft mode) followed by the Kafka resource.
+    """
+    if mode not in MODES:
+        raise ValueError(f'unknown mode {mode}, valid modes: {", ".join(MODES)}')
+    if profile not in PROFILES:
+        raise ValueError(f'unknown profile {profile}, valid profiles: {", ".join(PROFILES)}')
+    if brokers < 1 or volumes < 1 or controllers < 0:
+        raise ValueError('brokers and volumes must be greater than 0 and controllers can\'t be negative')
+    if controllers and mode != 'kraft':
+        raise ValueError('dedicated controllers are only used in KRaft mode')
+    if cruise_control and brokers < 2:
+        raise ValueError('Cruise Control needs at least 2 brokers')
+
+    broker_config = {**replication_config(brokers, profile), **PROFILES[profile], **(config or {})}
+    storage = storage_spec(storage_size, storage_class, volumes, delete_claim)
+    kafka = {
+        'version': kafka_version,
+        'listeners': [
+            {'name': 'plain', 'port': 9092, 'type': 'internal', 'tls': False},
+            {'name': 'tls', 'port': 9093, 'type': 'internal', 'tls': True},
+        ],
+        'config': broker_config,
+    }
+    _set_resources(kafka, cpu, memory)
+    spec = {'kafka': kafka, 'entityOperator': {'topicOperator': {}, 'userOperator': {}}}
+    if cruise_control:
+        spec['cruiseControl'] = {}
+    cluster = {'apiVersion': API_VERSION, 'kind': 'Kafka', 'metadata': _metadata(name, namespace), 'spec': spec}
+
+    if mode == 'zookeeper':
+        broker_config['inter.broker.protocol.version'] = '.'.join(kafka_version.split('.')[:2])
+        kafka['replicas'] = brokers
+        kafka['storage'] = storage
+        spec['zookeeper'] = {'replicas': min(brokers, 3), 'storage': _zookeeper_storage(storage)}
+        return [cluster]
+
+    cluster['metadata']['annotations'] = {'strimzi.io/node-pools': 'enabled', 'strimzi.io/kraft': 'enabled'}
+    pools = []
+    if controllers:
+        pools.append(node_pool(f'{name}-controller', name, controllers, ['controller'], storage_spec(
+            storage_size and '10Gi', storage_class, 1, delete_claim), namespace=namespace))
+        pools.append(node_pool(f'{name}-broker', name, brokers, ['broker'], storage, cpu, memory, namespace))
+    else:
+        pools.append(node_pool(f'{name}-dual-role', name, brokers, ['controller', 'broker'], storage, cpu, memory, namespace))
+    return pools + [cluster]
+
+
+def node_pool(pool: str, cluster: str, replicas: int, roles: list[str], storage: dict, cpu: str = None,
+              memory: str = None, namespace: str = None) -> dict:
+    """KafkaNodePool of a KRaft cluster. The pool names are prefixed with the cluster name, so several clusters can
+    share a namespace.
+    """
+    metadata = _metadata(pool, namespace)
+    metadata['labels'] = {'strimzi.io/cluster': cluster}
+    spec = {'replicas': replicas, 'roles': roles, 'storage': storage}
+    _set_resources(spec, cpu, memory)
+    return {'apiVersion': API_VERSION, 'kind': 'KafkaNodePool', 'metadata': metadata, 'spec': spec}
+
+
+def _set_resources(spec: dict, cpu: str, memory: str) -> None:
+    resources = resources_spec(cpu, memory)
+    if resources is not None:
+        spec['resources'] = resources
+    heap = jvm_options(memory)
+    if heap is not None:
+        spec['jvmOptions'] = heap
+
+
+def _zookeeper_storage(storage: dict) -> dict:
+    if storage['type'] == 'ephemeral':
+        return storage
+    volume = dict(storage['volumes'][0])
+    volume.pop('id')
+    return volume
+
+
+def _metadata(name: str, namespace: str) -> dict:
+    metadata = {'name': name}
+    if namespace is not None:
+        metadata['namespace'] = namespace
+    return metadata
+
+
+def _bytes(quantity: str) -> int:
+    """Bytes of a kubernetes quantity such as '8Gi' or '500M'.
+
+    Raises:
+        ValueError: the quantity is not valid.
+    """
+    match = _QUANTITY.match(str(quantity))
+    if match is None:
+        raise ValueError(f'invalid quantity {quantity}, use values like 512Mi, 8Gi or 100G')
+    return int(float(match.group(1)) * _BYTES[match.group(2)])
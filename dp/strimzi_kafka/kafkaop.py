@@ -1,10 +1,23 @@
 import click
+import time
 import utils.subprocess_com as utils
 import utils.helm_const as h
 import utils.constants as c
-from os import path
-from pathlib import Path
-import yaml
+from functools import partial
+from utils.planner import InstallPlan, run_plan
+import utils.teardown as teardown
+import utils.readiness as ready
+import utils.render as render
+from collections import deque
+from contextlib import ExitStack
+from utils.executor import get_executor, run_parallel
+import utils.streaming as streaming
+import utils.perf as perf
+from utils.benchmark import run_benchmark
+from strimzi_kafka.topics import batch_documents, parse_catalog, parse_settings, timing_summary
+from strimzi_kafka import cluster_spec, lag, rebalance, records, sizing
+
+DELETE_CHUNK = 100
 
 @click.group()
 def kafkaop():
@@ -13,22 +26,63 @@ def kafkaop():
     """
 
 @kafkaop.command(name='install')
-def install():
+@click.option('--plan', 'show_plan', is_flag=True, help='Show the install steps graph and critical path without running it')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum number of install steps running at the same time')
+def install(show_plan: bool, workers: int):
     """Install strimzi kafka operator in kubernetes.
+
+    Args:
+        show_plan (bool, optional): only print the install plan. Defaults to False.
+        workers (int, optional): maximum number of steps running at the same time. Defaults to no limit.
+    """
+    run_plan(install_plan(), show_plan, workers)
+
+def install_plan(plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to install the strimzi kafka operator.
+
+    Args:
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the strimzi kafka operator steps.
     """
-    utils.create_ns(c.KAFKA_NS_OP)
-    utils.create_ns(c.KAFKA_NS)
-    utils.add_repo(c.KAFKA_REPO, h.HELM_KAFKA_REPO)
-    utils.install_repo(c.KAFKA_NS_OP, c.KAFKA_REPO, c.KAFKA_OP, c.KAFKA_OP_VALUES)
+    plan = plan or InstallPlan('kafkaop install')
+    plan.add(f'namespace:{c.KAFKA_NS_OP}', partial(utils.create_ns, c.KAFKA_NS_OP))
+    plan.add(f'namespace:{c.KAFKA_NS}', partial(utils.create_ns, c.KAFKA_NS))
+    plan.add(f'repo:{c.KAFKA_REPO}', partial(utils.add_repo, c.KAFKA_REPO, h.HELM_KAFKA_REPO), estimate=2)
+    plan.add(f'install:{c.KAFKA_NS_OP}',
+             partial(utils.install_repo, c.KAFKA_NS_OP, c.KAFKA_REPO, c.KAFKA_OP, c.KAFKA_OP_VALUES),
+             after=[f'namespace:{c.KAFKA_NS_OP}', f'namespace:{c.KAFKA_NS}', f'repo:{c.KAFKA_REPO}'], estimate=10)
+    plan.add(f'wait:{c.KAFKA_NS_OP}', partial(ready.wait_for, [ready.deployment(c.KAFKA_OP_DEPLOYMENT, c.KAFKA_NS_OP)]),
+             after=[f'install:{c.KAFKA_NS_OP}'], estimate=30)
+    return plan
 
 
 @kafkaop.command(name="delete")
-def delete():
+@click.option('--fast', is_flag=True, help='Kill the pods without graceful termination, for throwaway test clusters')
+@click.option('--timeout', default=teardown.DEFAULT_TIMEOUT, type=int, help='Seconds to wait until the namespaces are gone')
+def delete(fast: bool, timeout: int):
     """Uninstall strimzi kafka operator from kubernetes.
     """
-    utils.uninstall_repo(c.KAFKA_NS_OP, c.KAFKA_REPO)
-    utils.delete_repo(c.KAFKA_REPO)
-    utils.delete_ns(c.KAFKA_NS_OP)
+    run_plan(delete_plan(fast=fast, timeout=timeout))
+
+def delete_plan(fast: bool = False, timeout: int = teardown.DEFAULT_TIMEOUT, plan: InstallPlan = None) -> InstallPlan:
+    """Steps needed to uninstall the strimzi kafka operator.
+
+    Args:
+        fast (bool, optional): kill the pods without graceful termination. Defaults to False.
+        timeout (int, optional): seconds to wait until every namespace is gone. Defaults to 300.
+        plan (InstallPlan, optional): plan where the steps are added. Defaults to a new plan.
+
+    Returns:
+        InstallPlan: plan with the strimzi kafka operator delete steps.
+    """
+    plan = plan or InstallPlan('kafkaop delete')
+    plan.add(f'uninstall:{c.KAFKA_NS_OP}', partial(utils.uninstall_repo, c.KAFKA_NS_OP, c.KAFKA_REPO), estimate=5)
+    plan.add(f'repo-remove:{c.KAFKA_REPO}', partial(utils.delete_repo, c.KAFKA_REPO), after=[f'uninstall:{c.KAFKA_NS_OP}'])
+    plan.add(f'delete-namespace:{c.KAFKA_NS_OP}', partial(teardown.delete_namespace, c.KAFKA_NS_OP, timeout, fast),
+             after=[f'uninstall:{c.KAFKA_NS_OP}'], estimate=10)
+    return plan
     
 
 @kafkaop.command(name="create-test-cluster")
@@ -41,61 +95,312 @@ def create_test_cluster(kafka_yaml: str):
     """
     utils.run_kubectl_apply(kafka_yaml,c.KAFKA_NS)
 
+@kafkaop.command(name="create-cluster")
+@click.argument('name', type=str, default='my-cluster')
+@click.option('--brokers', '-b', default=3, type=int, help='Number of kafka brokers')
+@click.option('--mode', default='kraft', type=click.Choice(cluster_spec.MODES),
+              help='Metadata managed by KRaft controllers or by ZooKeeper')
+@click.option('--controllers', default=0, type=int, help='Dedicated KRaft controllers, 0 makes the brokers controllers too')
+@click.option('--storage-size', default=None,
+              help='Size of every persistent volume, e.g. 100Gi. Ephemeral storage when not set')
+@click.option('--storage-class', default=None, help='Storage class of the persistent volumes')
+@click.option('--volumes', default=1, type=int, help='Number of JBOD volumes of every broker')
+@click.option('--delete-claim', is_flag=True, help='Delete the persistent volumes together with the cluster')
+@click.option('--cpu', default=None, help='CPU request of every broker, e.g. 2')
+@click.option('--memory', default=None, help='Memory of every broker, e.g. 8Gi. Half of it is used as java heap')
+@click.option('--profile', default='default', type=click.Choice(list(cluster_spec.PROFILES)), help='Broker tuning profile')
+@click.option('--config', 'settings', multiple=True,
+              help='Broker config as key=value, applied over the profile. Can be repeated')
+@click.option('--cruise-control', is_flag=True, help='Deploy Cruise Control to rebalance the partitions')
+@click.option('--dry-run', is_flag=True, help='Print the generated resources without applying them')
+@click.option('--timeout', default=600, type=int, help='Seconds to wait until the cluster is ready')
+def create_cluster(name: str, brokers: int, mode: str, controllers: int, storage_size: str, storage_class: str,
+                   volumes: int, delete_claim: bool, cpu: str, memory: str, profile: str, settings: tuple,
+                   cruise_control: bool, dry_run: bool, timeout: int):
+    """Deploy a kafka cluster generated from the options using strimzi kafka operator in kubernetes
+
+    Args:
+        name (str, optional): name of the cluster. Defaults to my-cluster.
+        brokers (int, optional): number of kafka brokers. Defaults to 3.
+        mode (str, optional): kraft or zookeeper. Defaults to kraft.
+        controllers (int, optional): dedicated KRaft controllers. Defaults to 0.
+        storage_size (str, optional): size of every persistent volume. Defaults to ephemeral storage.
+        storage_class (str, optional): storage class of the persistent volumes. Defaults to the default class.
+        volumes (int, optional): number of JBOD volumes of every broker. Defaults to 1.
+        delete_claim (bool, optional): delete the volumes together with the cluster. Defaults to False.
+        cpu (str, optional): CPU request of every broker. Defaults to None.
+        memory (str, optional): memory of every broker. Defaults to None.
+        profile (str, optional): broker tuning profile. Defaults to default.
+        settings (tuple, optional): broker configs as key=value. Defaults to none.
+        cruise_control (bool, optional): deploy Cruise Control. Defaults to False.
+        dry_run (bool, optional): only print the resources. Defaults to False.
+        timeout (int, optional): seconds to wait until the cluster is ready. Defaults to 600.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
+    """
+    try:
+        documents = cluster_spec.build_cluster(name, brokers, mode, controllers, storage_size, storage_class, volumes,
+                                               delete_claim, cpu, memory, profile, parse_settings(settings),
+                                               cruise_control=cruise_control)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if dry_run:
+        click.echo(render.to_yaml(documents), nl=False)
+        return
+
+    utils.run_kubectl_apply_manifest(documents, namespace=c.KAFKA_NS)
+    waited = ready.wait_for([ready.custom_resource('kafka', name, c.KAFKA_NS)], timeout=timeout)
+    click.echo("-------------------------------------------")
+    click.echo(f"Kafka cluster {name} ready in {max(waited.values(), default=0):.1f}s")
+    click.echo("-------------------------------------------")
+
+@kafkaop.command(name="enable-cruise-control")
+@click.option('--cluster', default='my-cluster', help='Kafka cluster where Cruise Control is enabled')
+@click.option('--timeout', default=600, type=int, help='Seconds to wait until Cruise Control is running')
+def enable_cruise_control(cluster: str, timeout: int):
+    """Enable Cruise Control in a kafka cluster, needed by the rebalance command
+
+    Args:
+        cluster (str, optional): kafka cluster. Defaults to my-cluster.
+        timeout (int, optional): seconds to wait until Cruise Control is running. Defaults to 600.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
+    """
+    utils.run_kubectl_patch('kafka', cluster, c.KAFKA_NS, {'spec': {'cruiseControl': {}}})
+    ready.wait_for([ready.deployment(f'{cluster}-cruise-control', c.KAFKA_NS)], timeout=timeout)
+
+@kafkaop.command(name="rebalance")
+@click.option('--cluster', default='my-cluster', help='Kafka cluster to rebalance')
+@click.option('--name', default=None, help='Name of the KafkaRebalance. Defaults to <cluster>-rebalance')
+@click.option('--goal', 'goals', multiple=True, type=click.Choice(list(rebalance.GOALS)),
+              help='Balance goal, can be repeated. Defaults to the Cruise Control default goals')
+@click.option('--mode', default='full', type=click.Choice(rebalance.MODES),
+              help='full moves any partition, add-brokers moves partitions to new brokers, remove-brokers empties brokers')
+@click.option('--brokers', default=None, help='Comma separated broker ids added or removed')
+@click.option('--skip-hard-goal-check', is_flag=True, help='Only use the selected goals, without the capacity goals')
+@click.option('--approve', is_flag=True, help='Approve the proposal without asking')
+@click.option('--dry-run', is_flag=True, help='Print the KafkaRebalance without applying it')
+@click.option('--timeout', default=3600, type=int,
+              help='Seconds to wait until the proposal is ready and then until the rebalance ends')
+@click.option('--interval', default=10, type=int, help='Seconds between two progress checks')
+def rebalance_cluster(cluster: str, name: str, goals: tuple, mode: str, brokers: str, skip_hard_goal_check: bool,
+                      approve: bool, dry_run: bool, timeout: int, interval: int):
+    """Move the partitions between brokers with Cruise Control, e.g. after adding brokers
+
+    A KafkaRebalance asks Cruise Control for an optimization proposal, the summary is shown and, once approved,
+    the progress is printed until the partitions are moved.
+
+    Args:
+        cluster (str, optional): kafka cluster to rebalance. Defaults to my-cluster.
+        name (str, optional): name of the KafkaRebalance. Defaults to <cluster>-rebalance.
+        goals (tuple, optional): balance goals. Defaults to the Cruise Control default goals.
+        mode (str, optional): full, add-brokers or remove-brokers. Defaults to full.
+        brokers (str, optional): comma separated broker ids added or removed. Defaults to None.
+        skip_hard_goal_check (bool, optional): only use the selected goals. Defaults to False.
+        approve (bool, optional): approve the proposal without asking. Defaults to False.
+        dry_run (bool, optional): only print the KafkaRebalance. Defaults to False.
+        timeout (int, optional): seconds to wait for the proposal, and then for the rebalance. Defaults to 3600.
+        interval (int, optional): seconds between two progress checks. Defaults to 10.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess, or the rebalance failed
+    """
+    name = name or f'{cluster}-rebalance'
+    try:
+        broker_ids = [int(broker) for broker in brokers.split(',')] if brokers else None
+        manifest = rebalance.rebalance_manifest(name, cluster, goals, mode, broker_ids, skip_hard_goal_check)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if dry_run:
+        click.echo(render.to_yaml(manifest), nl=False)
+        return
+
+    # a finished KafkaRebalance keeps its old proposal, a new one is always computed
+    utils.run_kubectl_delete_with_res('kafkarebalance', c.KAFKA_NS, name)
+    utils.run_kubectl_apply_manifest(manifest, namespace=c.KAFKA_NS)
+    fetch = partial(utils.get_resource, 'kafkarebalance', name, c.KAFKA_NS)
+    click.echo("-------------------------------------------")
+    click.echo(f"Waiting for the optimization proposal of {name}")
+    click.echo("-------------------------------------------")
+    proposal = rebalance.wait_for_state(fetch, ['ProposalReady'], timeout, interval=interval)
+    click.echo("-------------------------------------------")
+    click.echo("Optimization proposal")
+    for line in rebalance.proposal_summary(proposal):
+        click.echo(f"  {line}")
+    click.echo("-------------------------------------------")
+    if not approve and not click.confirm('Approve the proposal and move the partitions?'):
+        click.echo(f"Proposal not approved, approve it later with: kubectl annotate kafkarebalance {name} "
+                   f"-n {c.KAFKA_NS} strimzi.io/rebalance=approve")
+        return
+
+    utils.run_kubectl_patch('kafkarebalance', name, c.KAFKA_NS,
+                            {'metadata': {'annotations': {'strimzi.io/rebalance': 'approve'}}})
+    start = time.monotonic()
+    rebalance.wait_for_state(fetch, ['Ready'], timeout, interval=interval,
+                             fetch_progress=lambda configmap: utils.get_resource('configmap', configmap, c.KAFKA_NS))
+    click.echo("-------------------------------------------")
+    click.echo(f"Rebalance of {cluster} finished in {time.monotonic() - start:.0f}s")
+    click.echo("-------------------------------------------")
+
 @kafkaop.command(name="delete-test-cluster")
 @click.argument('kafka_yaml', type=str, required=True)
-def delete_test_cluster(kafka_yaml: str):
+@click.option('--timeout', default=300, type=int,
+              help='Seconds to wait until the topic finalizers are cleared and the namespace is gone')
+@click.option('--fast', is_flag=True, help='Kill the kafka pods without graceful termination')
+def delete_test_cluster(kafka_yaml: str, timeout: int, fast: bool):
     """Delete a test kafka cluster using strimzi kafka operator in kubernetes
 
     Args:
         kafka_yaml (str, required): name of the yaml file where the characteristics of the test cluster are defined.
+        timeout (int, optional): seconds to wait until the topics are deleted and then until the namespace is gone.
+            Defaults to 300.
+        fast (bool, optional): kill the kafka pods without graceful termination. Defaults to False.
     """
     #This block of code delete all the topics running in the cluster. This is nededeed to avoid having kafka namescpace "Terminating"without finishing
-    list_command_return = ["kubectl", "get", "kafkatopic", "-n", c.KAFKA_NS, "-o", "jsonpath={.items[*].metadata.name}"]
-    result_return = utils.__run_subprocess(list_command_return)
-    topics = result_return.stdout.decode('utf-8').split()
+    try:
+        topics = utils.list_resource_names("kafkatopic", c.KAFKA_NS)
+    except SystemError:
+        topics = []
     if topics:
-        for topic in topics:
-            delete_topic_name(topic)  
+        delete_topic_names(topics, timeout=timeout)
 
     utils.run_kubectl_delete(resource_yaml=kafka_yaml, namespace=c.KAFKA_NS)
-    utils.delete_ns(c.KAFKA_NS)
+    teardown.delete_namespace(c.KAFKA_NS, timeout, fast)
 
 @kafkaop.command(name="create-topic")
-@click.option('--partitions', '-p', default=1 , help='Number of topic partitions')
+@click.option('--partitions', '-p', default=None, type=int,
+              help='Number of topic partitions. Defaults to 1, or to the advice with --target-throughput')
 @click.option('--replicas', '-r', default=1 , help='Number of topic replicas')
+@click.option('--cluster', default='my-cluster', help='Kafka cluster where the topic is created')
+@click.option('--config', 'settings', multiple=True,
+              help='Topic config as key=value, e.g. retention.ms=86400000. Can be repeated')
+@click.option('--target-throughput', default=None, type=float, help='MB/s the topic must carry, enables the partition advisor')
+@click.option('--consumers', default=1, type=int, help='Consumers of the group that reads the topic, used by the advisor')
+@click.option('--brokers', default=None, type=int, help='Brokers of the cluster, the advice is rounded up to a multiple')
+@click.option('--history', 'history_file', default=perf.HISTORY_FILE,
+              help='Benchmark history with the measured partition throughput')
+@click.option('--dry-run', is_flag=True, help='Print the KafkaTopic without applying it')
 @click.argument('topic_name', type=str, required=True)
-def create_topic(topic_name: str, partitions: int, replicas: int):
+def create_topic(topic_name: str, partitions: int, replicas: int, cluster: str, settings: tuple, target_throughput: float,
+                 consumers: int, brokers: int, history_file: str, dry_run: bool):
     """Create a topic in Kafka cluster
 
+    With --target-throughput the partitions are sized from the MB/s that a partition sustains, measured by the
+    latest `kafkaop benchmark` run or conservative defaults, and from the number of consumers.
+
     Args:
         topic_name (str, required): topic name to be created.
-        partitions (int, optional): number of topic partitions. Defaults to 1.
+        partitions (int, optional): number of topic partitions. Defaults to 1, or to the advice.
         replicas (int, optional): number of topic replicas. Defaults to 1.
+        cluster (str, optional): kafka cluster of the topic. Defaults to my-cluster.
+        settings (tuple, optional): topic configs as key=value. Defaults to none.
+        target_throughput (float, optional): MB/s the topic must carry. Defaults to no advice.
+        consumers (int, optional): consumers of the group that reads the topic. Defaults to 1.
+        brokers (int, optional): brokers of the cluster. Defaults to no rounding.
+        history_file (str, optional): benchmark history file.
+        dry_run (bool, optional): only print the KafkaTopic. Defaults to False.
     """
-    data = {
-        'apiVersion': 'kafka.strimzi.io/v1beta2',
-        'kind': 'KafkaTopic',
-        'metadata': {
-            'name': topic_name,
-            'labels': {
-                'strimzi.io/cluster': 'my-cluster'
-            }
-        },
-        'spec': {
-            'partitions': partitions,
-            'replicas': replicas
-        }
-    }
-    absolute = str(Path(__file__).parent.parent)
-    values_path = path.join(absolute, 'resources', c.KAFKA_VALUES)
-    with open(values_path, 'w') as file:
-        yaml.dump(data, file, default_flow_style=False)
+    try:
+        config = parse_settings(settings)
+        warnings = sizing.config_warnings(replicas, config)
+        advice = None
+        if target_throughput is not None:
+            rates = sizing.partition_rates(perf.load_history(history_file))
+            advice = sizing.recommend_partitions(target_throughput, consumers, rates, brokers)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    if advice is not None:
+        click.echo("-------------------------------------------", err=dry_run)
+        click.echo(f"Recommended partitions for {target_throughput:g} MB/s: {advice.partitions}", err=dry_run)
+        for reason in advice.reasons:
+            click.echo(f"  {reason}", err=dry_run)
+        if partitions is not None and partitions < advice.partitions:
+            warnings.append(f'{partitions} partitions are fewer than the {advice.partitions} recommended, '
+                            f'the topic may not reach {target_throughput:g} MB/s')
+        click.echo("-------------------------------------------", err=dry_run)
+    for warning in warnings:
+        click.echo(f"Warning: {warning}", err=True)
+    if partitions is None:
+        partitions = advice.partitions if advice is not None else 1
+
+    data = topic_manifest(topic_name, partitions, replicas, config, cluster)
+    if dry_run:
+        click.echo(render.to_yaml(data), nl=False)
+        return
 
-    result = utils.run_kubectl_apply(resource_yaml=c.KAFKA_VALUES, namespace=c.KAFKA_NS)
+    result = utils.run_kubectl_apply_manifest(data, namespace=c.KAFKA_NS)
     if result.returncode == 0:
         click.echo("-------------------------------------------")
-        click.echo(f"Topic {topic_name} created!")
+        click.echo(f"Topic {topic_name} created with {partitions} partitions!")
         click.echo("-------------------------------------------")
+
+@kafkaop.command(name="create-topics")
+@click.argument('catalog', type=click.Path(exists=True, dir_okay=False), required=True)
+@click.option('--cluster', default='my-cluster', help='Kafka cluster where the topics are created')
+@click.option('--batch-kb', default=256, type=int, help='Maximum size in KiB of every kubectl apply request')
+@click.option('--timeout', default=300, type=int, help='Seconds to wait until all the topics are ready')
+@click.option('--no-wait', is_flag=True, help='Apply the topics without waiting until they are ready')
+def create_topics(catalog: str, cluster: str, batch_kb: int, timeout: int, no_wait: bool):
+    """Create all the topics of a YAML or CSV catalog in Kafka cluster
+
+    Args:
+        catalog (str, required): catalog file with the name, partitions, replicas and config of every topic.
+        cluster (str, optional): kafka cluster where the topics are created. Defaults to my-cluster.
+        batch_kb (int, optional): maximum size in KiB of every apply request. Defaults to 256.
+        timeout (int, optional): seconds to wait until all the topics are ready. Defaults to 300.
+        no_wait (bool, optional): don't wait until the topics are ready. Defaults to False.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
+    """
+    try:
+        topics = parse_catalog(catalog)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='CATALOG')
+    manifests = [topic_manifest(t['name'], t['partitions'], t['replicas'], t['config'], cluster) for t in topics]
+    batches = batch_documents(manifests, max_bytes=batch_kb * 1024)
+    click.echo("-------------------------------------------")
+    click.echo(f"Applying {len(manifests)} topics in {len(batches)} requests")
+    click.echo("-------------------------------------------")
+    run_parallel(*[partial(utils.run_kubectl_apply_manifest, batch, namespace=c.KAFKA_NS, server_side=True)
+                   for batch in batches])
+    if no_wait:
+        return
+
+    waited = ready.wait_for_collection('kafkatopic', [t['name'] for t in topics], c.KAFKA_NS, timeout=timeout,
+                                       selector=f'strimzi.io/cluster={cluster}')
+    click.echo("-------------------------------------------")
+    for line in timing_summary(waited):
+        click.echo(line)
+    click.echo("-------------------------------------------")
+
+def topic_manifest(topic_name: str, partitions: int, replicas: int, config: dict = None,
+                   cluster: str = 'my-cluster') -> dict:
+    """KafkaTopic resource built from the packaged topic template.
+
+    Args:
+        topic_name (str): topic name.
+        partitions (int): number of topic partitions.
+        replicas (int): number of topic replicas.
+        config (dict, optional): topic configs, such as retention.ms. Defaults to None.
+        cluster (str, optional): kafka cluster of the topic. Defaults to my-cluster.
+
+    Returns:
+        dict: KafkaTopic manifest.
+    """
+    data = render.load_template(c.KAFKA_VALUES)
+    data['metadata']['name'] = topic_name
+    data['metadata']['labels']['strimzi.io/cluster'] = cluster
+    data['spec'] = {
+        'partitions': partitions,
+        'replicas': replicas
+    }
+    if config:
+        data['spec']['config'] = config
+    return data
         
 @kafkaop.command(name="delete-topic")
 @click.argument('topic_name', type=str, required=True)
@@ -114,96 +419,304 @@ def delete_topic(topic_name: str):
 @click.argument('topic_name', type=str, required=True)
 @click.option('--message', '-m', default='default message', help='Message to produce')
 @click.option('--count', '-c', default=10, type=int, help='Number of messages to produce')
-def produce_messages(topic_name: str, message: str, count: int):
-    """Create a Kafka producer pod to send messages into a kafka topic
+@click.option('--file', '-f', 'file', type=click.Path(allow_dash=True, dir_okay=False), default=None,
+              help='File with one message per line, - reads the messages from stdin')
+@click.option('--key', '-k', default=None, help='Key of the generated messages, {i} is replaced with the message number')
+@click.option('--key-separator', default=None, help='Separator between key and value, enables keyed messages')
+@click.option('--rate', '-r', default=None, type=float, help='Maximum messages per second')
+@click.option('--chunk-kb', default=64, type=int, help='Size in KiB of the chunks written to the producer')
+def produce_messages(topic_name: str, message: str, count: int, file: str, key: str, key_separator: str, rate: float,
+                     chunk_kb: int):
+    """Send messages into a kafka topic through a warm client pod
+
+    The messages are streamed in chunks to the stdin of the producer, so memory use doesn't grow with the number
+    of messages. The client pod is created the first time and reused by the next calls.
 
     Args:
         topic_name (str, required): topic to send the messages to
         message (str, optional): message to send. Defaults to 'default message'.
         count (int, required): numbers of message repetitions. Defaults to 10.
+        file (str, optional): file with one message per line, '-' for stdin. Used instead of message and count.
+        key (str, optional): key template of the generated messages, e.g. 'user-{i}'. Defaults to None.
+        key_separator (str, optional): separator between key and value. Defaults to ':' when key is set.
+        rate (float, optional): maximum messages per second. Defaults to no limit.
+        chunk_kb (int, optional): size in KiB of the chunks written to the producer. Defaults to 64.
 
     Raises:
         SystemError: Error with the stderr from the subprocess
     """
+    if key is not None and key_separator is None:
+        key_separator = ':'
     command = [
-    "kubectl", 
-    "-n", c.KAFKA_NS, 
-    "run", "kafka-producer",
-    "-i",
-    "--image=quay.io/strimzi/kafka:0.39.0-kafka-3.6.1", 
-    "--restart=Never", 
-    "--", 
-    "bin/kafka-console-producer.sh", 
-    "--bootstrap-server", "my-cluster-kafka-bootstrap:9092", 
+    "kubectl",
+    "-n", c.KAFKA_NS,
+    "exec", "-i", ensure_client_pod(),
+    "--",
+    "bin/kafka-console-producer.sh",
+    "--bootstrap-server", c.KAFKA_BOOTSTRAP,
     "--topic", topic_name
     ]
-    input_messages = "\n".join([f"{message} {i+1}" for i in range(count)]) + "\n"
-  
-    result = utils.__run_subprocess(command, input=input_messages)
-    
+    if key_separator is not None:
+        command += ["--property", "parse.key=true", "--property", f"key.separator={key_separator}"]
+
+    meter = streaming.Throughput(report=click.echo)
+    with ExitStack() as stack:
+        if file is not None:
+            messages = streaming.read_messages(stack.enter_context(click.open_file(file, 'rb')))
+        else:
+            messages = streaming.generate_messages(message, count, key, key_separator or ':')
+        chunks = streaming.chunk_messages(messages, chunk_kb * 1024, streaming.RateLimiter(rate), meter)
+        errors = deque(maxlen=20)
+        result = get_executor().run_sync(command, input=chunks, capture=False, on_stdout=lambda line: None,
+                                         on_stderr=errors.append)
+
     if result.returncode != 0:
+        stderr = b''.join(errors)
         click.echo('-------------------------------------------')
         click.echo(f'Failed sending messages to topic {topic_name}')
-        click.echo(f'Error: {result.stderr}')
+        click.echo(f'Error: {stderr}')
         click.echo('-------------------------------------------')
-        raise SystemError(result.stderr)
+        raise SystemError(stderr)
     else:
         click.echo('-------------------------------------------')
-        click.echo(f'Messages sent to topic {topic_name}!')
+        click.echo(f'Messages sent to topic {topic_name}: {meter.summary()}')
         click.echo('-------------------------------------------')
-    
-    utils.run_kubectl_delete_with_res("pod", c.KAFKA_NS, "kafka-producer")
+
+@kafkaop.command(name="benchmark")
+@click.option('--topic', '-t', default='dp-benchmark', help='Benchmark topic, created when it does not exist')
+@click.option('--partitions', '-p', default=6, type=int, help='Partitions of the benchmark topic')
+@click.option('--replicas', default=1, type=int, help='Replicas of the benchmark topic')
+@click.option('--records', '-n', default=1000000, type=int, help='Total number of records')
+@click.option('--record-size', '-s', default=1024, type=int, help='Size of every record in bytes')
+@click.option('--throughput', default=-1, type=int, help='Target records/sec of every producer, -1 for no limit')
+@click.option('--acks', default='all', type=click.Choice(['0', '1', 'all']), help='Producer acks')
+@click.option('--compression', default='none', type=click.Choice(['none', 'gzip', 'snappy', 'lz4', 'zstd']),
+              help='Producer compression')
+@click.option('--producers', default=1, type=click.IntRange(min=1), help='Number of parallel producers')
+@click.option('--consumers', default=1, type=click.IntRange(min=0),
+              help='Number of parallel consumers, 0 to skip the consumer phase')
+@click.option('--history', 'history_file', default=perf.HISTORY_FILE, help='JSON lines file where the runs are stored')
+def benchmark(topic: str, partitions: int, replicas: int, records: int, record_size: int, throughput: int, acks: str,
+              compression: str, producers: int, consumers: int, history_file: str):
+    """Measure the throughput and latency of the kafka cluster with the kafka perf-test tools
+
+    Args:
+        topic (str, optional): benchmark topic. Defaults to dp-benchmark.
+        partitions (int, optional): partitions of the benchmark topic. Defaults to 6.
+        replicas (int, optional): replicas of the benchmark topic. Defaults to 1.
+        records (int, optional): total number of records. Defaults to 1000000.
+        record_size (int, optional): size of every record in bytes. Defaults to 1024.
+        throughput (int, optional): target records/sec of every producer. Defaults to -1 (no limit).
+        acks (str, optional): producer acks. Defaults to all.
+        compression (str, optional): producer compression. Defaults to none.
+        producers (int, optional): number of parallel producers. Defaults to 1.
+        consumers (int, optional): number of parallel consumers. Defaults to 1.
+        history_file (str, optional): file where the runs are stored and compared.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
+    """
+    utils.run_kubectl_apply_manifest(topic_manifest(topic, partitions, replicas), namespace=c.KAFKA_NS)
+    ready.wait_for([ready.custom_resource('kafkatopic', topic, c.KAFKA_NS)])
+    exec_prefix = ["kubectl", "-n", c.KAFKA_NS, "exec", ensure_client_pod(), "--"]
+    run_benchmark(exec_prefix, c.KAFKA_BOOTSTRAP, topic, 'strimzi-kafka', records, record_size, throughput, acks,
+                  compression, producers, consumers, history_file, partitions)
+
+@kafkaop.command(name="delete-client")
+def delete_client():
+    """Delete the warm client pod used to produce messages
+    """
+    utils.run_kubectl_delete_with_res("pod", c.KAFKA_NS, c.KAFKA_CLIENT_POD)
+
+def ensure_client_pod() -> str:
+    """Start the long-lived kafka client pod when it is not running and wait until it is ready.
+
+    The pod only runs `sleep`, the kafka tools are started inside it with `kubectl exec`, so every call saves the
+    image pull and the pod scheduling.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
+
+    Returns:
+        str: name of the client pod.
+    """
+    phase_command = ["kubectl", "get", "pod", c.KAFKA_CLIENT_POD, "-n", c.KAFKA_NS, "-o", "jsonpath={.status.phase}"]
+    result = utils.__run_subprocess(phase_command)
+    phase = result.stdout.decode('utf-8').strip() if result.returncode == 0 else ''
+    if phase in ('Succeeded', 'Failed'):
+        utils.run_kubectl_delete_with_res("pod", c.KAFKA_NS, c.KAFKA_CLIENT_POD)
+        phase = ''
+    if phase != 'Running':
+        if not phase:
+            run_command = ["kubectl", "-n", c.KAFKA_NS, "run", c.KAFKA_CLIENT_POD, f"--image={c.KAFKA_IMAGE}",
+                           "--restart=Never", "--command", "--", "sleep", "infinity"]
+            result = utils.__run_subprocess(run_command)
+            if result.returncode != 0:
+                click.echo('-------------------------------------------')
+                click.echo(f'Failed starting the client pod {c.KAFKA_CLIENT_POD}')
+                click.echo(f'Error: {result.stderr}')
+                click.echo('-------------------------------------------')
+                raise SystemError(result.stderr)
+        ready.wait_for([ready.pod(c.KAFKA_CLIENT_POD, c.KAFKA_NS)])
+    return c.KAFKA_CLIENT_POD
 
 @kafkaop.command()
 @click.argument('topic_name', type=str, required=True)
 @click.option('--latest', '-l', default="true", help='True to consume latest messages. False to consume from beginning')
-def consume_messages(topic_name: str, latest: str):
-    """Create a Kafka consumer pod to read messages from a kafka topic
+@click.option('--max-messages', '-n', default=None, type=int, help='Stop after this number of messages')
+@click.option('--timeout', '-t', default=None, type=int, help='Stop when no message arrives for this number of seconds')
+@click.option('--partition', '-p', default=None, type=int, help='Consume only this partition')
+@click.option('--offset', default=None, help='Offset of the partition: earliest, latest or a number')
+@click.option('--output', '-o', type=click.Path(allow_dash=True, dir_okay=False), default=None,
+              help='File where the messages are written instead of the console')
+@click.option('--format', 'output_format', default='value', type=click.Choice(['value', 'jsonl', 'raw']),
+              help='value writes the message values, jsonl one JSON object per message with partition, offset, '
+                   'timestamp and key, raw the consumer output')
+def consume_messages(topic_name: str, latest: str, max_messages: int, timeout: int, partition: int, offset: str,
+                     output: str, output_format: str):
+    """Read messages from a kafka topic through the warm client pod
+
+    stdout and stderr of the consumer are drained at the same time. When the messages go to a file the disk writes
+    pace the consumer, and a status line shows the messages/sec and bytes/sec.
 
     Args:
         topic_name (str, required): topic to read the messages from
         latest (str, optional): set to "true" to consume latest messages. Set to "false" to consume from beginning. Defaults to true.
+        max_messages (int, optional): stop after this number of messages. Defaults to no limit.
+        timeout (int, optional): stop when no message arrives for this number of seconds. Defaults to no limit.
+        partition (int, optional): consume only this partition. Defaults to all the partitions.
+        offset (str, optional): earliest, latest or an offset number of the partition. Defaults to None.
+        output (str, optional): file where the messages are written, '-' for stdout. Defaults to the console.
+        output_format (str, optional): value, jsonl or raw. Defaults to value.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
     """
+    if offset is not None and partition is None:
+        raise click.UsageError('--offset needs --partition')
+    command = [
+    "kubectl",
+    "-n", c.KAFKA_NS,
+    "exec", ensure_client_pod(),
+    "--",
+    "bin/kafka-console-consumer.sh",
+    "--bootstrap-server", c.KAFKA_BOOTSTRAP,
+    "--topic", topic_name
+    ]
+    if partition is not None:
+        command += ["--partition", str(partition)]
+    if offset is not None:
+        command += ["--offset", offset]
+    elif latest != "true":
+        command += ["--from-beginning"]
+    if max_messages is not None:
+        command += ["--max-messages", str(max_messages)]
+    if timeout is not None:
+        command += ["--timeout-ms", str(timeout * 1000)]
+    for consumer_property in records.CONSOLE_PROPERTIES:
+        command += ["--property", consumer_property]
 
-    if latest == "true":
-        command = [
-        "kubectl",
-        "-n", c.KAFKA_NS,
-        "run", "kafka-consumer",
-        "-ti",
-        "--image=quay.io/strimzi/kafka:0.39.0-kafka-3.6.1",
-        "--rm=true",
-        "--restart=Never",
-        "--",
-        "bin/kafka-console-consumer.sh",
-        "--bootstrap-server", "my-cluster-kafka-bootstrap:9092",
-        "--topic", topic_name
-        ]
-        click.echo("-------------------------------------------")
-        click.echo(f"Printing messages in topic {topic_name}: (Ctrl+c to finish)")
-        click.echo("-------------------------------------------")
-        utils.__run_Popen(command, text=True)
-    else:
-        command = [
-        "kubectl",
-        "-n", c.KAFKA_NS,
-        "run", "kafka-consumer",
-        "-ti",
-        "--image=quay.io/strimzi/kafka:0.39.0-kafka-3.6.1",
-        "--rm=true",
-        "--restart=Never",
-        "--",
-        "bin/kafka-console-consumer.sh",
-        "--bootstrap-server", "my-cluster-kafka-bootstrap:9092",
-        "--topic", topic_name,
-        "--from-beginning"
-        ]
-        click.echo("-------------------------------------------")
-        click.echo(f"Printing messages from beginning in topic {topic_name}: (Ctrl+c to finish)")
-        click.echo("-------------------------------------------")       
-        utils.__run_Popen(command, text=True)
+    transform = {'value': records.record_value, 'jsonl': records.to_json_line, 'raw': None}[output_format]
+    show_status = output not in (None, '-')
+    meter = streaming.Throughput(
+        report=(lambda status: click.echo(f'\r{status}', nl=False, err=True)) if show_status else None,
+        interval=1, action='received')
+    errors = deque(maxlen=20)
+    click.echo("-------------------------------------------", err=show_status)
+    click.echo(f"Reading messages from topic {topic_name}: (Ctrl+c to finish)", err=show_status)
+    click.echo("-------------------------------------------", err=show_status)
+    with click.open_file(output or '-', 'wb') as stream:
+        # the console gets every line at once, files get big blocks
+        sink = streaming.LineSink(stream, transform, meter, buffer_size=streaming.CHUNK_SIZE if show_status else 1,
+                                  flush_each_block=not show_status)
+        executor = get_executor()
+        future = executor.submit(executor.run(command, capture=False, on_stdout=sink.write, on_stderr=errors.append,
+                                              bounded=False))
+        try:
+            result = future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            result = None
+        finally:
+            sink.flush()
+
+    stderr = b''.join(errors)
+    if result is not None and result.returncode != 0 and b'TimeoutException' not in stderr:
+        click.echo('-------------------------------------------', err=True)
+        click.echo(f'Failed reading messages from topic {topic_name}', err=True)
+        click.echo(f'Error: {stderr}', err=True)
+        click.echo('-------------------------------------------', err=True)
+        raise SystemError(stderr)
+    click.echo('', err=True)
+    click.echo("-------------------------------------------", err=True)
+    click.echo(f"Messages read from topic {topic_name}: {meter.summary()}", err=True)
+    click.echo("-------------------------------------------", err=True)
+
+@kafkaop.command(name="lag")
+@click.option('--group', '-g', 'groups', multiple=True, help='Consumer group, can be repeated. Defaults to all the groups')
+@click.option('--topic', '-t', default=None, help='Only show this topic')
+@click.option('--top', default=20, type=int, help='Number of group and topic pairs shown, the worst first')
+@click.option('--output', '-o', 'output_format', default='table', type=click.Choice(['table', 'json']),
+              help='table, or json with the groups and every partition')
+@click.option('--watch', '-w', is_flag=True, help='Show the lag again every interval with its rate of change')
+@click.option('--interval', default=10, type=int, help='Seconds between two reports with --watch')
+def consumer_lag(groups: tuple, topic: str, top: int, output_format: str, watch: bool, interval: int):
+    """Show the lag of the consumer groups, the worst offenders first
+
+    The committed and log-end offsets of every partition are read with kafka-consumer-groups.sh in the warm client
+    pod. With --watch the report is repeated and the lag change per second tells whether every group keeps up.
+
+    Args:
+        groups (tuple, optional): consumer groups. Defaults to all the groups.
+        topic (str, optional): only show this topic. Defaults to every topic.
+        top (int, optional): number of group and topic pairs shown. Defaults to 20.
+        output_format (str, optional): table or json, json writes a line per report. Defaults to table.
+        watch (bool, optional): repeat the report every interval. Defaults to False.
+        interval (int, optional): seconds between two reports. Defaults to 10.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess
+    """
+    command = ["kubectl", "-n", c.KAFKA_NS, "exec", ensure_client_pod(), "--",
+               "bin/kafka-consumer-groups.sh", "--bootstrap-server", c.KAFKA_BOOTSTRAP, "--describe"]
+    for group in groups:
+        command += ["--group", group]
+    if not groups:
+        command += ["--all-groups"]
+
+    previous = None
+    while True:
+        result = utils.__run_subprocess(command)
+        if result.returncode != 0:
+            click.echo('-------------------------------------------', err=True)
+            click.echo('Failed describing the consumer groups', err=True)
+            click.echo(f'Error: {result.stderr}', err=True)
+            click.echo('-------------------------------------------', err=True)
+            raise SystemError(result.stderr)
+        measured = time.monotonic()
+        output = result.stdout.decode('utf-8', errors='replace')
+        rows = [row for row in lag.parse_describe(output) if topic is None or row['topic'] == topic]
+        summary = lag.summarize(rows)
+        changes = lag.rates(previous[1], summary, measured - previous[0]) if previous is not None else None
+        if output_format == 'json':
+            click.echo(lag.to_json(summary, rows, changes, lag.inactive_groups(output)))
+        else:
+            click.echo('-------------------------------------------')
+            click.echo(f"Consumer lag at {time.strftime('%H:%M:%S')}")
+            click.echo('-------------------------------------------')
+            for line in lag.format_table(summary, changes if watch else None, top):
+                click.echo(line)
+            inactive = lag.inactive_groups(output)
+            if inactive:
+                click.echo(f"Groups without active members: {', '.join(inactive)}")
+        if not watch:
+            return
+        previous = (measured, summary)
+        try:
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            return
 
-   
 @kafkaop.command(name="revision")
 def status():
     """Check the revision for this installation
@@ -232,4 +745,24 @@ def delete_topic_name(topic_name: str):
     else:
         click.echo('-------------------------------------------')
         click.echo(f'Topic {topic_name} deleted!')
-        click.echo('-------------------------------------------')
\ No newline at end of file
+        click.echo('-------------------------------------------')
+
+def delete_topic_names(topics: list[str], timeout: int = 300):
+    """Delete many topics with a few multi-name deletes running in parallel and wait until they are gone.
+
+    The topic operator removes its finalizer once the topic is deleted in kafka, so the cluster must not be
+    deleted before the wait finishes.
+
+    Args:
+        topics (list[str]): names of the topics to delete.
+        timeout (int, optional): seconds to wait until the topics are deleted. Defaults to 300.
+
+    Raises:
+        SystemError: Error with the stderr from the subprocess, or topics still there after the timeout
+    """
+    chunks = [topics[i:i + DELETE_CHUNK] for i in range(0, len(topics), DELETE_CHUNK)]
+    run_parallel(*[partial(utils.run_kubectl_delete_names, "kafkatopic", c.KAFKA_NS, chunk) for chunk in chunks])
+    waited = ready.wait_for_deleted('kafkatopic', topics, c.KAFKA_NS, timeout=timeout)
+    click.echo('-------------------------------------------')
+    click.echo(f'{len(topics)} topics deleted in {max(waited.values(), default=0):.1f}s')
+    click.echo('-------------------------------------------')
@@ -0,0 +1,153 @@
+import json
+
+# columns of `kafka-consumer-groups.sh --describe` and the keys they are stored with
+COLUMNS = {
+    'GROUP': 'group',
+    'TOPIC': 'topic',
+    'PARTITION': 'partition',
+    'CURRENT-OFFSET': 'committed',
+    'LOG-END-OFFSET': 'log_end',
+    'LAG': 'lag',
+    'CONSUMER-ID': 'consumer',
+    'HOST': 'host',
+    'CLIENT-ID': 'client',
+}
+NUMBERS = ('partition', 'committed', 'log_end', 'lag')
+
+
+def parse_describe(output: str) -> list[dict]:
+    """Parse the tables written by `kafka-consumer-groups.sh --describe`, one per consumer group.
+
+    Offsets that the tool prints as `-`, e.g. partitions without a committed offset, are None, and so are the
+    consumer, host and client of partitions without an assigned member. Warnings and messages such as
+    `Consumer group 'x' has no active members.` are skipped.
+
+    Args:
+        output (str): stdout of the tool.
+
+    Returns:
+        list[dict]: a row per group and partition with the keys of COLUMNS.
+    """
+    rows = []
+    header = None
+    for line in output.splitlines():
+        fields = line.split()
+        if not fields:
+            header = None
+            continue
+        if fields[0] == 'GROUP':
+            header = [COLUMNS.get(column) for column in fields]
+            continue
+        if header is None or len(fields) != len(header):
+            continue
+        row = {key: None if value == '-' else value for key, value in zip(header, fields) if key is not None}
+        try:
+            for key in NUMBERS:
+                if row.get(key) is not None:
+                    row[key] = int(row[key])
+        except ValueError:
+            continue
+        rows.append(row)
+    return rows
+
+
+def inactive_groups(output: str) -> list[str]:
+    """Groups reported without active members, their lag grows until a consumer comes back.
+    """
+    marker = ' has no active members.'
+    return [line.split("'")[1] for line in output.splitlines() if line.endswith(marker) and line.count("'") >= 2]
+
+
+def summarize(rows: list[dict]) -> list[dict]:
+    """Lag of every group and topic, the worst offenders first.
+
+    Args:
+        rows (list[dict]): rows returned by `parse_describe`.
+
+    Returns:
+        list[dict]: group, topic, partitions, lag (total), max_lag and worst_partition, committed (total),
+        uncommitted (partitions without a committed offset) and members, sorted by lag.
+    """
+    summary = {}
+    for row in rows:
+        key = (row['group'], row['topic'])
+        entry = summary.setdefault(key, {'group': row['group'], 'topic': row['topic'], 'partitions': 0, 'lag': 0,
+                                         'max_lag': 0, 'worst_partition': None, 'committed': 0, 'uncommitted': 0,
+                                         'members': set()})
+        entry['partitions'] += 1
+        if row.get('committed') is None:
+            entry['uncommitted'] += 1
+        else:
+            entry['committed'] += row['committed']
+        lag = row.get('lag') or 0
+        entry['lag'] += lag
+        if entry['worst_partition'] is None or lag > entry['max_lag']:
+            entry['max_lag'] = lag
+            entry['worst_partition'] = row['partition']
+        if row.get('consumer') is not None:
+            entry['members'].add(row['consumer'])
+    entries = []
+    for entry in summary.values():
+        entry['members'] = len(entry['members'])
+        entries.append(entry)
+    return sorted(entries, key=lambda entry: (-entry['lag'], entry['group'], entry['topic']))
+
+
+def rates(previous: list[dict], current: list[dict], seconds: float) -> dict[tuple, dict]:
+    """Change of the lag and of the committed offsets per second between two summaries.
+
+    A positive lag rate means that the group is falling behind, a negative one that it is catching up.
+
+    Args:
+        previous (list[dict]): earlier result of `summarize`.
+        current (list[dict]): later result of `summarize`.
+        seconds (float): seconds between both.
+
+    Returns:
+        dict[tuple, dict]: lag_rate and consumed_rate in messages/sec by (group, topic), only for the pairs in both.
+    """
+    if seconds <= 0:
+        return {}
+    before = {(entry['group'], entry['topic']): entry for entry in previous}
+    changes = {}
+    for entry in current:
+        old = before.get((entry['group'], entry['topic']))
+        if old is None:
+            continue
+        changes[(entry['group'], entry['topic'])] = {
+            'lag_rate': round((entry['lag'] - old['lag']) / seconds, 1),
+            'consumed_rate': round((entry['committed'] - old['committed']) / seconds, 1),
+        }
+    return changes
+
+
+def format_table(summary: list[dict], changes: dict[tuple, dict] = None, top: int = None) -> list[str]:
+    """Table with the lag of every group and topic, with the rates when they are known.
+    """
+    columns = ['GROUP', 'TOPIC', 'PARTITIONS', 'MEMBERS', 'LAG', 'MAX LAG (PARTITION)']
+    if changes is not None:
+        columns += ['LAG/S', 'CONSUMED/S']
+    table = []
+    for entry in summary[:top]:
+        row = [entry['group'], entry['topic'], str(entry['partitions']), str(entry['members']), str(entry['lag']),
+               f'{entry["max_lag"]} ({entry["worst_partition"]})']
+        if changes is not None:
+            change = changes.get((entry['group'], entry['topic']))
+            row += [f'{change["lag_rate"]:+.1f}', f'{change["consumed_rate"]:.1f}'] if change else ['-', '-']
+        table.append(row)
+    widths = [max([len(column)] + [len(row[i]) for row in table]) for i, column in enumerate(columns)]
+    lines = ['  '.join(value.ljust(width) for value, width in zip(columns, widths)).rstrip()]
+    for row in table:
+        lines.append('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+    if top is not None and len(summary) > top:
+        lines.append(f'and {len(summary) - top} more')
+    return lines
+
+
+def to_json(summary: list[dict], rows: list[dict], changes: dict[tuple, dict] = None, inactive: list[str] = ()) -> str:
+    """Report with the summary, the partitions and the rates as a single JSON line.
+    """
+    groups = []
+    for entry in summary:
+        groups.append({**entry, **((changes or {}).get((entry['group'], entry['topic'])) or {})})
+    return json.dumps({'groups': groups, 'partitions': rows, 'inactive_groups': list(inactive)}, sort_keys=True)
@@ -0,0 +1,178 @@
+import time
+from typing import Callable
+import click
+
+MODES = ('full', 'add-brokers', 'remove-brokers')
+STATES = ('New', 'PendingProposal', 'ProposalReady', 'Rebalancing', 'Stopped', 'NotReady', 'Ready',
+          'ReconciliationPaused')
+# goals that Cruise Control requires in every custom goal list, unless the hard goal check is skipped
+HARD_GOALS = ['RackAwareGoal', 'MinTopicLeadersPerBrokerGoal', 'ReplicaCapacityGoal', 'DiskCapacityGoal',
+              'NetworkInboundCapacityGoal', 'NetworkOutboundCapacityGoal', 'CpuCapacityGoal']
+GOALS = {
+    'rack': ['RackAwareGoal'],
+    'disk': ['DiskCapacityGoal', 'DiskUsageDistributionGoal'],
+    'network': ['NetworkInboundCapacityGoal', 'NetworkOutboundCapacityGoal', 'NetworkInboundUsageDistributionGoal',
+                'NetworkOutboundUsageDistributionGoal'],
+    'cpu': ['CpuCapacityGoal', 'CpuUsageDistributionGoal'],
+    'replicas': ['ReplicaCapacityGoal', 'ReplicaDistributionGoal'],
+    'leaders': ['LeaderReplicaDistributionGoal', 'LeaderBytesInDistributionGoal'],
+    'topics': ['TopicReplicaDistributionGoal'],
+}
+# optimizationResult fields shown in the proposal summary
+PROPOSAL_FIELDS = (
+    ('dataToMoveMB', 'data to move (MB)'),
+    ('numReplicaMovements', 'replica movements'),
+    ('numLeaderMovements', 'leader movements'),
+    ('intraBrokerDataToMoveMB', 'data to move between disks (MB)'),
+    ('numIntraBrokerReplicaMovements', 'replica movements between disks'),
+    ('onDemandBalancednessScoreBefore', 'balancedness before'),
+    ('onDemandBalancednessScoreAfter', 'balancedness after'),
+    ('monitoredPartitionsPercentage', 'monitored partitions (%)'),
+    ('recentWindows', 'load windows'),
+)
+
+
+def goal_names(goals: list[str], skip_hard_goal_check: bool = False) -> list[str]:
+    """Cruise Control goals of the short goal names, the hard goals go first unless the check is skipped.
+
+    Args:
+        goals (list[str]): keys of GOALS, empty to use the default goals of Cruise Control.
+        skip_hard_goal_check (bool, optional): only use the selected goals. Defaults to False.
+
+    Raises:
+        ValueError: a goal is unknown.
+
+    Returns:
+        list[str]: goal class names without duplicates.
+    """
+    unknown = [goal for goal in goals if goal not in GOALS]
+    if unknown:
+        raise ValueError(f'unknown goals {", ".join(unknown)}, valid goals: {", ".join(GOALS)}')
+    if not goals:
+        return []
+    selected = [name for goal in goals for name in GOALS[goal]]
+    return list(dict.fromkeys(selected if skip_hard_goal_check else HARD_GOALS + selected))
+
+
+def rebalance_manifest(name: str, cluster: str, goals: list[str] = (), mode: str = 'full', brokers: list[int] = None,
+                       skip_hard_goal_check: bool = False) -> dict:
+    """KafkaRebalance resource that asks Cruise Control for an optimization proposal.
+
+    Args:
+        name (str): name of the KafkaRebalance.
+        cluster (str): kafka cluster to rebalance.
+        goals (list[str], optional): keys of GOALS. Defaults to the Cruise Control default goals.
+        mode (str, optional): 'full', 'add-brokers' or 'remove-brokers'. Defaults to 'full'.
+        brokers (list[int], optional): brokers added or removed, only with the add and remove modes.
+        skip_hard_goal_check (bool, optional): allow goal lists without the hard goals. Defaults to False.
+
+    Raises:
+        ValueError: the mode and the brokers don't match, or a goal is unknown.
+
+    Returns:
+        dict: KafkaRebalance manifest.
+    """
+    if mode not in MODES:
+        raise ValueError(f'unknown mode {mode}, valid modes: {", ".join(MODES)}')
+    if (mode == 'full') == bool(brokers):
+        raise ValueError('the add-brokers and remove-brokers modes need the brokers, the full mode does not take them')
+    spec = {'mode': mode}
+    if brokers:
+        spec['brokers'] = list(brokers)
+    names = goal_names(list(goals), skip_hard_goal_check)
+    if names:
+        spec['goals'] = names
+    if skip_hard_goal_check:
+        spec['skipHardGoalCheck'] = True
+    return {
+        'apiVersion': 'kafka.strimzi.io/v1beta2',
+        'kind': 'KafkaRebalance',
+        'metadata': {'name': name, 'labels': {'strimzi.io/cluster': cluster}},
+        'spec': spec,
+    }
+
+
+def rebalance_state(resource: dict) -> str:
+    """State of a KafkaRebalance, reported by the operator as the condition with status True.
+    """
+    for condition in (resource or {}).get('status', {}).get('conditions') or []:
+        if condition.get('type') in STATES and condition.get('status') == 'True':
+            return condition['type']
+    return 'New'
+
+
+def state_message(resource: dict) -> str:
+    for condition in (resource or {}).get('status', {}).get('conditions') or []:
+        if condition.get('type') == rebalance_state(resource):
+            return condition.get('message') or condition.get('reason') or ''
+    return ''
+
+
+def proposal_summary(resource: dict) -> list[str]:
+    """Lines with the data and replicas that the optimization proposal moves.
+    """
+    result = resource.get('status', {}).get('optimizationResult') or {}
+    width = max(len(label) for _, label in PROPOSAL_FIELDS)
+    lines = [f'{label.ljust(width)}  {result[key]}' for key, label in PROPOSAL_FIELDS if key in result]
+    if result.get('excludedTopics'):
+        lines.append(f'{"excluded topics".ljust(width)}  {", ".join(result["excludedTopics"])}')
+    return lines
+
+
+def progress_line(progress: dict) -> str:
+    """Progress of a running rebalance from the data of its progress ConfigMap, None when there is none yet.
+    """
+    data = (progress or {}).get('data') or {}
+    if 'completedByteMovementPercentage' not in data:
+        return None
+    line = f'{data["completedByteMovementPercentage"]}% of the data moved'
+    if 'estimatedTimeToCompletionInMinutes' in data:
+        line += f', {data["estimatedTimeToCompletionInMinutes"]} minutes left'
+    return line
+
+
+def wait_for_state(fetch: Callable[[], dict], states: list[str], timeout: float,
+                   fetch_progress: Callable[[str], dict] = None, interval: float = 10,
+                   report: Callable[[str], None] = click.echo, sleep: Callable[[float], None] = time.sleep,
+                   clock: Callable[[], float] = time.monotonic) -> dict:
+    """Poll a KafkaRebalance until it reaches one of the states, reporting every state change and the progress.
+
+    Args:
+        fetch (Callable[[], dict]): reads the KafkaRebalance, None while it does not exist.
+        states (list[str]): states that end the wait.
+        timeout (float): seconds to wait.
+        fetch_progress (Callable[[str], dict], optional): reads the progress ConfigMap by name while rebalancing.
+        interval (float, optional): seconds between two polls. Defaults to 10.
+        report (Callable[[str], None], optional): prints a line. Defaults to click.echo.
+        sleep (Callable[[float], None], optional): sleep function. Defaults to time.sleep.
+        clock (Callable[[], float], optional): monotonic clock. Defaults to time.monotonic.
+
+    Raises:
+        SystemError: the rebalance failed, was stopped or it is still running after the timeout.
+
+    Returns:
+        dict: the KafkaRebalance in the reached state.
+    """
+    start = clock()
+    previous = None
+    last_progress = None
+    while True:
+        resource = fetch()
+        state = rebalance_state(resource)
+        if state != previous:
+            report(f'{clock() - start:6.0f}s  {state}')
+            previous = state
+        if state in states:
+            return resource
+        if state in ('NotReady', 'Stopped'):
+            raise SystemError(f'rebalance {state}: {state_message(resource)}')
+        progress_map = (resource or {}).get('status', {}).get('progress', {}).get('rebalanceProgressConfigMap')
+        if state == 'Rebalancing' and fetch_progress is not None and progress_map:
+            line = progress_line(fetch_progress(progress_map))
+            if line is not None and line != last_progress:
+                report(f'{clock() - start:6.0f}s  {line}')
+                last_progress = line
+        remaining = timeout - (clock() - start)
+        if remaining <= 0:
+            raise SystemError(f'rebalance still {state} after {clock() - start:.0f}s')
+        sleep(min(interval, remaining))
@@ -0,0 +1,42 @@
+import json
+
+# properties of kafka-console-consumer.sh that print every field of a record, separated by tabs
+CONSOLE_PROPERTIES = ['print.timestamp=true', 'print.partition=true', 'print.offset=true', 'print.key=true']
+
+
+def parse_console_record(line: bytes) -> dict:
+    """Parse a line written by kafka-console-consumer.sh with the `CONSOLE_PROPERTIES`.
+
+    The line looks like `CreateTime:1709286000000<TAB>Partition:0<TAB>Offset:42<TAB>key<TAB>value`, the value may
+    contain tabs too.
+
+    Args:
+        line (bytes): line written by the consumer.
+
+    Returns:
+        dict: timestamp, partition, offset, key and value of the record, key is None when the record has no key.
+    """
+    text = line.decode('utf-8', errors='replace').rstrip('\n')
+    fields = text.split('\t', 4)
+    if len(fields) < 5 or not fields[1].startswith('Partition:') or not fields[2].startswith('Offset:'):
+        return {'timestamp': None, 'partition': None, 'offset': None, 'key': None, 'value': text}
+    timestamp = fields[0].partition(':')[2]
+    return {
+        'timestamp': int(timestamp) if timestamp.lstrip('-').isdigit() else None,
+        'partition': int(fields[1].split(':', 1)[1]),
+        'offset': int(fields[2].split(':', 1)[1]),
+        'key': None if fields[3] == 'null' else fields[3],
+        'value': fields[4],
+    }
+
+
+def to_json_line(line: bytes) -> bytes:
+    """Record written by the consumer as a JSON line.
+    """
+    return bytes(json.dumps(parse_console_record(line), ensure_ascii=False) + '\n', 'utf-8')
+
+
+def record_value(line: bytes) -> bytes:
+    """Only the value of a record written by the consumer, newline terminated.
+    """
+    return bytes(parse_console_record(line)['value'] + '\n', 'utf-8')
@@ -0,0 +1,116 @@
+import math
+
+BENCHMARK_TARGET = 'strimzi-kafka'
+# conservative MB/s that a single partition sustains when nothing was measured yet
+DEFAULT_PRODUCER_RATE = 10.0
+DEFAULT_CONSUMER_RATE = 20.0
+
+
+class Advice:
+    """Recommended partition count of a topic and the reasons behind it.
+
+    Args:
+        partitions (int): recommended number of partitions.
+        reasons (list[str]): one line per rule that was applied.
+    """
+
+    def __init__(self, partitions: int, reasons: list[str]):
+        self.partitions = partitions
+        self.reasons = reasons
+
+
+def partition_rates(history: list[dict], target: str = BENCHMARK_TARGET) -> dict:
+    """MB/s of a single partition measured by the latest benchmark run that recorded its partitions.
+
+    Every client of the benchmark writes or reads as fast as it can, so with fewer clients than partitions the
+    clients, not the partitions, are the limit. The aggregated rate is divided by the partitions or by the
+    clients when they are fewer, and runs that didn't record their clients are divided by the partitions.
+
+    Args:
+        history (list[dict]): benchmark runs, oldest first.
+        target (str, optional): benchmarked cluster. Defaults to 'strimzi-kafka'.
+
+    Returns:
+        dict: producer and consumer MB/s per partition (consumer None when it was not measured), time,
+        partitions, producers and consumers of the run. None when there is no such run.
+    """
+    for run in reversed(history):
+        params = run.get('params') or {}
+        partitions = params.get('partitions')
+        producer = run.get('producer') or {}
+        if run.get('target') != target or not partitions or not producer.get('mb_per_sec'):
+            continue
+        consumer = run.get('consumer') or {}
+        producers = min(partitions, params.get('producers') or partitions)
+        consumers = min(partitions, params.get('consumers') or partitions)
+        return {
+            'producer': producer['mb_per_sec'] / producers,
+            'consumer': consumer['mb_per_sec'] / consumers if consumer.get('mb_per_sec') else None,
+            'time': run.get('time'),
+            'partitions': partitions,
+            'producers': producers,
+            'consumers': consumers,
+        }
+    return None
+
+
+def recommend_partitions(target_throughput: float, consumers: int = 1, rates: dict = None,
+                         brokers: int = None) -> Advice:
+    """Partitions needed to carry a throughput: enough for the producers and for the consumers at the rate of a
+    single partition, and at least one per consumer of the group.
+
+    Args:
+        target_throughput (float): MB/s the topic must carry.
+        consumers (int, optional): consumers of the group that reads the topic. Defaults to 1.
+        rates (dict, optional): rates returned by `partition_rates`. Defaults to the conservative rates.
+        brokers (int, optional): brokers of the cluster, the count is rounded up to a multiple so every broker
+            leads the same number of partitions. Defaults to no rounding.
+
+    Raises:
+        ValueError: the throughput or the consumers are not positive.
+
+    Returns:
+        Advice: recommended partitions with the explanation.
+    """
+    if target_throughput <= 0 or consumers < 1:
+        raise ValueError('the target throughput and the consumers must be greater than 0')
+    producer_rate = (rates or {}).get('producer') or DEFAULT_PRODUCER_RATE
+    consumer_rate = (rates or {}).get('consumer') or DEFAULT_CONSUMER_RATE
+    by_producer = math.ceil(target_throughput / producer_rate)
+    by_consumer = math.ceil(target_throughput / consumer_rate)
+    partitions = max(by_producer, by_consumer, consumers)
+    if rates:
+        source = (f'rates measured by the benchmark of {rates["time"]} on {rates["partitions"]} partitions '
+                  f'with {rates.get("producers", rates["partitions"])} producers and '
+                  f'{rates.get("consumers", rates["partitions"])} consumers')
+    else:
+        source = 'default rates, run `dp kafkaop benchmark` to measure the cluster'
+    reasons = [
+        f'producers: {target_throughput:g} MB/s / {producer_rate:.1f} MB/s per partition = {by_producer} partitions',
+        f'consumers: {target_throughput:g} MB/s / {consumer_rate:.1f} MB/s per partition = {by_consumer} partitions',
+        f'consumer group: {consumers} consumers need {consumers} partitions to all get work',
+        f'per partition {source}',
+    ]
+    if brokers and partitions % brokers:
+        rounded = math.ceil(partitions / brokers) * brokers
+        reasons.append(f'rounded from {partitions} to {rounded} to spread the leaders over {brokers} brokers')
+        partitions = rounded
+    return Advice(partitions, reasons)
+
+
+def config_warnings(replicas: int, config: dict) -> list[str]:
+    """Topic configs that hurt the throughput or the availability of the topic.
+
+    Raises:
+        ValueError: min.insync.replicas is greater than the replicas, acks=all writes would always fail.
+    """
+    warnings = []
+    min_isr = int(config.get('min.insync.replicas', 1))
+    if min_isr > replicas:
+        raise ValueError(f'min.insync.replicas {min_isr} is greater than the {replicas} replicas of the topic')
+    if replicas > 1 and min_isr == replicas:
+        warnings.append(f'min.insync.replicas equals the {replicas} replicas, acks=all producers stop when a broker is down')
+    segment_bytes = config.get('segment.bytes')
+    if segment_bytes is not None and int(segment_bytes) < 16 * 1024 ** 2:
+        warnings.append('segment.bytes under 16 MiB rolls segments often and keeps many files open')
+    return warnings
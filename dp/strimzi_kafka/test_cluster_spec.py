@@ -0,0 +1,78 @@
+from unittest import TestCase, main
+from .cluster_spec import build_cluster, jvm_options, replication_config, storage_spec
+from .topics import parse_settings
+
+
+class TestClusterSpec(TestCase):
+    def test_kraft_single_pool(self):
+        pool, kafka = build_cluster('events', brokers=3, storage_size='100Gi', storage_class='fast-ssd', volumes=2)
+        self.assertEqual(kafka['metadata']['annotations'], {'strimzi.io/node-pools': 'enabled', 'strimzi.io/kraft': 'enabled'})
+        self.assertNotIn('zookeeper', kafka['spec'])
+        self.assertEqual((pool['kind'], pool['spec']['replicas'], pool['spec']['roles']),
+                         ('KafkaNodePool', 3, ['controller', 'broker']))
+        self.assertEqual(pool['metadata']['name'], 'events-dual-role')
+        self.assertEqual(pool['metadata']['labels'], {'strimzi.io/cluster': 'events'})
+        self.assertEqual([volume['id'] for volume in pool['spec']['storage']['volumes']], [0, 1])
+        self.assertEqual(pool['spec']['storage']['volumes'][0]['class'], 'fast-ssd')
+
+    def test_kraft_dedicated_controllers(self):
+        controller, broker, kafka = build_cluster(brokers=5, controllers=3, storage_size='1Ti')
+        self.assertEqual((controller['spec']['roles'], controller['spec']['replicas']), (['controller'], 3))
+        self.assertEqual((broker['spec']['roles'], broker['spec']['replicas']), (['broker'], 5))
+        self.assertEqual(controller['spec']['storage']['volumes'][0]['size'], '10Gi')
+
+    def test_node_pools_of_two_clusters_do_not_clash(self):
+        names = {document['metadata']['name'] for cluster in ('events', 'logs')
+                 for document in build_cluster(cluster, controllers=3) if document['kind'] == 'KafkaNodePool'}
+        self.assertEqual(names, {'events-controller', 'events-broker', 'logs-controller', 'logs-broker'})
+
+    def test_zookeeper_mode(self):
+        [kafka] = build_cluster(brokers=1, mode='zookeeper')
+        spec = kafka['spec']
+        self.assertEqual((spec['kafka']['replicas'], spec['zookeeper']['replicas']), (1, 1))
+        self.assertEqual(spec['kafka']['storage'], {'type': 'ephemeral'})
+        self.assertEqual(spec['kafka']['config']['inter.broker.protocol.version'], '3.7')
+        self.assertEqual(spec['kafka']['config']['offsets.topic.replication.factor'], 1)
+        with self.assertRaises(ValueError):
+            build_cluster(mode='zookeeper', controllers=3)
+
+    def test_profiles_and_overrides(self):
+        kafka = build_cluster(profile='throughput', config={'num.io.threads': 32})[-1]['spec']['kafka']['config']
+        self.assertEqual((kafka['compression.type'], kafka['num.network.threads'], kafka['num.io.threads']), ('lz4', 8, 32))
+        self.assertEqual(build_cluster(profile='low-latency')[-1]['spec']['kafka']['config']['replica.fetch.wait.max.ms'], 50)
+        durable = build_cluster(profile='durable')[-1]['spec']['kafka']['config']
+        self.assertEqual((durable['min.insync.replicas'], durable['unclean.leader.election.enable']), (2, False))
+        with self.assertRaises(ValueError):
+            build_cluster(brokers=2, profile='durable')
+        with self.assertRaises(ValueError):
+            build_cluster(profile='fastest')
+
+    def test_cruise_control(self):
+        self.assertEqual(build_cluster(cruise_control=True)[-1]['spec']['cruiseControl'], {})
+        self.assertNotIn('cruiseControl', build_cluster()[-1]['spec'])
+        with self.assertRaises(ValueError):
+            build_cluster(brokers=1, cruise_control=True)
+
+    def test_replication_follows_brokers(self):
+        self.assertEqual(replication_config(5)['default.replication.factor'], 3)
+        self.assertEqual(replication_config(2)['min.insync.replicas'], 1)
+
+    def test_resources(self):
+        pool = build_cluster(cpu=2, memory='8Gi')[0]['spec']
+        self.assertEqual(pool['resources'], {'requests': {'cpu': '2', 'memory': '8Gi'}, 'limits': {'memory': '8Gi'}})
+        self.assertEqual(pool['jvmOptions'], {'-Xms': '4096m', '-Xmx': '4096m'})
+        self.assertEqual(jvm_options('256Mi'), {'-Xms': '256m', '-Xmx': '256m'})
+        with self.assertRaises(ValueError):
+            storage_spec('lots')
+
+    def test_parse_settings(self):
+        self.assertEqual(parse_settings(['retention.ms=60000', 'cleanup.policy=compact']),
+                         {'retention.ms': 60000, 'cleanup.policy': 'compact'})
+        self.assertEqual(parse_settings(['preallocate=no', 'x=[bad', 'min.cleanable.dirty.ratio=0.5']),
+                         {'preallocate': 'no', 'x': '[bad', 'min.cleanable.dirty.ratio': '0.5'})
+        with self.assertRaises(ValueError):
+            parse_settings(['retention.ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import json
+from unittest import TestCase, main
+from .lag import format_table, inactive_groups, parse_describe, rates, summarize, to_json
+
+DESCRIBE_OUTPUT = '''
+GROUP      TOPIC    PARTITION CURRENT-OFFSET LOG-END-OFFSET LAG CONSUMER-ID         HOST         CLIENT-ID
+orders-app orders   0         1500           1520           20  consumer-1-0b6c1f9e /10.244.0.12 consumer-orders-app-1
+orders-app orders   1         900            1400           500 consumer-1-0b6c1f9e /10.244.0.12 consumer-orders-app-1
+orders-app orders   2         -              300            -   consumer-2-7d1e2f3a /10.244.0.13 consumer-orders-app-2
+orders-app payments 0         40             40             0   consumer-2-7d1e2f3a /10.244.0.13 consumer-orders-app-2
+
+Consumer group 'audit' has no active members.
+
+GROUP TOPIC  PARTITION CURRENT-OFFSET LOG-END-OFFSET LAG  CONSUMER-ID HOST CLIENT-ID
+audit orders 0         100            1520           1420 -           -    -
+audit orders 1         100            1400           1300 -           -    -
+'''
+
+REBALANCING_OUTPUT = '''
+Warning: Consumer group 'orders-app' is rebalancing.
+
+GROUP      TOPIC  PARTITION CURRENT-OFFSET LOG-END-OFFSET LAG CONSUMER-ID HOST CLIENT-ID
+orders-app orders 0         1510           1530           20  -           -    -
+'''
+
+
+class TestParseDescribe(TestCase):
+    def test_rows(self):
+        rows = parse_describe(DESCRIBE_OUTPUT)
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1], {'group': 'orders-app', 'topic': 'orders', 'partition': 1, 'committed': 900,
+                                   'log_end': 1400, 'lag': 500,
+                                   'consumer': 'consumer-1-0b6c1f9e',
+                                   'host': '/10.244.0.12', 'client': 'consumer-orders-app-1'})
+        self.assertEqual((rows[2]['committed'], rows[2]['lag']), (None, None))
+        self.assertIsNone(rows[-1]['consumer'])
+
+    def test_messages_are_skipped(self):
+        self.assertEqual(len(parse_describe(REBALANCING_OUTPUT)), 1)
+        self.assertEqual(parse_describe('Error: Consumer group \'nope\' does not exist.\n'), [])
+        self.assertEqual(inactive_groups(DESCRIBE_OUTPUT), ['audit'])
+
+
+class TestSummary(TestCase):
+    def test_worst_offenders_first(self):
+        summary = summarize(parse_describe(DESCRIBE_OUTPUT))
+        self.assertEqual([(entry['group'], entry['topic'], entry['lag']) for entry in summary],
+                         [('audit', 'orders', 2720), ('orders-app', 'orders', 520), ('orders-app', 'payments', 0)])
+        orders = summary[1]
+        self.assertEqual((orders['partitions'], orders['members'], orders['uncommitted']), (3, 2, 1))
+        self.assertEqual((orders['max_lag'], orders['worst_partition']), (500, 1))
+
+    def test_rates(self):
+        before = summarize(parse_describe(DESCRIBE_OUTPUT))
+        later = DESCRIBE_OUTPUT.replace('1500           1520           20', '2000           2020           20')
+        later = later.replace('100            1520           1420', '100            2020           1920')
+        after = [entry for entry in summarize(parse_describe(later)) if entry['topic'] == 'orders']
+        self.assertEqual(rates(before, after, 10), {('audit', 'orders'): {'lag_rate': 50.0, 'consumed_rate': 0.0},
+                                                    ('orders-app', 'orders'): {'lag_rate': 0.0, 'consumed_rate': 50.0}})
+        self.assertEqual(rates(before, after, 0), {})
+
+    def test_table_and_json(self):
+        summary = summarize(parse_describe(DESCRIBE_OUTPUT))
+        lines = format_table(summary, changes={('audit', 'orders'): {'lag_rate': 12.5, 'consumed_rate': 0.0}}, top=2)
+        self.assertEqual(lines[0].split(), ['GROUP', 'TOPIC', 'PARTITIONS', 'MEMBERS', 'LAG', 'MAX', 'LAG',
+                                            '(PARTITION)', 'LAG/S', 'CONSUMED/S'])
+        self.assertEqual(lines[1].split(), ['audit', 'orders', '2', '0', '2720', '1420', '(0)', '+12.5', '0.0'])
+        self.assertEqual(lines[2].split()[-2:], ['-', '-'])
+        self.assertEqual(lines[-1], 'and 1 more')
+        report = json.loads(to_json(summary, [], inactive=['audit']))
+        self.assertEqual((report['groups'][0]['lag'], report['inactive_groups']), (2720, ['audit']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+from unittest import TestCase, main
+from .rebalance import HARD_GOALS, goal_names, progress_line, proposal_summary, rebalance_manifest, wait_for_state
+
+
+def rebalance(state: str, **status) -> dict:
+    return {'status': {'conditions': [{'type': state, 'status': 'True', 'message': f'{state} message'}], **status}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class TestManifest(TestCase):
+    def test_goals_keep_the_hard_goals(self):
+        self.assertEqual(goal_names(['disk', 'disk']), HARD_GOALS + ['DiskUsageDistributionGoal'])
+        self.assertEqual(goal_names(['leaders'], skip_hard_goal_check=True),
+                         ['LeaderReplicaDistributionGoal', 'LeaderBytesInDistributionGoal'])
+        self.assertEqual(goal_names([]), [])
+        with self.assertRaises(ValueError):
+            goal_names(['latency'])
+
+    def test_modes(self):
+        manifest = rebalance_manifest('scale-out', 'events', mode='add-brokers', brokers=[3, 4])
+        self.assertEqual(manifest['spec'], {'mode': 'add-brokers', 'brokers': [3, 4]})
+        self.assertEqual(manifest['metadata']['labels'], {'strimzi.io/cluster': 'events'})
+        with self.assertRaises(ValueError):
+            rebalance_manifest('r', 'events', mode='remove-brokers')
+        with self.assertRaises(ValueError):
+            rebalance_manifest('r', 'events', brokers=[1])
+
+
+class TestStatus(TestCase):
+    def test_proposal_summary(self):
+        lines = proposal_summary(rebalance('ProposalReady', optimizationResult={
+            'dataToMoveMB': 1024, 'numReplicaMovements': 40, 'numLeaderMovements': 7, 'excludedTopics': ['audit']}))
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('data to move (MB)') and lines[0].endswith('  1024'))
+        self.assertTrue(lines[-1].endswith('audit'))
+
+    def test_progress_line(self):
+        self.assertEqual(progress_line({'data': {'completedByteMovementPercentage': '40',
+                                                 'estimatedTimeToCompletionInMinutes': '5'}}),
+                         '40% of the data moved, 5 minutes left')
+        self.assertIsNone(progress_line(None))
+
+
+class TestWaitForState(TestCase):
+    def test_progress_until_ready(self):
+        clock = FakeClock()
+        progress = rebalance('Rebalancing', progress={'rebalanceProgressConfigMap': 'r'})
+        states = [None, rebalance('ProposalReady'), progress, progress, rebalance('Ready')]
+        maps = [{'data': {'completedByteMovementPercentage': '10'}}, {'data': {'completedByteMovementPercentage': '10'}}]
+        lines = []
+        resource = wait_for_state(lambda: states.pop(0), ['Ready'], 60, fetch_progress=lambda name: maps.pop(0),
+                                  interval=5, report=lines.append, sleep=clock.sleep, clock=clock)
+        self.assertEqual(resource['status']['conditions'][0]['type'], 'Ready')
+        self.assertEqual([line.split('s  ', 1)[1] for line in lines],
+                         ['New', 'ProposalReady', 'Rebalancing', '10% of the data moved', 'Ready'])
+
+    def test_failures(self):
+        clock = FakeClock()
+        with self.assertRaisesRegex(SystemError, 'NotReady message'):
+            wait_for_state(lambda: rebalance('NotReady'), ['ProposalReady'], 60, report=lambda line: None,
+                           sleep=clock.sleep, clock=clock)
+        with self.assertRaisesRegex(SystemError, 'still PendingProposal'):
+            wait_for_state(lambda: rebalance('PendingProposal'), ['ProposalReady'], 30, report=lambda line: None,
+                           sleep=clock.sleep, clock=clock)
+        self.assertEqual(clock.now, 30)
+
+
+if __name__ == '__main__':
+    main()
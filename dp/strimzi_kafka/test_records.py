@@ -0,0 +1,27 @@
+import json
+from unittest import TestCase, main
+from .records import parse_console_record, record_value, to_json_line
+
+
+class TestConsoleRecords(TestCase):
+    def test_record_with_every_field(self):
+        record = parse_console_record(b'CreateTime:1709286000000\tPartition:2\tOffset:42\tuser-1\thello\tworld\n')
+        self.assertEqual(record, {'timestamp': 1709286000000, 'partition': 2, 'offset': 42, 'key': 'user-1',
+                                  'value': 'hello\tworld'})
+
+    def test_record_without_key_or_timestamp(self):
+        record = parse_console_record(b'NO_TIMESTAMP\tPartition:0\tOffset:0\tnull\tvalue\n')
+        self.assertIsNone(record['key'])
+        self.assertIsNone(record['timestamp'])
+
+    def test_unknown_lines_are_kept_as_value(self):
+        self.assertEqual(parse_console_record(b'plain text\n')['value'], 'plain text')
+
+    def test_json_line_and_value(self):
+        line = b'CreateTime:1\tPartition:0\tOffset:7\tnull\tm\xc3\xa1s\n'
+        self.assertEqual(json.loads(to_json_line(line))['offset'], 7)
+        self.assertEqual(record_value(line), 'más\n'.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    main()
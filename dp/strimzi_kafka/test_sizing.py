@@ -0,0 +1,56 @@
+from unittest import TestCase, main
+from .sizing import config_warnings, partition_rates, recommend_partitions
+
+RUN = {'time': '2024-05-01T10:00:00+0000', 'target': 'strimzi-kafka',
+       'params': {'partitions': 6, 'producers': 6, 'consumers': 6},
+       'producer': {'mb_per_sec': 90.0}, 'consumer': {'mb_per_sec': 180.0}}
+
+
+class TestPartitionRates(TestCase):
+    def test_latest_run_with_partitions(self):
+        old = {**RUN, 'params': {}, 'time': 'older'}
+        other = {**RUN, 'target': 'redpanda'}
+        rates = partition_rates([RUN, old, other])
+        self.assertEqual((rates['producer'], rates['consumer'], rates['partitions']), (15.0, 30.0, 6))
+
+    def test_fewer_clients_than_partitions(self):
+        rates = partition_rates([{**RUN, 'params': {'partitions': 6, 'producers': 1, 'consumers': 2}}])
+        self.assertEqual((rates['producer'], rates['consumer']), (90.0, 90.0))
+        self.assertIn('with 1 producers and 2 consumers', recommend_partitions(60, rates=rates).reasons[-1])
+        self.assertEqual(partition_rates([{**RUN, 'params': {'partitions': 6}}])['producer'], 15.0)
+
+    def test_no_measured_run(self):
+        self.assertIsNone(partition_rates([{**RUN, 'params': {}}]))
+        self.assertIsNone(partition_rates([]))
+        self.assertIsNone(partition_rates([{**RUN, 'consumer': None}])['consumer'])
+
+
+class TestRecommendPartitions(TestCase):
+    def test_default_rates(self):
+        advice = recommend_partitions(75)
+        self.assertEqual(advice.partitions, 8)
+        self.assertIn('default rates', advice.reasons[-1])
+
+    def test_measured_rates_and_consumers(self):
+        rates = partition_rates([RUN])
+        self.assertEqual(recommend_partitions(60, rates=rates).partitions, 4)
+        self.assertEqual(recommend_partitions(60, consumers=12, rates=rates).partitions, 12)
+
+    def test_rounded_to_brokers(self):
+        advice = recommend_partitions(75, brokers=3)
+        self.assertEqual(advice.partitions, 9)
+        self.assertIn('rounded from 8 to 9', advice.reasons[-1])
+        with self.assertRaises(ValueError):
+            recommend_partitions(0)
+
+
+class TestConfigWarnings(TestCase):
+    def test_min_insync_replicas(self):
+        self.assertEqual(config_warnings(3, {'min.insync.replicas': 2}), [])
+        self.assertEqual(len(config_warnings(3, {'min.insync.replicas': 3, 'segment.bytes': 1048576})), 2)
+        with self.assertRaises(ValueError):
+            config_warnings(1, {'min.insync.replicas': 2})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase, main
+from .topics import batch_documents, parse_catalog, timing_summary
+
+
+class TestParseCatalog(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def catalog(self, name: str, text: str) -> str:
+        file = Path(self.directory.name, name)
+        file.write_text(text)
+        return str(file)
+
+    def test_yaml_list(self):
+        topics = parse_catalog(self.catalog('topics.yaml', '''
+- name: orders
+  partitions: 12
+  replicas: 3
+  config:
+    retention.ms: 7200000
+- name: events
+'''))
+        self.assertEqual(topics, [
+            {'name': 'orders', 'partitions': 12, 'replicas': 3, 'config': {'retention.ms': 7200000}},
+            {'name': 'events', 'partitions': 1, 'replicas': 1, 'config': {}},
+        ])
+
+    def test_yaml_mapping_with_topics(self):
+        topics = parse_catalog(self.catalog('topics.yml', 'topics:\n- name: orders\n'), default_partitions=6)
+        self.assertEqual(topics[0]['partitions'], 6)
+
+    def test_csv_with_config_and_extra_columns(self):
+        topics = parse_catalog(self.catalog('topics.csv', '''name,partitions,replicas,config,cleanup.policy
+orders,3,1,retention.ms=1000;segment.bytes=1048576;preallocate=yes,compact
+events,,,,
+'''))
+        self.assertEqual(topics[0]['config'],
+                         {'retention.ms': 1000, 'segment.bytes': 1048576, 'preallocate': 'yes', 'cleanup.policy': 'compact'})
+        self.assertEqual(topics[1], {'name': 'events', 'partitions': 1, 'replicas': 1, 'config': {}})
+
+    def test_repeated_or_missing_names(self):
+        with self.assertRaises(ValueError):
+            parse_catalog(self.catalog('topics.yaml', '- name: a\n- name: a\n'))
+        with self.assertRaises(ValueError):
+            parse_catalog(self.catalog('topics.csv', 'name,partitions\n,3\n'))
+
+
+class TestBatchDocuments(TestCase):
+    def test_batches_by_count(self):
+        documents = [{'metadata': {'name': f'topic-{i}'}} for i in range(5)]
+        batches = batch_documents(documents, max_documents=2)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+
+    def test_batches_by_size(self):
+        documents = [{'metadata': {'name': 'x' * 100}} for _ in range(4)]
+        batches = batch_documents(documents, max_bytes=300)
+        self.assertEqual([len(batch) for batch in batches], [2, 2])
+
+    def test_big_document_gets_its_own_batch(self):
+        documents = [{'data': 'x' * 1000}, {'data': 'y'}]
+        self.assertEqual(len(batch_documents(documents, max_bytes=100)), 2)
+
+
+class TestTimingSummary(TestCase):
+    def test_slowest_first(self):
+        lines = timing_summary({'a': 1.0, 'b': 3.0, 'c': 2.0})
+        self.assertTrue(lines[0].startswith('b'))
+        self.assertEqual(lines[-1], '3 topics ready, p50 2.00s, p95 3.00s, max 3.00s')
+
+    def test_empty(self):
+        self.assertEqual(timing_summary({}), [])
+
+
+if __name__ == '__main__':
+    main()
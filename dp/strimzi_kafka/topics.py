@@ -0,0 +1,140 @@
+import csv
+import re
+from os import path
+
+CATALOG_COLUMNS = ('name', 'partitions', 'replicas', 'config')
+_INTEGER = re.compile(r'^-?\d+$')
+
+
+def parse_catalog(catalog_path: str, default_partitions: int = 1, default_replicas: int = 1) -> list[dict]:
+    """Read a topic catalog from a YAML or CSV file.
+
+    YAML catalogs are a list of topics, or a mapping with a `topics` list. Every topic has a `name` and optional
+    `partitions`, `replicas` and `config` keys. CSV catalogs have a `name` column and optional `partitions`,
+    `replicas` and `config` columns, where config is written as `key=value;key=value`. Any other CSV column is
+    used as a topic config with the column name as key.
+
+    Args:
+        catalog_path (str): path of the .yaml, .yml or .csv catalog.
+        default_partitions (int, optional): partitions of the topics that don't set them. Defaults to 1.
+        default_replicas (int, optional): replicas of the topics that don't set them. Defaults to 1.
+
+    Raises:
+        ValueError: a topic has no name or a name is repeated.
+
+    Returns:
+        list[dict]: topics with the keys name, partitions, replicas and config.
+    """
+    import yaml
+    with open(catalog_path, newline='') as f:
+        if path.splitext(catalog_path)[1].lower() == '.csv':
+            rows = [_csv_row(row) for row in csv.DictReader(f)]
+        else:
+            rows = yaml.safe_load(f) or []
+            if isinstance(rows, dict):
+                rows = rows.get('topics') or []
+
+    topics = []
+    names = set()
+    for number, row in enumerate(rows, start=1):
+        name = str(row.get('name') or '').strip()
+        if not name:
+            raise ValueError(f'Topic {number} of {catalog_path} has no name')
+        if name in names:
+            raise ValueError(f'Topic {name} is repeated in {catalog_path}')
+        names.add(name)
+        topics.append({
+            'name': name,
+            'partitions': int(row.get('partitions') or default_partitions),
+            'replicas': int(row.get('replicas') or default_replicas),
+            'config': dict(row.get('config') or {}),
+        })
+    return topics
+
+
+def _csv_row(row: dict) -> dict:
+    config = {}
+    for item in (row.get('config') or '').split(';'):
+        if item.strip():
+            key, _, value = item.partition('=')
+            config[key.strip()] = _scalar(value.strip())
+    for key, value in row.items():
+        if key not in CATALOG_COLUMNS and key is not None and value not in (None, ''):
+            config[key.strip()] = _scalar(value.strip())
+    return {**row, 'config': config}
+
+
+def parse_settings(items: list[str]) -> dict:
+    """Configs given on the command line as `key=value`, plain integers are converted and the rest kept as strings.
+
+    Args:
+        items (list[str]): `key=value` strings.
+
+    Raises:
+        ValueError: an item is not written as `key=value`.
+
+    Returns:
+        dict: configs by key, the last value wins.
+    """
+    settings = {}
+    for item in items:
+        key, separator, value = item.partition('=')
+        if not separator or not key.strip():
+            raise ValueError(f'invalid config {item}, use key=value')
+        settings[key.strip()] = _scalar(value.strip())
+    return settings
+
+
+def _scalar(value: str):
+    """Plain integers are written to the KafkaTopic as numbers, any other value is kept as written, so `yes`,
+    `off` or `[x` are not read as YAML booleans or lists.
+    """
+    return int(value) if _INTEGER.match(value) else value
+
+
+def batch_documents(documents: list[dict], max_bytes: int = 256 * 1024, max_documents: int = 500) -> list[list[dict]]:
+    """Split documents in batches whose rendered YAML stays under a size limit.
+
+    Args:
+        documents (list[dict]): kubernetes resources.
+        max_bytes (int, optional): maximum size of a batch. Defaults to 256 KiB.
+        max_documents (int, optional): maximum number of documents of a batch. Defaults to 500.
+
+    Returns:
+        list[list[dict]]: batches of documents, a document bigger than the limit gets its own batch.
+    """
+    import yaml
+    batches = []
+    batch = []
+    size = 0
+    for document in documents:
+        document_size = len(yaml.safe_dump(document, default_flow_style=False).encode('utf-8')) + len('---\n')
+        if batch and (size + document_size > max_bytes or len(batch) >= max_documents):
+            batches.append(batch)
+            batch = []
+            size = 0
+        batch.append(document)
+        size += document_size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def timing_summary(waited: dict[str, float]) -> list[str]:
+    """Lines with the time every topic needed to be ready, slowest first, and the percentiles.
+
+    Args:
+        waited (dict[str, float]): seconds waited for every topic.
+
+    Returns:
+        list[str]: lines of the summary.
+    """
+    if not waited:
+        return []
+    times = sorted(waited.values())
+    width = max(len(name) for name in waited)
+    lines = [f'{name:<{width}}  {seconds:7.2f}s' for name, seconds in sorted(waited.items(), key=lambda item: -item[1])]
+    p50 = times[(len(times) - 1) // 2]
+    p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+    lines.append(f'{len(times)} topics ready, p50 {p50:.2f}s, p95 {p95:.2f}s, max {times[-1]:.2f}s')
+    return lines
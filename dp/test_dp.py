@@ -0,0 +1,22 @@
+import importlib
+import sys
+from os import path
+from unittest import TestCase, main
+
+# the component modules import `utils` as the dp script does, from the dp directory
+sys.path.insert(0, path.dirname(path.abspath(__file__)))
+from dp.dp import SUBCOMMAND_HELP, SUBCOMMANDS  # noqa: E402
+
+
+class TestSubcommandHelp(TestCase):
+    def test_static_help_matches_the_groups(self):
+        self.assertEqual(set(SUBCOMMAND_HELP), set(SUBCOMMANDS))
+        for name, import_path in SUBCOMMANDS.items():
+            module_name, _, attribute = import_path.rpartition('.')
+            command = getattr(importlib.import_module(module_name), attribute)
+            with self.subTest(name):
+                self.assertEqual(command.get_short_help_str(limit=1000), SUBCOMMAND_HELP[name])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import json
+import time
+import click
+from functools import partial
+from .executor import run_parallel
+from . import perf
+from . import subprocess_com as utils
+
+
+def run_benchmark(exec_prefix: list, bootstrap: str, topic: str, target: str, records: int, record_size: int,
+                  throughput: int = -1, acks: str = 'all', compression: str = 'none', producers: int = 1,
+                  consumers: int = 1, history_file: str = perf.HISTORY_FILE, partitions: int = None) -> dict:
+    """Run the kafka perf-test tools inside a client pod and store the result in the history file.
+
+    The producers run at the same time and write `records` between all of them, then the consumers read the
+    records back sharing a consumer group.
+
+    Args:
+        exec_prefix (list): command that runs a program in the client pod, e.g. kubectl exec ... --.
+        bootstrap (str): bootstrap servers of the cluster.
+        topic (str): benchmark topic, it must exist.
+        target (str): name of the benchmarked cluster, runs are only compared with runs of the same target.
+        records (int): total number of records.
+        record_size (int): size of every record in bytes.
+        throughput (int, optional): target records per second of every producer, -1 for no limit. Defaults to -1.
+        acks (str, optional): producer acks. Defaults to 'all'.
+        compression (str, optional): compression type. Defaults to 'none'.
+        producers (int, optional): number of parallel producers. Defaults to 1.
+        consumers (int, optional): number of parallel consumers, 0 skips the consumer phase. Defaults to 1.
+        history_file (str, optional): JSON lines file with the previous runs.
+        partitions (int, optional): partitions of the topic, stored to derive the throughput of a partition.
+
+    Raises:
+        SystemError: Error with the stderr from the perf-test tools
+
+    Returns:
+        dict: benchmark run with the parameters and the producer and consumer results.
+    """
+    params = {'topic': topic, 'records': records, 'record_size': record_size, 'throughput': throughput,
+              'acks': acks, 'compression': compression, 'producers': producers, 'consumers': consumers}
+    if partitions is not None:
+        params['partitions'] = partitions
+
+    click.echo('-------------------------------------------')
+    click.echo(f'Producing {records} records of {record_size} bytes with {producers} producers')
+    click.echo('-------------------------------------------')
+    commands = [exec_prefix + perf.producer_command(bootstrap, topic, share, record_size, throughput, acks, compression)
+                for share in split(records, producers)]
+    producer = perf.aggregate([perf.parse_producer(output) for output in _run_clients(commands)])
+
+    consumer = None
+    if consumers > 0:
+        click.echo('-------------------------------------------')
+        click.echo(f'Consuming {records} records with {consumers} consumers')
+        click.echo('-------------------------------------------')
+        group = f'dp-benchmark-{int(time.time())}'
+        commands = [exec_prefix + perf.consumer_command(bootstrap, topic, share, group)
+                    for share in split(records, consumers)]
+        consumer = perf.aggregate([perf.parse_consumer(output) for output in _run_clients(commands)])
+
+    return record_run(perf.new_run(target, params, producer, consumer), history_file)
+
+
+def record_run(run: dict, history_file: str = perf.HISTORY_FILE) -> dict:
+    """Print a benchmark run as JSON, compare it with the previous run with the same options and store it.
+
+    Args:
+        run (dict): run built with `perf.new_run`.
+        history_file (str, optional): JSON lines file with the previous runs.
+
+    Returns:
+        dict: the same run.
+    """
+    previous = perf.previous_run(run, perf.load_history(history_file))
+    perf.append_history(run, history_file)
+    click.echo(json.dumps(run, indent=2))
+    if previous is not None:
+        click.echo('-------------------------------------------')
+        click.echo(f'Change against the run of {previous["time"]} (%):')
+        click.echo(json.dumps(perf.compare(run, previous), indent=2))
+        click.echo('-------------------------------------------')
+    return run
+
+
+def split(records: int, clients: int) -> list[int]:
+    """Share of the records of every client, the first clients take the remainder.
+
+    Raises:
+        ValueError: there are no clients.
+    """
+    if clients < 1:
+        raise ValueError(f'the records need at least 1 client, got {clients}')
+    share, extra = divmod(records, clients)
+    return [share + (1 if i < extra else 0) for i in range(clients)]
+
+
+def _run_clients(commands: list[list]) -> list[str]:
+    results = run_parallel(*[partial(utils.__run_subprocess, command) for command in commands])
+    for result in results:
+        if result.returncode != 0:
+            click.echo('-------------------------------------------')
+            click.echo('Failed running the benchmark client')
+            click.echo(f'Error: {result.stderr}')
+            click.echo('-------------------------------------------')
+            raise SystemError(result.stderr)
+    return [result.stdout.decode('utf-8', errors='replace') for result in results]
@@ -4,6 +4,7 @@ FLINK_OP_NS = "flink-operator"
 FLINK_REPO = "flink-operator"
 FLINK_OP = "flink-operator/flink-kubernetes-operator"
 FLINK_VALUES = "flinkop-values.yaml"
+FLINK_OP_DEPLOYMENT = "flink-kubernetes-operator"
 
 # minio constants
 MINIO_NS = "minio-operator"
@@ -13,6 +14,7 @@ MINIO_TENANT = "minio-operator/tenant"
 MINIO_VALUES = "minio-tenant-values.yaml"
 MINIO_TENANT_OP = "minio-operator/tenant"
 MINIO_T_REPO = "tenant1"
+MINIO_OP_DEPLOYMENT = "minio-operator"
 
 # scylladb constants
 
@@ -22,6 +24,9 @@ SCYLLA_REPO = "scylla"
 SCYLLA_OP = "scylla/scylla-operator"
 SCYLLA_SC_OP = "scylla/scylla"
 SCYLLA_VALUES = "scylla-values.yaml"
+SCYLLA_OP_DEPLOYMENT = "scylla-operator"
+SCYLLA_OP_WEBHOOK = "scylla-operator"
+SCYLLA_CRD = "scyllaclusters.scylla.scylladb.com"
 
 # sparkop constants
 
@@ -30,6 +35,7 @@ SPARK_NS = "spark-jobs"
 SPARK_REPO = "spark-operator"
 SPARK_OP = "spark-operator/spark-operator"
 SPARK_VALUES = "sparkop-values.yaml"
+SPARK_OP_DEPLOYMENT = "spark-operator"
 
 # kafkaop constants
 
@@ -38,4 +44,20 @@ KAFKA_NS = "kafka"
 KAFKA_REPO = "strimzi"
 KAFKA_OP = "strimzi/strimzi-kafka-operator"
 KAFKA_VALUES = "kafka-topic-create.yaml"
-KAFKA_OP_VALUES = "kafkaop-strimzi-values.yaml"
\ No newline at end of file
+KAFKA_OP_VALUES = "kafkaop-strimzi-values.yaml"
+KAFKA_OP_DEPLOYMENT = "strimzi-cluster-operator"
+KAFKA_IMAGE = "quay.io/strimzi/kafka:0.39.0-kafka-3.6.1"
+KAFKA_BOOTSTRAP = "my-cluster-kafka-bootstrap:9092"
+KAFKA_CLIENT_POD = "kafka-client"
+
+# cert-manager constants
+
+CERT_MANAGER_NS = "cert-manager"
+CERT_MANAGER_DEPLOYMENTS = ["cert-manager", "cert-manager-cainjector", "cert-manager-webhook"]
+CERT_MANAGER_WEBHOOK = "cert-manager-webhook"
+CERT_MANAGER_CRDS = ["certificates.cert-manager.io", "issuers.cert-manager.io", "clusterissuers.cert-manager.io"]
+
+# install plan steps shared by several components
+
+CERT_MANAGER_STEP = "cert-manager"
+HELM_UPDATE_STEP = "helm-update"
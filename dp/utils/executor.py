@@ -0,0 +1,323 @@
+import asyncio
+import inspect
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from subprocess import PIPE, CompletedProcess, TimeoutExpired
+from typing import Awaitable, Callable, Coroutine, Iterable
+from .tracing import command_name, get_tracer
+
+DEFAULT_MAX_WORKERS = 8
+READ_CHUNK_SIZE = 64 * 1024
+# option that selects the kubeconfig context of every tool
+CONTEXT_OPTIONS = {'kubectl': '--context', 'helm': '--kube-context'}
+
+OutputCallback = Callable[[bytes], None | Awaitable[None]]
+
+
+class CommandExecutor:
+    """Run operating system commands as asyncio subprocesses.
+
+    All the commands are executed in a single event loop that lives in a background thread, so any number of
+    threads can submit commands at the same time and the executor takes care of limiting how many processes
+    are alive at once.
+
+    Args:
+        max_workers (int, optional): maximum number of commands running at the same time. Defaults to 8.
+        timeout (float, optional): default timeout in seconds for every command. Defaults to None (no timeout).
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, timeout: float = None):
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0')
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._loop: asyncio.AbstractEventLoop = None
+        self._thread: threading.Thread = None
+        self._lock = threading.Lock()
+
+    async def run(self, commands: list, input: str | bytes | Iterable = None, capture: bool = True, timeout: float = None,
+                  on_stdout: OutputCallback = None, on_stderr: OutputCallback = None,
+                  bounded: bool = True) -> CompletedProcess[bytes]:
+        """Run a command, waiting for a free worker slot first.
+
+        stdout and stderr are drained concurrently, so a chatty process never blocks on a full pipe.
+
+        kubectl and helm commands are pointed to the context of $DP_KUBE_CONTEXT, see `with_context`.
+
+        Args:
+            commands (list): command and arguments to run in the operating system.
+            input (str | bytes | Iterable, optional): data sent to the stdin of the process, or an iterable of
+                str or bytes chunks that is consumed lazily while the process reads them. Defaults to None.
+            capture (bool, optional): keep stdout and stderr in the returned result. Defaults to True.
+            timeout (float, optional): seconds before the process is killed. Defaults to the executor timeout.
+            on_stdout (Callable[[bytes], None], optional): called with every line written to stdout.
+            on_stderr (Callable[[bytes], None], optional): called with every line written to stderr.
+            bounded (bool, optional): take a worker slot. Long running watches pass False. Defaults to True.
+
+        Raises:
+            TimeoutExpired: the command did not finish before the timeout.
+
+        Returns:
+            CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        commands = with_context(commands)
+        if not bounded:
+            return await self._run(commands, input, capture, timeout, on_stdout, on_stderr)
+        async with self._semaphore:
+            return await self._run(commands, input, capture, timeout, on_stdout, on_stderr)
+
+    async def run_all(self, commands_list: Iterable[list], **kwargs) -> list[CompletedProcess[bytes]]:
+        """Run several commands concurrently, bounded by the worker limit.
+
+        Args:
+            commands_list (Iterable[list]): commands to run.
+            **kwargs: options forwarded to `run` for every command.
+
+        Returns:
+            list[CompletedProcess[bytes]]: results in the same order as the commands.
+        """
+        return list(await asyncio.gather(*(self.run(commands, **kwargs) for commands in commands_list)))
+
+    async def _run(self, commands: list, input: str | bytes | Iterable, capture: bool, timeout: float,
+                   on_stdout: OutputCallback, on_stderr: OutputCallback) -> CompletedProcess[bytes]:
+        stream_stdout = capture or on_stdout is not None
+        stream_stderr = capture or on_stderr is not None
+        process = await asyncio.create_subprocess_exec(
+            *commands,
+            stdin=PIPE if input is not None else None,
+            stdout=PIPE if stream_stdout else None,
+            stderr=PIPE if stream_stderr else None)
+
+        stdout_chunks = [] if capture else None
+        stderr_chunks = [] if capture else None
+        tasks = {}
+        if stream_stdout:
+            tasks['stdout_bytes'] = _drain(process.stdout, stdout_chunks, on_stdout)
+        if stream_stderr:
+            tasks['stderr_bytes'] = _drain(process.stderr, stderr_chunks, on_stderr)
+        if input is not None:
+            tasks['stdin_bytes'] = _feed(process.stdin, input)
+
+        tracer = get_tracer()
+        span = tracer.start(command_name(commands), 'command', command=' '.join(map(str, commands)))
+        try:
+            *sizes, _ = await asyncio.wait_for(asyncio.gather(*tasks.values(), process.wait()), timeout)
+        except TimeoutError:
+            await _kill(process)
+            tracer.finish(span, exit_code=process.returncode, error='timeout')
+            raise TimeoutExpired(commands, timeout, _join(stdout_chunks), _join(stderr_chunks))
+        except BaseException as e:
+            await _kill(process)
+            tracer.finish(span, exit_code=process.returncode, error=type(e).__name__)
+            raise
+
+        tracer.finish(span, exit_code=process.returncode, **dict(zip(tasks, sizes)))
+        return CompletedProcess(commands, process.returncode, _join(stdout_chunks), _join(stderr_chunks))
+
+    def submit(self, coroutine: Coroutine) -> Future:
+        """Schedule a coroutine in the executor event loop from any thread.
+
+        Args:
+            coroutine (Coroutine): coroutine to run, usually built with `run` or `run_all`.
+
+        Returns:
+            Future: concurrent future with the result of the coroutine.
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError('Blocking calls cannot be made from the executor event loop, await the coroutine instead')
+        return asyncio.run_coroutine_threadsafe(coroutine, loop)
+
+    def run_sync(self, commands: list, **kwargs) -> CompletedProcess[bytes]:
+        """Synchronous facade over `run`, blocks the calling thread until the command ends.
+
+        Args:
+            commands (list): command and arguments to run in the operating system.
+            **kwargs: options accepted by `run`.
+
+        Returns:
+            CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
+        """
+        return self.submit(self.run(commands, **kwargs)).result()
+
+    def close(self) -> None:
+        """Stop the background event loop. The executor starts a new one if it is used again.
+        """
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='dp-executor', daemon=True)
+                self._thread.start()
+            return self._loop
+
+
+async def _drain(stream: asyncio.StreamReader, chunks: list, callback: OutputCallback) -> int:
+    """Read a stream until EOF, keeping the data and calling back once per line. Returns the bytes read.
+
+    Callbacks may be coroutine functions, the stream is not read again until they finish, so a slow consumer of
+    the output pauses the process through the pipe instead of piling up lines in memory.
+    """
+    pending = b''
+    size = 0
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if chunks is not None:
+            chunks.append(chunk)
+        if callback is not None:
+            *lines, pending = (pending + chunk).split(b'\n')
+            for line in lines:
+                await _call(callback, line + b'\n')
+    if callback is not None and pending:
+        await _call(callback, pending)
+    return size
+
+
+async def _call(callback: OutputCallback, line: bytes) -> None:
+    result = callback(line)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def _feed(stream: asyncio.StreamWriter, input: str | bytes | Iterable) -> int:
+    """Write the input into the process stdin and close it. Returns the bytes written.
+
+    Iterables are read one chunk at a time in a worker thread, so a generator reading a big file or the console
+    never blocks the event loop, and the next chunk is only read once the process has taken the previous one.
+    """
+    size = 0
+    try:
+        chunks = iter([input] if isinstance(input, (str, bytes)) else input)
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            data = _encode(chunk)
+            stream.write(data)
+            size += len(data)
+            await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        stream.close()
+    return size
+
+
+def with_context(commands: list, context: str = None) -> list:
+    """Add the kubeconfig context option to kubectl and helm commands, other commands are returned unchanged.
+
+    Args:
+        commands (list): command and arguments.
+        context (str, optional): kubeconfig context. Defaults to $DP_KUBE_CONTEXT, nothing is added when unset.
+
+    Returns:
+        list: the command with `--context` (kubectl) or `--kube-context` (helm) after the program name.
+    """
+    context = context if context is not None else os.environ.get('DP_KUBE_CONTEXT')
+    if not context or not commands:
+        return commands
+    option = CONTEXT_OPTIONS.get(os.path.basename(str(commands[0])))
+    if option is None or any(str(word) == option or str(word).startswith(f'{option}=') for word in commands):
+        return commands
+    return [commands[0], option, context, *commands[1:]]
+
+
+def _encode(chunk: str | bytes) -> bytes:
+    return bytes(chunk, 'utf-8') if isinstance(chunk, str) else chunk
+
+
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+
+def _join(chunks: list) -> bytes:
+    return None if chunks is None else b''.join(chunks)
+
+
+_default_executor: CommandExecutor = None
+_default_lock = threading.Lock()
+
+
+def get_executor() -> CommandExecutor:
+    """Return the executor shared by all the dp commands.
+
+    Returns:
+        CommandExecutor: shared executor, created on first use.
+    """
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = CommandExecutor()
+        return _default_executor
+
+
+def configure(max_workers: int = None, timeout: float = None) -> CommandExecutor:
+    """Replace the shared executor with a new one using the given limits.
+
+    Args:
+        max_workers (int, optional): maximum number of commands running at the same time.
+        timeout (float, optional): default timeout in seconds for every command.
+
+    Returns:
+        CommandExecutor: the new shared executor.
+    """
+    global _default_executor
+    with _default_lock:
+        previous = _default_executor
+        _default_executor = CommandExecutor(max_workers=max_workers or DEFAULT_MAX_WORKERS, timeout=timeout)
+    if previous is not None:
+        previous.close()
+    return _default_executor
+
+
+def run_parallel(*calls: Callable) -> list:
+    """Run blocking helpers such as `create_ns` or `add_repo` at the same time.
+
+    Every call runs in its own thread while the shared executor keeps the number of live processes bounded.
+    All the calls are allowed to finish before the first error is raised.
+
+    Args:
+        *calls (Callable): functions without arguments, e.g. `functools.partial(create_ns, 'flink-jobs')`.
+
+    Returns:
+        list: the value returned by every call, in the same order.
+    """
+    if not calls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix='dp-parallel') as pool:
+        futures = [pool.submit(call) for call in calls]
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise errors[0]
+    return [future.result() for future in futures]
+
+
+def write_line(line: bytes, err: bool = False) -> None:
+    """Callback that writes a line coming from a process to the console.
+
+    Args:
+        line (bytes): line read from the process.
+        err (bool, optional): write to stderr instead of stdout. Defaults to False.
+    """
+    stream = sys.stderr if err else sys.stdout
+    stream.write(line.decode('utf-8', errors='replace'))
+    stream.flush()
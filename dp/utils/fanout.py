@@ -0,0 +1,150 @@
+import asyncio
+import os
+import sys
+import time
+import click
+from .executor import get_executor
+
+DEFAULT_PARALLEL = 4
+# dp options that only make sense in the parent process, with the number of values they take
+PARENT_OPTIONS = {'--context': 1, '--contexts-file': 1, '--max-parallel': 1, '--profile': 0, '--profile-output': 1}
+# dp options passed to every context, with the number of values they take
+SHARED_OPTIONS = {'--backend': 1, '--retries': 1}
+
+
+class ContextRun:
+    """Result of a dp command run against one kubeconfig context.
+
+    Args:
+        context (str): kubeconfig context.
+        returncode (int): exit code of the dp process.
+        duration (float): seconds the command took.
+    """
+
+    def __init__(self, context: str, returncode: int, duration: float):
+        self.context = context
+        self.returncode = returncode
+        self.duration = duration
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def read_contexts(contexts: tuple, contexts_file: str = None) -> list[str]:
+    """Contexts given with `--context` plus the ones of the file, one per line, without duplicates.
+
+    Args:
+        contexts (tuple): contexts of the command line.
+        contexts_file (str, optional): text file with a context per line, `#` starts a comment.
+
+    Returns:
+        list[str]: contexts in the order they were given.
+    """
+    selected = list(contexts)
+    if contexts_file is not None:
+        with open(contexts_file) as f:
+            selected += [line.split('#', 1)[0].strip() for line in f]
+    return list(dict.fromkeys(context for context in selected if context))
+
+
+def child_args(argv: list[str], subcommand: str) -> list[str]:
+    """Arguments of the dp processes run for every context: the parent only options are removed.
+
+    Args:
+        argv (list[str]): arguments of the parent dp process, without the program name.
+        subcommand (str): name of the subcommand, the arguments after it are kept as they are.
+
+    Returns:
+        list[str]: arguments without the context selection and profiling options.
+    """
+    args = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        name = arg.split('=', 1)[0]
+        if arg == subcommand:
+            return args + argv[i:]
+        if name in PARENT_OPTIONS:
+            i += 1 if '=' in arg else 1 + PARENT_OPTIONS[name]
+            continue
+        values = 0 if '=' in arg else SHARED_OPTIONS.get(name, 0)
+        args += argv[i:i + 1 + values]
+        i += 1 + values
+    return args
+
+
+def dp_command() -> list[str]:
+    """Command that starts dp again, as a PyInstaller binary or as the dp.py script.
+    """
+    if getattr(sys, 'frozen', False):
+        return [sys.executable]
+    return [sys.executable, os.path.abspath(sys.argv[0])]
+
+
+def run_contexts(contexts: list[str], args: list[str], max_parallel: int = DEFAULT_PARALLEL) -> list[ContextRun]:
+    """Run a dp command against several contexts at the same time, streaming the output of every one
+    prefixed with its context.
+
+    Args:
+        contexts (list[str]): kubeconfig contexts.
+        args (list[str]): dp arguments, `--context <context>` is added for every process.
+        max_parallel (int, optional): maximum number of contexts handled at the same time. Defaults to 4.
+
+    Returns:
+        list[ContextRun]: result of every context, in the same order.
+    """
+    width = max(len(context) for context in contexts)
+    executor = get_executor()
+
+    async def run_all() -> list[ContextRun]:
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def run(context: str) -> ContextRun:
+            prefix = f'[{context}]'.ljust(width + 3)
+            async with semaphore:
+                start = time.monotonic()
+                # the dp processes are not counted in the executor worker limit, they run their own commands
+                result = await executor.run(dp_command() + ['--context', context] + args, capture=False,
+                                            on_stdout=_prefixed(prefix), on_stderr=_prefixed(prefix, err=True),
+                                            bounded=False)
+                return ContextRun(context, result.returncode, time.monotonic() - start)
+
+        return list(await asyncio.gather(*(run(context) for context in contexts)))
+
+    return executor.submit(run_all()).result()
+
+
+def summary(runs: list[ContextRun], elapsed: float) -> list[str]:
+    """Lines with the result and duration of every context and the totals.
+    """
+    results = ['ok' if run.ok else f'failed (exit {run.returncode})' for run in runs]
+    width = max([len('CONTEXT')] + [len(run.context) for run in runs])
+    result_width = max([len('RESULT')] + [len(result) for result in results])
+    lines = [f'{"CONTEXT".ljust(width)}  {"RESULT".ljust(result_width)}  TIME']
+    for run, result in zip(runs, results):
+        lines.append(f'{run.context.ljust(width)}  {result.ljust(result_width)}  {run.duration:.1f}s')
+    failed = sum(1 for run in runs if not run.ok)
+    lines.append(f'{len(runs)} contexts: {len(runs) - failed} ok, {failed} failed in {elapsed:.1f}s')
+    return lines
+
+
+def fan_out(contexts: list[str], argv: list[str], subcommand: str, max_parallel: int = DEFAULT_PARALLEL) -> int:
+    """Run the dp subcommand against every context and print the summary.
+
+    Returns:
+        int: exit code, 1 when any context failed.
+    """
+    start = time.monotonic()
+    runs = run_contexts(contexts, child_args(argv, subcommand), max_parallel)
+    click.echo('-------------------------------------------')
+    for line in summary(runs, time.monotonic() - start):
+        click.echo(line)
+    click.echo('-------------------------------------------')
+    return 0 if all(run.ok for run in runs) else 1
+
+
+def _prefixed(prefix: str, err: bool = False):
+    def write(line: bytes) -> None:
+        click.echo(f'{prefix}{line.decode("utf-8", errors="replace").rstrip()}', err=err)
+    return write
@@ -0,0 +1,305 @@
+import json
+import os
+import threading
+import time
+from os import path
+from pathlib import Path
+from subprocess import CompletedProcess
+from typing import Callable
+from . import constants as c
+from . import kube_api
+from . import readiness
+from .executor import get_executor, run_parallel
+from .helm_cache import _atomic_write
+
+STATUS_CACHE = os.environ.get('DP_STATUS_CACHE', path.join(str(Path.home()), '.cache', 'dp', 'status.json'))
+STATUS_TTL = float(os.environ.get('DP_STATUS_TTL', 10))
+SPARK_OK_STATES = ('SUBMITTED', 'RUNNING', 'COMPLETED', 'SUCCEEDING')
+
+
+class Check:
+    """Piece of a component whose health is reported by `dp status`.
+
+    Args:
+        component (str): dp subcommand of the component, e.g. 'kafkaop'.
+        kind (str): 'helm' for the helm releases of the namespace, otherwise a kubectl resource type.
+        namespace (str): namespace of the releases or resources.
+        name (str, optional): name of the resource, every resource of the kind is reported when None.
+    """
+
+    def __init__(self, component: str, kind: str, namespace: str, name: str = None):
+        self.component = component
+        self.kind = kind
+        self.namespace = namespace
+        self.name = name
+
+    def command(self) -> list[str]:
+        if self.kind == 'helm':
+            return ['helm', 'list', '--namespace', self.namespace, '--output', 'json']
+        return ['kubectl', 'get', self.kind, '--namespace', self.namespace, '--output', 'json']
+
+
+COMPONENTS = {
+    'flinkop': [Check('flinkop', 'helm', c.FLINK_OP_NS),
+                Check('flinkop', 'deployment', c.FLINK_OP_NS, c.FLINK_OP_DEPLOYMENT),
+                Check('flinkop', 'flinkdeployment', c.FLINK_NS)],
+    'kafkaop': [Check('kafkaop', 'helm', c.KAFKA_NS_OP),
+                Check('kafkaop', 'deployment', c.KAFKA_NS_OP, c.KAFKA_OP_DEPLOYMENT),
+                Check('kafkaop', 'kafka', c.KAFKA_NS)],
+    'miniop': [Check('miniop', 'helm', c.MINIO_NS),
+               Check('miniop', 'deployment', c.MINIO_NS, c.MINIO_OP_DEPLOYMENT),
+               Check('miniop', 'tenant', 'minio-tenant')],
+    'redpanda': [Check('redpanda', 'helm', 'redpanda'),
+                 Check('redpanda', 'statefulset', 'redpanda', 'redpanda')],
+    'scylladb': [Check('scylladb', 'helm', c.SCYLLA_NS_OP),
+                 Check('scylladb', 'deployment', c.SCYLLA_NS_OP, c.SCYLLA_OP_DEPLOYMENT),
+                 Check('scylladb', 'scyllacluster', c.SCYLLA_NS)],
+    'sparkop': [Check('sparkop', 'helm', c.SPARK_NS_OP),
+                Check('sparkop', 'deployment', c.SPARK_NS_OP, c.SPARK_OP_DEPLOYMENT),
+                Check('sparkop', 'sparkapplication', c.SPARK_NS)],
+}
+
+
+def release_health(release: dict) -> tuple[bool, str]:
+    return release.get('status') == 'deployed', f"{release.get('chart')} rev {release.get('revision')} {release.get('status')}"
+
+
+def deployment_health(resource: dict) -> tuple[bool, str]:
+    status = resource.get('status', {})
+    replicas = resource.get('spec', {}).get('replicas', 1)
+    return readiness.deployment_available(resource), f"{status.get('availableReplicas', 0)}/{replicas} available"
+
+
+def statefulset_health(resource: dict) -> tuple[bool, str]:
+    replicas = resource.get('spec', {}).get('replicas', 1)
+    return readiness.statefulset_ready(resource), f"{resource.get('status', {}).get('readyReplicas', 0)}/{replicas} ready"
+
+
+def kafka_health(resource: dict) -> tuple[bool, str]:
+    ready = readiness.custom_resource_ready(resource)
+    return ready, 'Ready' if ready else f"Ready={readiness.condition_status(resource, 'Ready')}"
+
+
+def scylla_health(resource: dict) -> tuple[bool, str]:
+    """Recent operators report Available/Degraded conditions, older ones only the members of every rack.
+    """
+    racks = resource.get('status', {}).get('racks') or {}
+    members = sum(rack.get('members', 0) for rack in racks.values())
+    ready_members = sum(rack.get('readyMembers', 0) for rack in racks.values())
+    if readiness.condition_status(resource, 'Available') != 'Unknown':
+        ready = (readiness.condition_status(resource, 'Available') == 'True'
+                 and readiness.condition_status(resource, 'Degraded') != 'True')
+    else:
+        ready = bool(racks) and ready_members >= members
+    return ready, f'{ready_members}/{members} members ready'
+
+
+def tenant_health(resource: dict) -> tuple[bool, str]:
+    status = resource.get('status', {})
+    health = status.get('healthStatus')
+    ready = health == 'green' or (health is None and status.get('currentState') == 'Initialized')
+    return ready, f"{status.get('currentState', 'Unknown')}, health {health or 'unknown'}"
+
+
+def flink_health(resource: dict) -> tuple[bool, str]:
+    status = resource.get('status', {})
+    job_manager = status.get('jobManagerDeploymentStatus', 'Unknown')
+    job_state = status.get('jobStatus', {}).get('state')
+    ready = job_manager == 'READY' and job_state in (None, 'RUNNING', 'FINISHED')
+    return ready, f"jobmanager {job_manager}, job {job_state or 'none'}"
+
+
+def spark_health(resource: dict) -> tuple[bool, str]:
+    state = resource.get('status', {}).get('applicationState', {}).get('state', 'Unknown')
+    return state in SPARK_OK_STATES, state
+
+
+HEALTH: dict[str, Callable[[dict], tuple[bool, str]]] = {
+    'helm': release_health,
+    'deployment': deployment_health,
+    'statefulset': statefulset_health,
+    'kafka': kafka_health,
+    'scyllacluster': scylla_health,
+    'tenant': tenant_health,
+    'flinkdeployment': flink_health,
+    'sparkapplication': spark_health,
+}
+
+
+class StatusCache:
+    """Results of the status queries kept on disk for a few seconds, so scripts calling `dp status` in a loop
+    don't query the API server every time.
+
+    The entries are keyed by the kubeconfig, the context and the command, so different clusters never share them.
+
+    Args:
+        cache_file (str, optional): JSON file of the cache. Defaults to ~/.cache/dp/status.json or $DP_STATUS_CACHE.
+        ttl (float, optional): seconds a result is reused. Defaults to 10 or $DP_STATUS_TTL.
+        clock (Callable[[], float], optional): wall clock. Defaults to time.time.
+    """
+
+    def __init__(self, cache_file: str = STATUS_CACHE, ttl: float = STATUS_TTL, clock: Callable[[], float] = time.time):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, command: list) -> CompletedProcess[bytes]:
+        """Cached result of a command, None when it is missing or older than the TTL.
+        """
+        entry = self._read().get(self._key(command))
+        if entry is None or self._clock() - entry['fetched_at'] > self.ttl:
+            return None
+        return CompletedProcess(command, entry['returncode'], entry['stdout'].encode('utf-8'),
+                                entry['stderr'].encode('utf-8'))
+
+    def put(self, results: list[CompletedProcess[bytes]]) -> None:
+        with self._lock:
+            now = self._clock()
+            entries = {key: entry for key, entry in self._read().items() if now - entry['fetched_at'] <= self.ttl}
+            for result in results:
+                entries[self._key(result.args)] = {
+                    'fetched_at': now, 'returncode': result.returncode,
+                    'stdout': result.stdout.decode('utf-8', errors='replace'),
+                    'stderr': result.stderr.decode('utf-8', errors='replace')}
+            _atomic_write(self.cache_file, json.dumps(entries).encode('utf-8'))
+
+    def _key(self, command: list) -> str:
+        scope = [os.environ.get('KUBECONFIG', ''), os.environ.get('DP_KUBE_CONTEXT', ''), kube_api.backend()]
+        return ' '.join(scope + [str(word) for word in command])
+
+    def _read(self) -> dict:
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+def fetch(checks: list[Check], cache: StatusCache = None, refresh: bool = False) -> dict[tuple, CompletedProcess[bytes]]:
+    """Run the queries of the checks concurrently, every distinct query once.
+
+    Args:
+        checks (list[Check]): checks of one or several components.
+        cache (StatusCache, optional): cache of recent results. Defaults to None (always query).
+        refresh (bool, optional): ignore the cached results, the new ones are still stored. Defaults to False.
+
+    Returns:
+        dict[tuple, CompletedProcess[bytes]]: result of every query, keyed by the command as a tuple.
+    """
+    commands = list(dict.fromkeys(tuple(check.command()) for check in checks))
+    results = {}
+    if cache is not None and not refresh:
+        for command in commands:
+            cached = cache.get(list(command))
+            if cached is not None:
+                results[command] = cached
+    missing = [command for command in commands if command not in results]
+    if missing:
+        fresh = _run_queries([list(command) for command in missing])
+        results.update(zip(missing, fresh))
+        if cache is not None:
+            cache.put(fresh)
+    return results
+
+
+def evaluate(checks: list[Check], results: dict[tuple, CompletedProcess[bytes]]) -> list[dict]:
+    """Turn the query results into one row per release or resource.
+
+    A component without helm releases is reported once as not installed, the rest of its checks are skipped.
+
+    Args:
+        checks (list[Check]): checks of one or several components.
+        results (dict[tuple, CompletedProcess[bytes]]): results returned by `fetch`.
+
+    Returns:
+        list[dict]: rows with the keys component, kind, namespace, name, ready (True, False or None when there
+            is nothing to check) and detail.
+    """
+    rows = []
+    not_installed = set()
+    for check in checks:
+        if check.component in not_installed:
+            continue
+        result = results[tuple(check.command())]
+        row = {'component': check.component, 'kind': check.kind, 'namespace': check.namespace}
+        if result.returncode != 0:
+            error = result.stderr.decode('utf-8', errors='replace').strip().splitlines()
+            if check.kind != 'helm' and 'the server doesn\'t have a resource type' in ' '.join(error):
+                rows.append(dict(row, name='-', ready=False, detail='CRD not installed'))
+            else:
+                rows.append(dict(row, name=check.name or '-', ready=False, detail=error[-1] if error else 'failed'))
+            continue
+        items = _items(check, result.stdout)
+        if check.kind == 'helm' and not items:
+            not_installed.add(check.component)
+            rows.append(dict(row, name='-', ready=None, detail='not installed'))
+            continue
+        if check.name is not None:
+            items = [item for item in items if _name(item) == check.name]
+            if not items:
+                rows.append(dict(row, name=check.name, ready=False, detail='not found'))
+                continue
+        if not items:
+            rows.append(dict(row, name='-', ready=None, detail='none'))
+        for item in items:
+            ready, detail = HEALTH[check.kind](item)
+            rows.append(dict(row, name=_name(item), ready=ready, detail=detail))
+    return rows
+
+
+def collect(components: list[str], cache: StatusCache = None, refresh: bool = False) -> list[dict]:
+    """Health of several components, all their queries run at the same time.
+
+    Args:
+        components (list[str]): names of the components, keys of COMPONENTS.
+        cache (StatusCache, optional): cache of recent results. Defaults to None.
+        refresh (bool, optional): ignore the cached results. Defaults to False.
+
+    Returns:
+        list[dict]: rows returned by `evaluate`.
+    """
+    checks = [check for component in components for check in COMPONENTS[component]]
+    return evaluate(checks, fetch(checks, cache, refresh))
+
+
+def healthy(rows: list[dict]) -> bool:
+    return all(row['ready'] is not False for row in rows)
+
+
+def format_table(rows: list[dict]) -> list[str]:
+    """Rows as aligned text lines, with a header.
+    """
+    header = ('COMPONENT', 'KIND', 'NAMESPACE', 'NAME', 'STATUS', 'DETAIL')
+    lines = [header] + [(row['component'], row['kind'], row['namespace'], row['name'],
+                         {True: 'ready', False: 'not ready', None: '-'}[row['ready']], row['detail'])
+                        for row in rows]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header) - 1)]
+    return ['  '.join(value.ljust(width) for value, width in zip(line, widths)) + '  ' + line[-1] for line in lines]
+
+
+def _run_queries(commands: list[list]) -> list[CompletedProcess[bytes]]:
+    if kube_api.enabled():
+        return run_parallel(*(_query(command) for command in commands))
+    executor = get_executor()
+    return executor.submit(executor.run_all(commands)).result()
+
+
+def _query(command: list) -> Callable[[], CompletedProcess[bytes]]:
+    """Query of the API backend, helm releases are still listed with helm.
+    """
+    if command[0] == 'helm':
+        return lambda: get_executor().run_sync(command)
+    kind, namespace = command[2], command[4]
+    return lambda: kube_api.call(command, lambda client: json.dumps({'items': client.list_items(kind, namespace)}))
+
+
+def _items(check: Check, stdout: bytes) -> list[dict]:
+    document = json.loads(stdout or b'[]')
+    if check.kind == 'helm':
+        return document or []
+    return document.get('items') or []
+
+
+def _name(item: dict) -> str:
+    return item.get('name') or item.get('metadata', {}).get('name', '-')
@@ -0,0 +1,290 @@
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from os import path
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import urljoin
+try:
+    import fcntl
+except ImportError:
+    # no file locks on Windows, the cache is then only safe within one dp process
+    fcntl = None
+
+CACHE_DIR = os.environ.get('DP_HELM_CACHE_DIR', path.join(str(Path.home()), '.cache', 'dp', 'helm'))
+INDEX_TTL = float(os.environ.get('DP_HELM_CACHE_TTL', 3600))
+MAX_BYTES = int(float(os.environ.get('DP_HELM_CACHE_MAX_MB', 512)) * 1024 * 1024)
+ENABLED = os.environ.get('DP_HELM_CACHE', '1').lower() not in ('0', 'false', 'off')
+FETCH_TIMEOUT = 30
+# blobs used this recently may be read by another dp process, e.g. a `--context` fan-out, and are never evicted
+IN_USE_SECONDS = 600
+
+
+class HelmCache:
+    """Content addressed on-disk cache of helm repository indexes and chart tarballs.
+
+    Every file is stored once under `blobs/<sha256>`, `refs.json` maps the cache keys (repo url, or repo url plus
+    chart and version) to the blobs and `repos.json` remembers the url of the repos added with `add_repo`.
+    Indexes are downloaded again after the TTL, charts never change for a given version. When the cache grows
+    over the size limit the least recently used blobs are removed, except the ones used in the last minutes.
+
+    Several dp processes can share the cache: the changes of `refs.json` and `repos.json` hold a file lock, and
+    lookups don't write, the time a key was used is saved with the next change or when the process exits.
+
+    Args:
+        directory (str, optional): cache directory. Defaults to ~/.cache/dp/helm or $DP_HELM_CACHE_DIR.
+        ttl (float, optional): seconds before an index is downloaded again. Defaults to 3600.
+        max_bytes (int, optional): maximum size of the cache. Defaults to 512 MB.
+        in_use_seconds (float, optional): blobs used more recently are never evicted. Defaults to 600.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: float = INDEX_TTL, max_bytes: int = MAX_BYTES,
+                 in_use_seconds: float = IN_USE_SECONDS):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.in_use_seconds = in_use_seconds
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        # last use of the keys looked up since the last write of refs.json
+        self._used = {}
+
+    def register_repo(self, repo_name: str, repo_url: str) -> None:
+        """Remember the url of a repo added in helm.
+
+        Args:
+            repo_name (str): nick of the repo in helm.
+            repo_url (str): url of the helm repository.
+        """
+        with self._locked():
+            repos = self._read('repos.json')
+            repos[repo_name] = repo_url
+            self._write('repos.json', repos)
+
+    def repo_url(self, repo_name: str) -> str:
+        """Url of a repo registered with `register_repo`, None when it is unknown.
+        """
+        return self._read('repos.json').get(repo_name)
+
+    def index(self, repo_url: str, refresh: bool = False) -> dict:
+        """Index of a helm repository, downloaded again when it is older than the TTL.
+
+        Args:
+            repo_url (str): url of the helm repository.
+            refresh (bool, optional): ignore the TTL and download the index. Defaults to False.
+
+        Returns:
+            dict: parsed index.yaml.
+        """
+        import yaml
+        key = f'index:{repo_url}'
+        ref = self._ref(key)
+        if refresh or ref is None or time.time() - ref['fetched_at'] > self.ttl or not path.exists(self._blob(ref['digest'])):
+            blob = self._store(key, _fetch(urljoin(repo_url.rstrip('/') + '/', 'index.yaml')))
+        else:
+            blob = self._blob(ref['digest'])
+        with open(blob, 'rb') as f:
+            return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+    def chart(self, repo_url: str, chart: str, version: str = None) -> str:
+        """Path of a chart tarball, downloaded only the first time.
+
+        Args:
+            repo_url (str): url of the helm repository.
+            chart (str): name of the chart inside the repository.
+            version (str, optional): chart version. Defaults to the latest version in the index.
+
+        Raises:
+            LookupError: the chart or the version is not in the repository index.
+
+        Returns:
+            str: path of the cached .tgz file.
+        """
+        if version is not None:
+            ref = self._ref(f'chart:{repo_url}:{chart}:{version}')
+            if ref is not None and path.exists(self._blob(ref['digest'])):
+                return self._blob(ref['digest'])
+        entries = self.index(repo_url).get('entries', {}).get(chart)
+        if not entries:
+            raise LookupError(f'Chart {chart} not found in {repo_url}')
+        entry = entries[0] if version is None else next((e for e in entries if str(e.get('version')) == version), None)
+        if entry is None:
+            raise LookupError(f'Version {version} of chart {chart} not found in {repo_url}')
+        key = f'chart:{repo_url}:{chart}:{entry["version"]}'
+        ref = self._ref(key)
+        if ref is None or not path.exists(self._blob(ref['digest'])):
+            return self._store(key, _fetch(urljoin(repo_url.rstrip('/') + '/', entry['urls'][0])))
+        return self._blob(ref['digest'])
+
+    def resolve(self, operator_name: str, version: str = None) -> str:
+        """Local tarball for a chart reference such as 'flink-operator/flink-kubernetes-operator'.
+
+        Args:
+            operator_name (str): chart reference with the form <repo name>/<chart name>.
+            version (str, optional): chart version. Defaults to the latest version.
+
+        Returns:
+            str: path of the cached .tgz file, or None when the repo is unknown or the chart can't be downloaded.
+        """
+        repo_name, _, chart = operator_name.partition('/')
+        repo_url = self.repo_url(repo_name) if chart else None
+        if repo_url is None:
+            return None
+        try:
+            return self.chart(repo_url, chart, version)
+        except (OSError, LookupError, ValueError, KeyError):
+            return None
+
+    def evict(self, keep: str = None) -> list[str]:
+        """Remove the least recently used blobs until the cache is under the size limit.
+
+        Blobs used in the last `in_use_seconds`, by this or another dp process, are kept.
+
+        Args:
+            keep (str, optional): key never removed, e.g. the one just stored.
+
+        Returns:
+            list[str]: removed cache keys.
+        """
+        with self._locked():
+            refs = self._read_refs()
+            sizes = {ref['digest']: ref['size'] for ref in refs.values()}
+            total = sum(sizes.values())
+            removed = []
+            for key, ref in sorted(refs.items(), key=lambda item: item[1]['last_used']):
+                if total <= self.max_bytes:
+                    break
+                if key == keep or self._in_use(ref['digest']):
+                    continue
+                del refs[key]
+                removed.append(key)
+                if all(other['digest'] != ref['digest'] for other in refs.values()):
+                    total -= sizes[ref['digest']]
+                    try:
+                        os.remove(self._blob(ref['digest']))
+                    except FileNotFoundError:
+                        pass
+            self._write('refs.json', refs)
+            return removed
+
+    def save(self) -> None:
+        """Write the time the keys looked up by this process were used.
+        """
+        with self._locked():
+            if self._used:
+                self._write('refs.json', self._read_refs())
+
+    def _ref(self, key: str) -> dict:
+        ref = self._read('refs.json').get(key)
+        if ref is not None:
+            now = time.time()
+            with self._lock:
+                self._used[key] = now
+            # the modification time tells the other dp processes that the blob is in use
+            try:
+                os.utime(self._blob(ref['digest']), (now, now))
+            except FileNotFoundError:
+                pass
+            ref['last_used'] = now
+        return ref
+
+    def _store(self, key: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self._blob(digest)
+        if not path.exists(blob):
+            _atomic_write(blob, data)
+        with self._locked():
+            refs = self._read_refs()
+            now = time.time()
+            refs[key] = {'digest': digest, 'size': len(data), 'fetched_at': now, 'last_used': now}
+            self._write('refs.json', refs)
+            self.evict(keep=key)
+        return blob
+
+    def _read_refs(self) -> dict:
+        """refs.json with the pending use times of this process, call it holding the lock.
+        """
+        refs = self._read('refs.json')
+        for key, used in self._used.items():
+            if key in refs:
+                refs[key]['last_used'] = max(refs[key]['last_used'], used)
+        self._used = {}
+        return refs
+
+    def _in_use(self, digest: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self._blob(digest)) < self.in_use_seconds
+        except OSError:
+            return False
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the lock of the cache within this process and, where there are file locks, for every dp process.
+        """
+        with self._lock:
+            if fcntl is None or self._lock_depth:
+                # the file lock of a new descriptor would wait for the one this thread already holds
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path.join(self.directory, 'lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _blob(self, digest: str) -> str:
+        return path.join(self.directory, 'blobs', digest)
+
+    def _read(self, name: str) -> dict:
+        try:
+            with open(path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write(self, name: str, data: dict) -> None:
+        _atomic_write(path.join(self.directory, name), json.dumps(data, indent=2).encode('utf-8'))
+
+
+def _atomic_write(file_path: str, data: bytes) -> None:
+    """Write a file through a temporary file, so concurrent dp processes never read half written files.
+    """
+    os.makedirs(path.dirname(file_path), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=path.dirname(file_path))
+    with os.fdopen(descriptor, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, file_path)
+
+
+def _fetch(url: str) -> bytes:
+    from urllib.request import urlopen
+    with urlopen(url, timeout=FETCH_TIMEOUT) as response:
+        return response.read()
+
+
+_cache: HelmCache = None
+
+
+def get_cache() -> HelmCache:
+    """Return the cache shared by all the dp commands, None when it is disabled with DP_HELM_CACHE=0.
+    """
+    global _cache
+    if not ENABLED:
+        return None
+    if _cache is None:
+        _cache = HelmCache()
+        atexit.register(_cache.save)
+    return _cache
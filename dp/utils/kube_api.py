@@ -0,0 +1,599 @@
+import atexit
+import base64
+import hashlib
+import json
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+import click
+from os import path
+from pathlib import Path
+from subprocess import CompletedProcess
+from typing import Callable
+from urllib.parse import quote, urlencode, urlsplit
+from .helm_cache import _atomic_write
+from . import retry
+from .executor import get_executor
+from .tracing import command_name, get_tracer
+
+DISCOVERY_DIR = os.environ.get('DP_KUBE_DISCOVERY_DIR', path.join(str(Path.home()), '.cache', 'dp', 'discovery'))
+DISCOVERY_TTL = float(os.environ.get('DP_KUBE_DISCOVERY_TTL', 600))
+POOL_SIZE = 8
+REQUEST_TIMEOUT = 30
+FIELD_MANAGER = 'dp'
+
+
+def backend() -> str:
+    """Backend used to talk to kubernetes: 'kubectl' (default) or 'api', selected with $DP_KUBE_BACKEND.
+    """
+    return os.environ.get('DP_KUBE_BACKEND', 'kubectl').lower()
+
+
+def enabled() -> bool:
+    return backend() == 'api'
+
+
+class ApiError(SystemError):
+    """Error returned by the API server.
+
+    Args:
+        status (int): HTTP status code.
+        reason (str): kubernetes reason, e.g. 'AlreadyExists' or 'NotFound'.
+        message (str): message of the API server.
+    """
+
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(f'({reason}): {message}')
+        self.status = status
+        self.reason = reason
+        self.message = message
+
+
+class CredentialError(Exception):
+    """The exec credential plugin of the kubeconfig failed or returned an invalid ExecCredential.
+    """
+
+
+class Resource:
+    """API resource found with the discovery, e.g. kafkatopics in kafka.strimzi.io/v1beta2.
+    """
+
+    def __init__(self, api_version: str, plural: str, kind: str, namespaced: bool):
+        self.api_version = api_version
+        self.plural = plural
+        self.kind = kind
+        self.namespaced = namespaced
+
+    def path(self, namespace: str = None, name: str = None) -> str:
+        base = '/api/v1' if self.api_version == 'v1' else f'/apis/{self.api_version}'
+        if self.namespaced and namespace is not None:
+            base += f'/namespaces/{quote(namespace)}'
+        base += f'/{self.plural}'
+        return base if name is None else f'{base}/{quote(name)}'
+
+
+class KubeConfig:
+    """Server and credentials of a kubeconfig context.
+
+    Args:
+        server (str): url of the API server.
+        headers (dict, optional): headers sent with every request, e.g. the bearer token.
+        ca_file (str, optional): CA bundle of the server. Defaults to the system CAs.
+        cert_file (str, optional): client certificate.
+        key_file (str, optional): client key.
+        insecure (bool, optional): skip the TLS verification. Defaults to False.
+        token_command (Callable[[], str], optional): returns a fresh token, used for exec credential plugins.
+    """
+
+    def __init__(self, server: str, headers: dict = None, ca_file: str = None, cert_file: str = None,
+                 key_file: str = None, insecure: bool = False, token_command: Callable[[], str] = None):
+        self.server = server.rstrip('/')
+        self.headers = dict(headers or {})
+        self.ca_file = ca_file
+        self.cert_file = cert_file
+        self.key_file = key_file
+        self.insecure = insecure
+        self.token_command = token_command
+
+    @classmethod
+    def load(cls, config_file: str = None, context: str = None) -> 'KubeConfig':
+        """Read a context from the kubeconfig, as kubectl does.
+
+        The files of $KUBECONFIG are merged like kubectl merges them: the first file that sets the current context,
+        or a context, cluster or user with a given name, wins. Relative paths are read from the directory of the file
+        that has them.
+
+        Args:
+            config_file (str, optional): kubeconfig file. Defaults to the files of $KUBECONFIG or ~/.kube/config.
+            context (str, optional): context name. Defaults to $DP_KUBE_CONTEXT or the current context.
+
+        Raises:
+            ValueError: the kubeconfig is not valid, or the context, cluster or user are not in it.
+            FileNotFoundError: there is no kubeconfig.
+
+        Returns:
+            KubeConfig: server and credentials of the context.
+        """
+        if config_file:
+            config_files = [config_file]
+        else:
+            config_files = [item for item in (os.environ.get('KUBECONFIG') or '').split(os.pathsep) if item] or \
+                [path.join(str(Path.home()), '.kube', 'config')]
+        config = _merge_kubeconfigs(config_files)
+        context = context or os.environ.get('DP_KUBE_CONTEXT') or config.get('current-context')
+        context_spec = _named(config, 'contexts', context, 'context')
+        cluster = _named(config, 'clusters', context_spec.get('cluster'), 'cluster')
+        user = _named(config, 'users', context_spec.get('user'), 'user') if context_spec.get('user') else {}
+        if not cluster.get('server'):
+            raise ValueError(f'cluster {context_spec.get("cluster")} has no server in the kubeconfig')
+        base = path.dirname(path.abspath(config_files[0]))
+
+        headers = {}
+        token_command = None
+        if user.get('token'):
+            headers['Authorization'] = f'Bearer {user["token"]}'
+        elif user.get('tokenFile'):
+            with open(path.join(base, user['tokenFile'])) as f:
+                headers['Authorization'] = f'Bearer {f.read().strip()}'
+        elif user.get('exec'):
+            token_command = ExecCredential(user['exec']).token
+        elif user.get('username'):
+            basic = base64.b64encode(f'{user["username"]}:{user.get("password", "")}'.encode()).decode()
+            headers['Authorization'] = f'Basic {basic}'
+        return cls(cluster['server'], headers,
+                   ca_file=_file_or_data(cluster, 'certificate-authority', base),
+                   cert_file=_file_or_data(user, 'client-certificate', base),
+                   key_file=_file_or_data(user, 'client-key', base),
+                   insecure=bool(cluster.get('insecure-skip-tls-verify')),
+                   token_command=token_command)
+
+    def request_headers(self) -> dict:
+        headers = dict(self.headers)
+        if self.token_command is not None:
+            headers['Authorization'] = f'Bearer {self.token_command()}'
+        return headers
+
+
+class ExecCredential:
+    """Token of a client-go exec credential plugin (aws, gke-gcloud-auth-plugin...), kept until it expires.
+    """
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def token(self) -> str:
+        """Token of the plugin, run again a minute before it expires.
+
+        Raises:
+            CredentialError: the plugin failed or didn't return a token.
+        """
+        with self._lock:
+            if self._token is None or time.time() > self._expires_at - 60:
+                try:
+                    env = dict(os.environ, **{item['name']: item['value'] for item in self.spec.get('env') or []})
+                    result = subprocess.run([self.spec['command'], *(self.spec.get('args') or [])], env=env,
+                                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                    status = json.loads(result.stdout).get('status', {})
+                    token = status['token']
+                except (OSError, subprocess.CalledProcessError, ValueError, LookupError, AttributeError) as e:
+                    raise CredentialError(f'exec credential plugin {self.spec.get("command")} failed: {e}') from e
+                self._token = token
+                self._expires_at = _timestamp(status.get('expirationTimestamp')) or time.time() + 300
+            return self._token
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to the API server shared by every thread.
+
+    Args:
+        config (KubeConfig): server and credentials.
+        size (int, optional): maximum number of idle connections kept. Defaults to 8.
+        timeout (float, optional): socket timeout in seconds. Defaults to 30.
+    """
+
+    def __init__(self, config: KubeConfig, size: int = POOL_SIZE, timeout: float = REQUEST_TIMEOUT):
+        self.config = config
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._url = urlsplit(config.server)
+        self._ssl_context = None
+        self.connections_opened = 0
+
+    def request(self, method: str, url: str, body: bytes = None, headers: dict = None) -> tuple[int, bytes]:
+        """Send a request through an idle connection, a new one is opened when none is idle.
+
+        A request failing on a reused connection, closed by the server in the meantime, is sent again once.
+
+        Returns:
+            tuple[int, bytes]: HTTP status and body of the response.
+        """
+        import http.client
+        for attempt in range(2):
+            connection, reused = self._get()
+            try:
+                connection.request(method, self._url.path.rstrip('/') + url, body=body, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._put(connection)
+            return response.status, data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _get(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+        import http.client
+        self.connections_opened += 1
+        port = self._url.port
+        if self._url.scheme == 'http':
+            return http.client.HTTPConnection(self._url.hostname, port, timeout=self.timeout), False
+        return http.client.HTTPSConnection(self._url.hostname, port, timeout=self.timeout,
+                                           context=self._context()), False
+
+    def _put(self, connection) -> None:
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _context(self):
+        if self._ssl_context is None:
+            import ssl
+            context = ssl.create_default_context(cafile=self.config.ca_file)
+            if self.config.insecure:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            if self.config.cert_file is not None:
+                context.load_cert_chain(self.config.cert_file, self.config.key_file)
+            self._ssl_context = context
+        return self._ssl_context
+
+
+class KubeClient:
+    """Minimal in-process Kubernetes API client used instead of forking kubectl.
+
+    The API discovery is cached in memory and on disk, so resource names such as 'kafkatopic' or 'pvc' are
+    resolved without extra requests on the next runs. Manifests are applied with server-side apply.
+
+    Args:
+        config (KubeConfig): server and credentials.
+        pool_size (int, optional): maximum number of idle connections kept. Defaults to 8.
+        discovery_dir (str, optional): directory of the discovery cache. Defaults to ~/.cache/dp/discovery.
+        discovery_ttl (float, optional): seconds before the discovery is requested again. Defaults to 600.
+    """
+
+    def __init__(self, config: KubeConfig, pool_size: int = POOL_SIZE, discovery_dir: str = DISCOVERY_DIR,
+                 discovery_ttl: float = DISCOVERY_TTL):
+        self.config = config
+        self.pool = ConnectionPool(config, pool_size)
+        self.discovery_ttl = discovery_ttl
+        server_id = hashlib.sha256(config.server.encode('utf-8')).hexdigest()[:16]
+        self.discovery_file = path.join(discovery_dir, f'{server_id}.json') if discovery_dir else None
+        self._discovery = None
+        self._lock = threading.RLock()
+
+    def request(self, method: str, url: str, body: dict = None, params: dict = None,
+                content_type: str = 'application/json') -> dict:
+        """Send a request and decode the JSON response.
+
+        Raises:
+            ApiError: the server answered with an error status.
+
+        Returns:
+            dict: decoded response body.
+        """
+        if params:
+            url += '?' + urlencode(params)
+        headers = self.config.request_headers()
+        headers['Accept'] = 'application/json'
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = content_type
+        tracer = get_tracer()
+        span = tracer.start(f'{method} {url.split("?")[0]}', 'api')
+        status, response = self.pool.request(method, url, data, headers)
+        tracer.finish(span, status=status, response_bytes=len(response))
+        try:
+            document = json.loads(response) if response else {}
+        except ValueError:
+            document = {'message': response.decode('utf-8', errors='replace')}
+        if status >= 400:
+            raise ApiError(status, document.get('reason') or str(status), document.get('message') or '')
+        return document
+
+    def resource(self, name: str, api_version: str = None) -> Resource:
+        """Find a resource by kind, plural, singular or short name, e.g. 'KafkaTopic', 'kafkatopic' or 'pvc'.
+
+        Args:
+            name (str): resource name as accepted by kubectl.
+            api_version (str, optional): group/version of the resource, searched first when given.
+
+        Raises:
+            LookupError: the resource is not served by the cluster.
+
+        Returns:
+            Resource: api version, plural and scope of the resource.
+        """
+        name = name.lower()
+        if api_version is not None:
+            found = self._find(name, api_version, self._resources(api_version))
+            if found is not None:
+                return found
+        for group_version in self._group_versions():
+            found = self._find(name, group_version, self._resources(group_version))
+            if found is not None:
+                return found
+        raise LookupError(f'the server doesn\'t have a resource type "{name}"')
+
+    def create_namespace(self, name: str) -> str:
+        self.request('POST', '/api/v1/namespaces', {'apiVersion': 'v1', 'kind': 'Namespace', 'metadata': {'name': name}})
+        return f'namespace/{name} created'
+
+    def apply(self, documents: list[dict], namespace: str = None, field_manager: str = FIELD_MANAGER,
+              force: bool = True) -> list[str]:
+        """Server-side apply of several manifests through the pooled connections.
+
+        Args:
+            documents (list[dict]): kubernetes resources.
+            namespace (str, optional): namespace of the namespaced resources without one.
+            field_manager (str, optional): field manager of the apply. Defaults to 'dp'.
+            force (bool, optional): take the fields owned by other managers. Defaults to True.
+
+        Returns:
+            list[str]: a line for every applied resource.
+        """
+        applied = []
+        for document in documents:
+            resource = self.resource(document['kind'], document.get('apiVersion'))
+            metadata = document.get('metadata', {})
+            target_namespace = metadata.get('namespace') or namespace or 'default'
+            url = resource.path(target_namespace if resource.namespaced else None, metadata['name'])
+            self.request('PATCH', url, document, params={'fieldManager': field_manager, 'force': str(force).lower()},
+                         content_type='application/apply-patch+yaml')
+            applied.append(f'{resource.plural}/{metadata["name"]} serverside-applied')
+        return applied
+
+    def patch(self, resource_name: str, name: str, patch: dict, namespace: str = None) -> str:
+        """JSON merge patch of a resource, like `kubectl patch --type merge`.
+        """
+        resource = self.resource(resource_name)
+        self.request('PATCH', resource.path(namespace, name), patch, content_type='application/merge-patch+json')
+        return f'{resource.plural}/{name} patched'
+
+    def delete(self, resource_name: str, name: str = None, namespace: str = None) -> str:
+        """Delete a resource, or all the resources of the kind in the namespace when name is None.
+        """
+        resource = self.resource(resource_name)
+        self.request('DELETE', resource.path(namespace, name), {'propagationPolicy': 'Background'})
+        return f'{resource.plural}/{name or "all"} deleted'
+
+    def get(self, resource_name: str, name: str, namespace: str = None) -> dict:
+        resource = self.resource(resource_name)
+        return self.request('GET', resource.path(namespace, name))
+
+    def list_items(self, resource_name: str, namespace: str = None, selector: str = None) -> list[dict]:
+        resource = self.resource(resource_name)
+        params = {'labelSelector': selector} if selector else None
+        return self.request('GET', resource.path(namespace), params=params).get('items') or []
+
+    def list_names(self, resource_name: str, namespace: str = None, selector: str = None) -> list[str]:
+        return [item['metadata']['name'] for item in self.list_items(resource_name, namespace, selector)]
+
+    def _find(self, name: str, group_version: str, resources: list[dict]) -> Resource:
+        for resource in resources:
+            if '/' in resource['name']:
+                continue
+            names = {resource['name'], resource.get('singularName') or '', resource['kind'].lower(),
+                     *(resource.get('shortNames') or [])}
+            if name in names:
+                return Resource(group_version, resource['name'], resource['kind'], resource.get('namespaced', False))
+        return None
+
+    def _group_versions(self) -> list[str]:
+        def fetch():
+            groups = self.request('GET', '/apis').get('groups') or []
+            return ['v1'] + [group['preferredVersion']['groupVersion'] for group in groups]
+        return self._cached('groups', fetch)
+
+    def _resources(self, group_version: str) -> list[dict]:
+        url = '/api/v1' if group_version == 'v1' else f'/apis/{group_version}'
+
+        def fetch():
+            try:
+                return self.request('GET', url).get('resources') or []
+            except ApiError as e:
+                if e.status == 404:
+                    return []
+                raise
+        return self._cached(f'resources:{group_version}', fetch)
+
+    def _cached(self, key: str, fetch: Callable):
+        with self._lock:
+            if self._discovery is None:
+                self._discovery = self._read_discovery()
+            entry = self._discovery.get(key)
+            if entry is None or time.time() - entry['fetched_at'] > self.discovery_ttl:
+                entry = {'fetched_at': time.time(), 'value': fetch()}
+                self._discovery[key] = entry
+                if self.discovery_file is not None:
+                    _atomic_write(self.discovery_file, json.dumps(self._discovery).encode('utf-8'))
+            return entry['value']
+
+    def _read_discovery(self) -> dict:
+        if self.discovery_file is None:
+            return {}
+        try:
+            with open(self.discovery_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+def call(args: list, operation: Callable[['KubeClient'], str | list[str]], input: str = None) -> CompletedProcess[bytes]:
+    """Run an operation with the shared client and report it as kubectl would.
+
+    API errors are returned as `Error from server (<reason>): <message>` in stderr, so the callers handle both
+    backends the same way, and transient errors are retried like the kubectl commands. When the client can't be
+    used, because the kubeconfig can't be read or its exec credential plugin fails, the kubectl command is run
+    instead, and so are the next calls of the process.
+
+    Args:
+        args (list): equivalent kubectl command, kept in the result and run when the client can't be used.
+        operation (Callable[[KubeClient], str | list[str]]): receives the client, returns the output lines.
+        input (str, optional): stdin of the kubectl command.
+
+    Returns:
+        CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
+    """
+    if _fallback:
+        return _run_kubectl(args, input)
+    try:
+        client = get_client()
+    except (OSError, ValueError, LookupError) as e:
+        return _use_kubectl(args, input, f'the kubeconfig can\'t be read by the api backend: {e}')
+
+    def run() -> CompletedProcess[bytes]:
+        try:
+            output = operation(client)
+        except ApiError as e:
+            return CompletedProcess(args, 1, b'', bytes(f'Error from server ({e.reason}): {e.message}\n', 'utf-8'))
+        except LookupError as e:
+            return CompletedProcess(args, 1, b'', bytes(f'error: {e}\n', 'utf-8'))
+        except OSError as e:
+            return CompletedProcess(args, 1, b'', bytes(f'Unable to connect to the server: {e}\n', 'utf-8'))
+        lines = output if isinstance(output, list) else [output]
+        return CompletedProcess(args, 0, bytes(''.join(f'{line}\n' for line in lines), 'utf-8'), b'')
+    try:
+        return retry.run_with_retry(run, f'api {" ".join(map(str, args[1:3]))}')
+    except CredentialError as e:
+        return _use_kubectl(args, input, str(e))
+
+
+def _use_kubectl(args: list, input: str, reason: str) -> CompletedProcess[bytes]:
+    global _fallback
+    if not _fallback:
+        _fallback = True
+        click.echo(f'{reason}, using kubectl', err=True)
+    return _run_kubectl(args, input)
+
+
+def _run_kubectl(args: list, input: str = None) -> CompletedProcess[bytes]:
+    return retry.run_with_retry(lambda: get_executor().run_sync(args, input=input), command_name(args))
+
+
+_client: KubeClient = None
+_client_lock = threading.Lock()
+# inline kubeconfig certificates and keys of this process, removed by close_client
+_credentials: tempfile.TemporaryDirectory = None
+# set when the api backend can't be used, the rest of the calls run kubectl
+_fallback = False
+
+
+def get_client() -> KubeClient:
+    """Return the client shared by all the dp commands, created from the kubeconfig on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = KubeClient(KubeConfig.load())
+        return _client
+
+
+@atexit.register
+def close_client() -> None:
+    """Close the connections of the shared client and remove the credentials written from the kubeconfig.
+    """
+    global _client, _credentials
+    with _client_lock:
+        if _client is not None:
+            _client.pool.close()
+            _client = None
+        if _credentials is not None:
+            _credentials.cleanup()
+            _credentials = None
+
+
+def _named(config: dict, section: str, name: str, field: str) -> dict:
+    for item in config.get(section) or []:
+        if item.get('name') == name:
+            return item.get(field) or {}
+    raise ValueError(f'{field} {name} not found in the kubeconfig')
+
+
+def _merge_kubeconfigs(config_files: list[str]) -> dict:
+    import yaml
+    merged = {'contexts': [], 'clusters': [], 'users': []}
+    found = False
+    for config_file in config_files:
+        if not path.exists(config_file):
+            continue
+        found = True
+        try:
+            with open(config_file) as f:
+                config = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f'{config_file} is not a valid kubeconfig: {e}')
+        if not merged.get('current-context') and config.get('current-context'):
+            merged['current-context'] = config['current-context']
+        base = path.dirname(path.abspath(config_file))
+        for section, field, paths in (('contexts', 'context', ()), ('clusters', 'cluster', ('certificate-authority',)),
+                                      ('users', 'user', ('client-certificate', 'client-key', 'tokenFile'))):
+            names = {item['name'] for item in merged[section]}
+            for item in config.get(section) or []:
+                if item.get('name') in names:
+                    continue
+                spec = dict(item.get(field) or {})
+                for key in paths:
+                    if spec.get(key):
+                        spec[key] = path.join(base, spec[key])
+                merged[section].append({'name': item.get('name'), field: spec})
+                names.add(item.get('name'))
+    if not found:
+        raise FileNotFoundError(f'no kubeconfig found in {os.pathsep.join(config_files)}')
+    return merged
+
+
+def _file_or_data(spec: dict, key: str, base: str) -> str:
+    """Path of a kubeconfig certificate, inline `<key>-data` values are written to a private temporary directory
+    removed when the process exits.
+    """
+    global _credentials
+    if spec.get(f'{key}-data'):
+        if _credentials is None:
+            _credentials = tempfile.TemporaryDirectory(prefix='dp-kube-')
+        descriptor, file_path = tempfile.mkstemp(prefix=f'{key}-', dir=_credentials.name)
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(base64.b64decode(spec[f'{key}-data']))
+        return file_path
+    if spec.get(key):
+        return path.join(base, spec[key])
+    return None
+
+
+def _timestamp(value: str) -> float:
+    if not value:
+        return None
+    from datetime import datetime
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
@@ -0,0 +1,52 @@
+import importlib
+import click
+from click.utils import make_default_short_help
+
+
+class LazyGroup(click.Group):
+    """Click group that imports the module of a subcommand only when the subcommand is used.
+
+    Args:
+        lazy_subcommands (dict[str, str], optional): subcommand name and import path of the command object,
+            e.g. {'flinkop': 'flinkop.flinkop.flinkop'}.
+        lazy_help (dict[str, str], optional): help of the lazy subcommands, shortened by --help like click does,
+            so listing them doesn't import their modules. Subcommands without one are imported to read it.
+        **kwargs: options of click.Group.
+    """
+
+    def __init__(self, *args, lazy_subcommands: dict[str, str] = None, lazy_help: dict[str, str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+        self.lazy_help = lazy_help or {}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command:
+        if cmd_name in self.lazy_subcommands and cmd_name not in self.commands:
+            self.add_command(self._load(cmd_name), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        names = self.list_commands(ctx)
+        if not names:
+            return
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = []
+        for name in names:
+            if name in self.lazy_help and name not in self.commands:
+                rows.append((name, make_default_short_help(self.lazy_help[name], limit)))
+                continue
+            command = self.get_command(ctx, name)
+            if command is not None and not command.hidden:
+                rows.append((name, command.get_short_help_str(limit)))
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
+    def _load(self, cmd_name: str) -> click.Command:
+        module_name, _, attribute = self.lazy_subcommands[cmd_name].rpartition('.')
+        command = getattr(importlib.import_module(module_name), attribute)
+        if not isinstance(command, click.Command):
+            raise ValueError(f'{self.lazy_subcommands[cmd_name]} is not a click command')
+        return command
@@ -0,0 +1,240 @@
+import json
+import math
+import os
+import re
+import time
+from os import path
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+HISTORY_FILE = os.environ.get('DP_BENCHMARK_HISTORY', path.join(str(Path.home()), '.cache', 'dp', 'benchmarks.jsonl'))
+PERCENTILES = ('p50', 'p95', 'p99', 'p999')
+MESSAGE_PREFIX = 'dp-bench '
+MESSAGE_PREFIX_BYTES = bytes(MESSAGE_PREFIX, 'utf-8')
+
+_PRODUCER_LINE = re.compile(
+    r'(?P<records>\d+) records sent, (?P<records_per_sec>[\d.]+) records/sec \((?P<mb_per_sec>[\d.]+) MB/sec\), '
+    r'(?P<avg_latency_ms>[\d.]+) ms avg latency, (?P<max_latency_ms>[\d.]+) ms max latency'
+    r'(?:, (?P<p50>[\d.]+) ms 50th, (?P<p95>[\d.]+) ms 95th, (?P<p99>[\d.]+) ms 99th, (?P<p999>[\d.]+) ms 99.9th)?')
+
+
+def producer_command(bootstrap: str, topic: str, records: int, record_size: int, throughput: int = -1,
+                     acks: str = 'all', compression: str = 'none') -> list[str]:
+    """Command line of `kafka-producer-perf-test.sh`, run inside a pod with the kafka tools.
+
+    Args:
+        bootstrap (str): bootstrap servers of the cluster.
+        topic (str): topic where the records are sent.
+        records (int): number of records sent by this client.
+        record_size (int): size of every record in bytes.
+        throughput (int, optional): target records per second, -1 for no limit. Defaults to -1.
+        acks (str, optional): producer acks, '0', '1' or 'all'. Defaults to 'all'.
+        compression (str, optional): compression type. Defaults to 'none'.
+
+    Returns:
+        list[str]: command and arguments.
+    """
+    return ['bin/kafka-producer-perf-test.sh', '--topic', topic, '--num-records', str(records),
+            '--record-size', str(record_size), '--throughput', str(throughput),
+            '--producer-props', f'bootstrap.servers={bootstrap}', f'acks={acks}', f'compression.type={compression}']
+
+
+def consumer_command(bootstrap: str, topic: str, records: int, group: str, timeout_ms: int = 60000) -> list[str]:
+    """Command line of `kafka-consumer-perf-test.sh`, run inside a pod with the kafka tools.
+
+    Args:
+        bootstrap (str): bootstrap servers of the cluster.
+        topic (str): topic where the records are read from.
+        records (int): number of records read by this client.
+        group (str): consumer group, clients of the same run share it and split the partitions.
+        timeout_ms (int, optional): maximum time between two records. Defaults to 60000.
+
+    Returns:
+        list[str]: command and arguments.
+    """
+    return ['bin/kafka-consumer-perf-test.sh', '--bootstrap-server', bootstrap, '--topic', topic,
+            '--messages', str(records), '--group', group, '--timeout', str(timeout_ms)]
+
+
+def parse_producer(output: str) -> dict:
+    """Parse the summary written by `kafka-producer-perf-test.sh` at the end of the run.
+
+    Args:
+        output (str): stdout of the tool, the periodic progress lines are ignored.
+
+    Raises:
+        ValueError: the output has no summary line.
+
+    Returns:
+        dict: records, records_per_sec, mb_per_sec, avg_latency_ms, max_latency_ms and p50, p95, p99, p999 in ms.
+    """
+    for line in reversed(output.splitlines()):
+        match = _PRODUCER_LINE.search(line)
+        if match is not None and match.group('p50') is not None:
+            result = {key: float(value) for key, value in match.groupdict().items()}
+            result['records'] = int(result['records'])
+            return result
+    raise ValueError('No producer summary found in the output')
+
+
+def parse_consumer(output: str) -> dict:
+    """Parse the CSV report written by `kafka-consumer-perf-test.sh`.
+
+    Args:
+        output (str): stdout of the tool, a header line and a data line.
+
+    Raises:
+        ValueError: the output has no report.
+
+    Returns:
+        dict: records, records_per_sec, mb and mb_per_sec.
+    """
+    lines = [line for line in output.splitlines() if line.strip()]
+    for number, line in enumerate(lines[:-1]):
+        if line.startswith('start.time'):
+            header = [column.strip() for column in line.split(',')]
+            row = dict(zip(header, (value.strip() for value in lines[number + 1].split(','))))
+            return {
+                'records': int(row['data.consumed.in.nMsg']),
+                'records_per_sec': float(row['nMsg.sec']),
+                'mb': float(row['data.consumed.in.MB']),
+                'mb_per_sec': float(row['MB.sec']),
+            }
+    raise ValueError('No consumer report found in the output')
+
+
+def aggregate(results: list[dict]) -> dict:
+    """Combine the results of the clients that ran at the same time.
+
+    Records and rates are added up. Percentiles of different clients can't be merged exactly, the worst one is
+    kept, and the average latency is weighted by the records of every client.
+
+    Args:
+        results (list[dict]): results returned by `parse_producer` or `parse_consumer`.
+
+    Returns:
+        dict: combined result with the number of clients.
+    """
+    combined = {'clients': len(results)}
+    if not results:
+        return combined
+    for key in ('records', 'records_per_sec', 'mb', 'mb_per_sec'):
+        if key in results[0]:
+            combined[key] = round(sum(result[key] for result in results), 3)
+    if 'avg_latency_ms' in results[0]:
+        records = sum(result['records'] for result in results) or 1
+        combined['avg_latency_ms'] = round(
+            sum(result['avg_latency_ms'] * result['records'] for result in results) / records, 3)
+        for key in ('max_latency_ms',) + PERCENTILES:
+            combined[key] = max(result[key] for result in results)
+    return combined
+
+
+def append_history(run: dict, history_file: str = HISTORY_FILE) -> None:
+    """Add a benchmark run at the end of the JSON lines history file.
+    """
+    os.makedirs(path.dirname(history_file) or '.', exist_ok=True)
+    with open(history_file, 'a') as f:
+        f.write(json.dumps(run, sort_keys=True) + '\n')
+
+
+def load_history(history_file: str = HISTORY_FILE) -> list[dict]:
+    """Benchmark runs stored in the history file, oldest first. Broken lines are skipped.
+    """
+    runs = []
+    try:
+        with open(history_file) as f:
+            for line in f:
+                try:
+                    runs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return runs
+
+
+def previous_run(run: dict, history: list[dict]) -> dict:
+    """Latest run in the history with the same target and parameters, None when there is no such run.
+    """
+    for candidate in reversed(history):
+        if candidate.get('target') == run.get('target') and candidate.get('params') == run.get('params'):
+            return candidate
+    return None
+
+
+def compare(run: dict, previous: dict) -> dict:
+    """Percentage change of the throughput and latency of a run against a previous one.
+
+    Args:
+        run (dict): new benchmark run, with `producer` and `consumer` results.
+        previous (dict): run to compare with.
+
+    Returns:
+        dict: for every phase, the change in percent of every metric present in both runs.
+    """
+    changes = {}
+    for phase in ('producer', 'consumer'):
+        new, old = run.get(phase) or {}, previous.get(phase) or {}
+        metrics = ('records_per_sec', 'mb_per_sec', 'avg_latency_ms') + PERCENTILES
+        phase_changes = {key: round((new[key] - old[key]) / old[key] * 100, 1)
+                         for key in metrics if key in new and old.get(key)}
+        if phase_changes:
+            changes[phase] = phase_changes
+    return changes
+
+
+def benchmark_messages(count: int, record_size: int, clock: Callable[[], int] = time.time_ns) -> Iterator[bytes]:
+    """Records that carry the time they were generated, so the consumer can measure the end-to-end latency.
+
+    The time is taken when the record is requested, i.e. right before it is written to the producer.
+
+    Args:
+        count (int): number of records.
+        record_size (int): size of every record in bytes, without the newline.
+        clock (Callable[[], int], optional): wall clock in nanoseconds. Defaults to time.time_ns.
+
+    Returns:
+        Iterator[bytes]: newline terminated records.
+    """
+    for sequence in range(count):
+        header = f'{MESSAGE_PREFIX}{clock()} {sequence} '
+        yield bytes(header.ljust(record_size, 'x'), 'utf-8') + b'\n'
+
+
+def message_latency_ms(record: bytes, now_ns: int) -> float:
+    """Milliseconds since a record of `benchmark_messages` was generated, None for other records.
+    """
+    if not record.startswith(MESSAGE_PREFIX_BYTES):
+        return None
+    try:
+        sent = int(record[len(MESSAGE_PREFIX_BYTES):].split(b' ', 1)[0])
+    except ValueError:
+        return None
+    return (now_ns - sent) / 1e6
+
+
+def latency_stats(samples: Sequence[float]) -> dict:
+    """Average, maximum and percentiles of latency samples with the nearest-rank method.
+
+    Args:
+        samples (Sequence[float]): latencies in ms.
+
+    Returns:
+        dict: avg_latency_ms, max_latency_ms and p50, p95, p99, p999 in ms, empty without samples.
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    stats = {'avg_latency_ms': round(sum(ordered) / len(ordered), 3), 'max_latency_ms': round(ordered[-1], 3)}
+    for key, percentile in zip(PERCENTILES, (50, 95, 99, 99.9)):
+        rank = math.ceil(round(percentile * len(ordered) / 100, 9))
+        stats[key] = round(ordered[max(rank - 1, 0)], 3)
+    return stats
+
+
+def new_run(target: str, params: dict, producer: dict, consumer: dict) -> dict:
+    """Benchmark run as stored in the history file.
+    """
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'target': target, 'params': params,
+            'producer': producer, 'consumer': consumer}
@@ -0,0 +1,239 @@
+import time
+import click
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable
+from . import retry
+from .retry import RetryPolicy
+from .tracing import get_tracer
+
+
+class Step:
+    """Single unit of work inside an install plan.
+
+    Args:
+        name (str): unique name of the step inside the plan, e.g. 'namespace:flink-jobs'.
+        action (Callable): function without arguments that performs the step.
+        after (Iterable[str], optional): names of the steps that must finish before this one starts.
+        estimate (float, optional): expected duration in seconds, used to compute the critical path. Defaults to 1.
+        retry (RetryPolicy, optional): retry policy of the commands run by the step. Defaults to the global one.
+    """
+
+    def __init__(self, name: str, action: Callable, after: Iterable[str] = (), estimate: float = 1.0,
+                 retry: RetryPolicy = None):
+        self.name = name
+        self.action = action
+        self.after = list(dict.fromkeys(after))
+        self.estimate = estimate
+        self.retry = retry
+
+
+class InstallPlan:
+    """Directed acyclic graph of steps executed with as much parallelism as the dependencies allow.
+
+    Args:
+        name (str): name of the plan shown in the rendered output.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.steps: dict[str, Step] = {}
+
+    def add(self, name: str, action: Callable, after: Iterable[str] = (), estimate: float = 1.0,
+            retry: RetryPolicy = None) -> Step:
+        """Add a step to the plan.
+
+        Adding a step whose name already exists keeps the first action and merges the dependencies, so shared
+        prerequisites such as cert-manager are executed only once.
+
+        Args:
+            name (str): unique name of the step.
+            action (Callable): function without arguments that performs the step.
+            after (Iterable[str], optional): names of the steps that must finish before this one.
+            estimate (float, optional): expected duration in seconds. Defaults to 1.
+            retry (RetryPolicy, optional): retry policy of the commands run by the step. Defaults to the global one.
+
+        Returns:
+            Step: the step stored in the plan.
+        """
+        if name in self.steps:
+            step = self.steps[name]
+            step.after = list(dict.fromkeys(step.after + list(after)))
+            return step
+        step = Step(name, action, after, estimate, retry)
+        self.steps[name] = step
+        return step
+
+    def add_dependency(self, name: str, dependency: str) -> None:
+        """Make an existing step wait for another one.
+
+        Args:
+            name (str): step that has to wait.
+            dependency (str): step that has to finish first.
+        """
+        step = self.steps[name]
+        if dependency not in step.after:
+            step.after.append(dependency)
+
+    def validate(self) -> None:
+        """Check that every dependency exists and that the graph has no cycles.
+
+        Raises:
+            ValueError: the plan references an unknown step or contains a cycle.
+        """
+        for step in self.steps.values():
+            for dependency in step.after:
+                if dependency not in self.steps:
+                    raise ValueError(f'Step {step.name} depends on unknown step {dependency}')
+        self.stages()
+
+    def stages(self) -> list[list[str]]:
+        """Group the steps in stages, every step only depends on steps from previous stages.
+
+        Raises:
+            ValueError: the plan contains a cycle.
+
+        Returns:
+            list[list[str]]: step names grouped by stage.
+        """
+        pending = {name: set(step.after) for name, step in self.steps.items()}
+        done = set()
+        stages = []
+        while pending:
+            ready = [name for name, after in pending.items() if after <= done]
+            if not ready:
+                raise ValueError(f'Plan {self.name} has a dependency cycle between: {", ".join(sorted(pending))}')
+            for name in ready:
+                del pending[name]
+            done.update(ready)
+            stages.append(ready)
+        return stages
+
+    def critical_path(self, durations: dict[str, float] = None) -> tuple[list[str], float]:
+        """Longest chain of dependent steps, the minimum wall-clock time of the plan.
+
+        Args:
+            durations (dict[str, float], optional): measured durations that replace the estimates.
+
+        Returns:
+            tuple[list[str], float]: step names in the path and its total duration in seconds.
+        """
+        durations = durations or {}
+        finish: dict[str, float] = {}
+        previous: dict[str, str] = {}
+        for stage in self.stages():
+            for name in stage:
+                step = self.steps[name]
+                start = 0.0
+                for dependency in step.after:
+                    if finish[dependency] > start:
+                        start = finish[dependency]
+                        previous[name] = dependency
+                finish[name] = start + durations.get(name, step.estimate)
+        if not finish:
+            return [], 0.0
+        last = max(finish, key=finish.get)
+        path = [last]
+        while path[-1] in previous:
+            path.append(previous[path[-1]])
+        return list(reversed(path)), finish[last]
+
+    def render(self, durations: dict[str, float] = None) -> str:
+        """Text representation of the plan with its stages, dependencies and critical path.
+
+        Args:
+            durations (dict[str, float], optional): measured durations that replace the estimates.
+
+        Returns:
+            str: rendered plan.
+        """
+        durations = durations or {}
+        stages = self.stages()
+        lines = [f'Plan {self.name}: {len(self.steps)} steps in {len(stages)} stages']
+        for number, stage in enumerate(stages, start=1):
+            lines.append(f'Stage {number}:')
+            for name in stage:
+                step = self.steps[name]
+                line = f'  - {name} (~{durations.get(name, step.estimate):.1f}s)'
+                if step.after:
+                    line += f' after {", ".join(step.after)}'
+                lines.append(line)
+        path, total = self.critical_path(durations)
+        lines.append(f'Critical path (~{total:.1f}s): {" -> ".join(path)}')
+        return '\n'.join(lines)
+
+    def run(self, max_workers: int = None) -> dict[str, float]:
+        """Execute the plan, starting every step as soon as its dependencies are done.
+
+        When a step fails no new steps are started, the running ones are allowed to finish and the error is raised.
+
+        Args:
+            max_workers (int, optional): maximum number of steps running at the same time. Defaults to no limit.
+
+        Returns:
+            dict[str, float]: duration in seconds of every step.
+        """
+        self.validate()
+        durations: dict[str, float] = {}
+        done: set[str] = set()
+        pending = dict(self.steps)
+        error = None
+        with ThreadPoolExecutor(max_workers=max_workers or max(len(self.steps), 1),
+                                thread_name_prefix='dp-plan') as pool:
+            running = {}
+            while pending or running:
+                if error is None:
+                    ready = [name for name, step in pending.items() if set(step.after) <= done]
+                    for name in ready:
+                        step = pending.pop(name)
+                        running[pool.submit(_timed, name, step.action, step.retry)] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        durations[name] = future.result()
+                        done.add(name)
+                    except Exception as exc:
+                        if error is None:
+                            error = exc
+        if error is not None:
+            raise error
+        return durations
+
+
+def _timed(name: str, action: Callable, policy: RetryPolicy = None) -> float:
+    start = time.monotonic()
+    with get_tracer().span(name, 'step'):
+        if policy is None:
+            action()
+        else:
+            with retry.using(policy):
+                action()
+    return time.monotonic() - start
+
+
+def run_plan(plan: InstallPlan, show_plan: bool = False, max_workers: int = None) -> dict[str, float]:
+    """Print or execute a plan, the common entry point of the install commands.
+
+    Args:
+        plan (InstallPlan): plan to execute.
+        show_plan (bool, optional): only print the plan without running it. Defaults to False.
+        max_workers (int, optional): maximum number of steps running at the same time.
+
+    Returns:
+        dict[str, float]: duration in seconds of every executed step.
+    """
+    plan.validate()
+    if show_plan:
+        click.echo(plan.render())
+        return {}
+    start = time.monotonic()
+    durations = plan.run(max_workers)
+    path, total = plan.critical_path(durations)
+    click.echo('-------------------------------------------')
+    click.echo(f'{plan.name} finished in {time.monotonic() - start:.1f}s (critical path {total:.1f}s: {" -> ".join(path)})')
+    if retry.stats.summary():
+        click.echo(retry.stats.summary())
+    click.echo('-------------------------------------------')
+    return durations
@@ -0,0 +1,455 @@
+import asyncio
+import json
+import time
+import click
+from typing import Callable
+from .executor import get_executor
+from .tracing import get_tracer
+
+KUBECTL = ['kubectl']
+DEFAULT_TIMEOUT = 300
+PROGRESS_INTERVAL = 15
+RETRY_INTERVAL = 1
+RELIST_INTERVAL = 5
+
+
+class Deadline:
+    """Point in time shared by several waits, so a group of waits never takes longer than the global timeout.
+
+    Args:
+        seconds (float): seconds from now until the deadline.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline, never negative.
+        """
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() == 0
+
+
+class Condition:
+    """Kubernetes resource and the check that tells when it is ready.
+
+    Args:
+        kind (str): kubectl resource type, e.g. 'deployment' or 'crd'.
+        name (str): name of the resource.
+        predicate (Callable[[dict], bool]): receives the resource as a dict and returns True when it is ready.
+        namespace (str, optional): namespace of the resource. Defaults to None for cluster scoped resources.
+    """
+
+    def __init__(self, kind: str, name: str, predicate: Callable[[dict], bool], namespace: str = None):
+        self.kind = kind
+        self.name = name
+        self.predicate = predicate
+        self.namespace = namespace
+
+    def __str__(self) -> str:
+        if self.namespace is None:
+            return f'{self.kind} {self.name}'
+        return f'{self.kind} {self.namespace}/{self.name}'
+
+    def watch_command(self, kubectl: list = None) -> list:
+        """kubectl command that streams the resource every time it changes.
+
+        A field selector is used instead of the resource name, so the watch also works before the resource exists.
+        """
+        command = list(kubectl or KUBECTL) + ['get', self.kind, '--field-selector', f'metadata.name={self.name}']
+        if self.namespace is not None:
+            command += ['--namespace', self.namespace]
+        return command + ['--output', 'json', '--watch']
+
+
+class WaitTimeout(SystemError):
+    """Raised when some resources are not ready before the deadline."""
+
+
+def condition_status(resource: dict, condition_type: str) -> str:
+    """Status of a condition from the `status.conditions` list of a resource.
+
+    Args:
+        resource (dict): kubernetes resource.
+        condition_type (str): type of the condition, e.g. 'Ready'.
+
+    Returns:
+        str: 'True', 'False' or 'Unknown' when the condition is not reported.
+    """
+    for condition in resource.get('status', {}).get('conditions') or []:
+        if condition.get('type') == condition_type:
+            return condition.get('status', 'Unknown')
+    return 'Unknown'
+
+
+def deployment_available(resource: dict) -> bool:
+    """A Deployment is available when every desired replica is updated and available.
+    """
+    status = resource.get('status', {})
+    replicas = resource.get('spec', {}).get('replicas', 1)
+    if status.get('observedGeneration', 0) < resource.get('metadata', {}).get('generation', 0):
+        return False
+    return status.get('updatedReplicas', 0) >= replicas and status.get('availableReplicas', 0) >= replicas
+
+
+def statefulset_ready(resource: dict) -> bool:
+    """A StatefulSet is ready when every desired replica is ready.
+    """
+    replicas = resource.get('spec', {}).get('replicas', 1)
+    return resource.get('status', {}).get('readyReplicas', 0) >= replicas
+
+
+def crd_established(resource: dict) -> bool:
+    """A CustomResourceDefinition can be used once it is established.
+    """
+    return condition_status(resource, 'Established') == 'True'
+
+
+def webhook_ready(resource: dict) -> bool:
+    """A webhook configuration is usable once the CA bundle is injected in all its webhooks.
+    """
+    webhooks = resource.get('webhooks') or []
+    return bool(webhooks) and all(webhook.get('clientConfig', {}).get('caBundle') for webhook in webhooks)
+
+
+def custom_resource_ready(resource: dict) -> bool:
+    """Custom resources managed by operators report a `Ready` condition.
+    """
+    return condition_status(resource, 'Ready') == 'True'
+
+
+def pod_ready(resource: dict) -> bool:
+    """A Pod is ready when all its containers are ready.
+    """
+    return condition_status(resource, 'Ready') == 'True'
+
+
+def deployment(name: str, namespace: str) -> Condition:
+    return Condition('deployment', name, deployment_available, namespace)
+
+
+def statefulset(name: str, namespace: str) -> Condition:
+    return Condition('statefulset', name, statefulset_ready, namespace)
+
+
+def pod(name: str, namespace: str) -> Condition:
+    return Condition('pod', name, pod_ready, namespace)
+
+
+def crd(name: str) -> Condition:
+    return Condition('customresourcedefinition', name, crd_established)
+
+
+def webhook(name: str, kind: str = 'validatingwebhookconfiguration') -> Condition:
+    return Condition(kind, name, webhook_ready)
+
+
+def custom_resource(kind: str, name: str, namespace: str) -> Condition:
+    return Condition(kind, name, custom_resource_ready, namespace)
+
+
+class JsonStream:
+    """Incremental decoder for the concatenated JSON documents written by `kubectl get --watch -o json`.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+
+    def feed(self, line: bytes) -> list[dict]:
+        """Add a line of output and return the documents completed by it.
+        """
+        self._buffer += line.decode('utf-8', errors='replace')
+        # documents are pretty printed or written in a single line, nested lines are always indented
+        if line[:1] not in (b'{', b'}') or not line.rstrip().endswith(b'}'):
+            return []
+        documents = []
+        while self._buffer.strip():
+            text = self._buffer.lstrip()
+            try:
+                document, end = self._decoder.raw_decode(text)
+            except json.JSONDecodeError:
+                self._buffer = text
+                break
+            documents.append(document)
+            self._buffer = text[end:]
+        return documents
+
+
+async def _watch_until(command: list, on_document: Callable[[dict], None], done: asyncio.Event, deadline: Deadline,
+                       errors: list) -> bool:
+    """Run a kubectl watch, passing every document to `on_document`, until `done` is set or the deadline expires.
+
+    The watch is started again if kubectl exits before, e.g. when the connection to the API server is closed or
+    the resource type does not exist yet.
+
+    Returns:
+        bool: True when `done` was set before the deadline.
+    """
+    while not deadline.expired():
+        stream = JsonStream()
+
+        def on_stdout(line: bytes):
+            for document in stream.feed(line):
+                on_document(document)
+
+        watch = asyncio.ensure_future(get_executor().run(
+            command, capture=False, on_stdout=on_stdout, on_stderr=errors.append, bounded=False))
+        signal = asyncio.ensure_future(done.wait())
+        await asyncio.wait({watch, signal}, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED)
+        for task in (watch, signal):
+            task.cancel()
+        await asyncio.gather(watch, signal, return_exceptions=True)
+        if done.is_set():
+            return True
+        if not deadline.expired():
+            await asyncio.sleep(min(RETRY_INTERVAL, deadline.remaining()))
+    return done.is_set()
+
+
+def _last_error(errors: list) -> str:
+    return f': {errors[-1].decode("utf-8", errors="replace").strip()}' if errors else ''
+
+
+async def wait_condition(condition: Condition, deadline: Deadline, kubectl: list = None) -> float:
+    """Watch a resource until the condition is met.
+
+    Args:
+        condition (Condition): resource and readiness check.
+        deadline (Deadline): time limit of the wait.
+        kubectl (list, optional): kubectl command, tests replace it with a fake one. Defaults to ['kubectl'].
+
+    Raises:
+        WaitTimeout: the resource is not ready before the deadline.
+
+    Returns:
+        float: seconds waited.
+    """
+    start = time.monotonic()
+    ready = asyncio.Event()
+    errors = []
+
+    def on_document(document: dict):
+        if condition.predicate(document):
+            ready.set()
+
+    with get_tracer().span(f'wait {condition}', 'wait'):
+        if await _watch_until(condition.watch_command(kubectl), on_document, ready, deadline, errors):
+            return time.monotonic() - start
+    raise WaitTimeout(f'{condition} not ready after {time.monotonic() - start:.0f}s{_last_error(errors)}')
+
+
+async def wait_collection(kind: str, names: list[str], namespace: str, deadline: Deadline,
+                          predicate: Callable[[dict], bool] = custom_resource_ready, selector: str = None,
+                          kubectl: list = None) -> dict[str, float]:
+    """Wait for many resources of the same kind with a single watch, instead of one kubectl process per resource.
+
+    Args:
+        kind (str): kubectl resource type, e.g. 'kafkatopic'.
+        names (list[str]): names of the resources.
+        namespace (str): namespace of the resources.
+        deadline (Deadline): time limit of the wait.
+        predicate (Callable[[dict], bool], optional): readiness check. Defaults to the `Ready` condition.
+        selector (str, optional): label selector that narrows the watch, e.g. 'strimzi.io/cluster=my-cluster'.
+        kubectl (list, optional): kubectl command, tests replace it with a fake one.
+
+    Raises:
+        WaitTimeout: some resources are not ready before the deadline.
+
+    Returns:
+        dict[str, float]: seconds waited for every resource.
+    """
+    start = time.monotonic()
+    pending = set(names)
+    waited = {}
+    done = asyncio.Event()
+    errors = []
+
+    def on_document(document: dict):
+        name = document.get('metadata', {}).get('name')
+        if name in pending and predicate(document):
+            pending.discard(name)
+            waited[name] = time.monotonic() - start
+            if not pending:
+                done.set()
+
+    command = list(kubectl or KUBECTL) + ['get', kind, '--namespace', namespace]
+    if selector is not None:
+        command += ['--selector', selector]
+    command += ['--output', 'json', '--watch']
+    with get_tracer().span(f'wait {len(names)} {kind} {namespace}', 'wait'):
+        finished = not pending or await _watch_until(command, on_document, done, deadline, errors)
+    if not finished:
+        missing = sorted(pending)
+        listed = ', '.join(missing[:10]) + (f' and {len(missing) - 10} more' if len(missing) > 10 else '')
+        raise WaitTimeout(f'{len(missing)} {kind} not ready after {time.monotonic() - start:.0f}s: '
+                          f'{listed}{_last_error(errors)}')
+    return waited
+
+
+def wait_for_collection(kind: str, names: list[str], namespace: str, timeout: float = DEFAULT_TIMEOUT,
+                        deadline: Deadline = None, **kwargs) -> dict[str, float]:
+    """Block until every resource of the collection is ready, see `wait_collection`.
+
+    Returns:
+        dict[str, float]: seconds waited for every resource.
+    """
+    deadline = deadline or Deadline(timeout)
+    click.echo('-------------------------------------------')
+    click.echo(f'Waiting up to {deadline.remaining():.0f}s for {len(names)} {kind} in {namespace}')
+    click.echo('-------------------------------------------')
+    return get_executor().submit(wait_collection(kind, names, namespace, deadline, **kwargs)).result()
+
+
+async def wait_deleted(kind: str, names: list[str], namespace: str, deadline: Deadline, selector: str = None,
+                       kubectl: list = None) -> dict[str, float]:
+    """Wait until resources are gone, i.e. their finalizers are cleared and the API server removed them.
+
+    A single watch reports the DELETED events. The resources are also listed every few seconds, so the ones
+    removed before the watch started are not waited for forever.
+
+    Args:
+        kind (str): kubectl resource type, e.g. 'kafkatopic'.
+        names (list[str]): names of the resources being deleted.
+        namespace (str): namespace of the resources.
+        deadline (Deadline): time limit of the wait.
+        selector (str, optional): label selector that narrows the watch and the lists.
+        kubectl (list, optional): kubectl command, tests replace it with a fake one.
+
+    Raises:
+        WaitTimeout: some resources still exist at the deadline, the message lists their finalizers.
+
+    Returns:
+        dict[str, float]: seconds waited for every resource.
+    """
+    start = time.monotonic()
+    pending = set(names)
+    waited = {}
+    finalizers = {}
+    done = asyncio.Event()
+    errors = []
+
+    def gone(name: str):
+        if name in pending:
+            pending.discard(name)
+            waited[name] = time.monotonic() - start
+            if not pending:
+                done.set()
+
+    def on_document(event: dict):
+        resource = event.get('object') or {}
+        name = resource.get('metadata', {}).get('name')
+        if event.get('type') == 'DELETED':
+            gone(name)
+        elif name in pending:
+            finalizers[name] = resource.get('metadata', {}).get('finalizers') or []
+
+    command = list(kubectl or KUBECTL) + ['get', kind, '--namespace', namespace]
+    if selector is not None:
+        command += ['--selector', selector]
+
+    async def relist():
+        while not done.is_set() and not deadline.expired():
+            result = await get_executor().run(command + ['--output', 'jsonpath={.items[*].metadata.name}'],
+                                              bounded=False)
+            if result.returncode == 0:
+                for name in pending - set(result.stdout.decode('utf-8').split()):
+                    gone(name)
+            await asyncio.sleep(min(RELIST_INTERVAL, deadline.remaining()))
+
+    if pending:
+        lister = asyncio.ensure_future(relist())
+        try:
+            with get_tracer().span(f'wait deleted {len(names)} {kind} {namespace}', 'wait'):
+                finished = await _watch_until(command + ['--output', 'json', '--watch', '--output-watch-events'],
+                                              on_document, done, deadline, errors)
+        finally:
+            lister.cancel()
+            await asyncio.gather(lister, return_exceptions=True)
+        if not finished:
+            missing = sorted(pending)
+            listed = ', '.join(f'{name} (finalizers: {", ".join(finalizers.get(name) or ["unknown"])})'
+                               for name in missing[:10])
+            if len(missing) > 10:
+                listed += f' and {len(missing) - 10} more'
+            raise WaitTimeout(f'{len(missing)} {kind} not deleted after {time.monotonic() - start:.0f}s: '
+                              f'{listed}{_last_error(errors)}')
+    return waited
+
+
+def wait_for_deleted(kind: str, names: list[str], namespace: str, timeout: float = DEFAULT_TIMEOUT,
+                     deadline: Deadline = None, **kwargs) -> dict[str, float]:
+    """Block until every resource is deleted, see `wait_deleted`.
+
+    Returns:
+        dict[str, float]: seconds waited for every resource.
+    """
+    deadline = deadline or Deadline(timeout)
+    click.echo('-------------------------------------------')
+    click.echo(f'Waiting up to {deadline.remaining():.0f}s until {len(names)} {kind} in {namespace} are deleted')
+    click.echo('-------------------------------------------')
+    return get_executor().submit(wait_deleted(kind, names, namespace, deadline, **kwargs)).result()
+
+
+async def wait_all(conditions: list[Condition], deadline: Deadline, kubectl: list = None) -> dict[str, float]:
+    """Wait concurrently for several conditions, printing the progress.
+
+    Args:
+        conditions (list[Condition]): resources to wait for.
+        deadline (Deadline): time limit shared by all the waits.
+        kubectl (list, optional): kubectl command, tests replace it with a fake one.
+
+    Raises:
+        WaitTimeout: some resources are not ready before the deadline.
+
+    Returns:
+        dict[str, float]: seconds waited for every resource.
+    """
+    pending = {str(condition) for condition in conditions}
+    waited = {}
+
+    async def wait_one(condition: Condition):
+        waited[str(condition)] = await wait_condition(condition, deadline, kubectl)
+        pending.discard(str(condition))
+        click.echo(f'{condition} ready after {waited[str(condition)]:.1f}s')
+
+    async def progress():
+        while pending:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            click.echo(f'Still waiting ({deadline.remaining():.0f}s left) for: {", ".join(sorted(pending))}')
+
+    reporter = asyncio.ensure_future(progress())
+    try:
+        results = await asyncio.gather(*(wait_one(condition) for condition in conditions), return_exceptions=True)
+    finally:
+        reporter.cancel()
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        raise WaitTimeout('\n'.join(str(error) for error in errors))
+    return waited
+
+
+def wait_for(conditions: list[Condition], timeout: float = DEFAULT_TIMEOUT, deadline: Deadline = None,
+             kubectl: list = None) -> dict[str, float]:
+    """Block until every condition is met or the deadline expires.
+
+    Args:
+        conditions (list[Condition]): resources to wait for.
+        timeout (float, optional): seconds to wait when no deadline is given. Defaults to 300.
+        deadline (Deadline, optional): deadline shared with other waits.
+        kubectl (list, optional): kubectl command, tests replace it with a fake one.
+
+    Raises:
+        WaitTimeout: some resources are not ready before the deadline.
+
+    Returns:
+        dict[str, float]: seconds waited for every resource.
+    """
+    deadline = deadline or Deadline(timeout)
+    click.echo('-------------------------------------------')
+    click.echo(f'Waiting up to {deadline.remaining():.0f}s for {", ".join(str(condition) for condition in conditions)}')
+    click.echo('-------------------------------------------')
+    return get_executor().submit(wait_all(conditions, deadline, kubectl)).result()
@@ -0,0 +1,63 @@
+import copy
+from functools import lru_cache
+from os import path
+from pathlib import Path
+
+RESOURCES_DIR = path.join(str(Path(__file__).parent.parent), 'resources')
+
+
+def resource_path(name: str) -> str:
+    """Path of a file packaged in the resources folder.
+
+    Args:
+        name (str): file name inside the resources folder.
+
+    Returns:
+        str: absolute path of the file.
+    """
+    return path.join(RESOURCES_DIR, name)
+
+
+@lru_cache(maxsize=None)
+def _parse(name: str) -> tuple:
+    import yaml
+    with open(resource_path(name)) as f:
+        return tuple(doc for doc in yaml.safe_load_all(f) if doc is not None)
+
+
+def load_template(name: str) -> dict:
+    """Read a packaged YAML template, the packaged file is never modified.
+
+    Args:
+        name (str): file name inside the resources folder.
+
+    Returns:
+        dict: a new copy of the first document of the file, safe to modify.
+    """
+    return copy.deepcopy(_parse(name)[0])
+
+
+def to_yaml(manifest: dict | list[dict]) -> str:
+    """Render one or several documents as YAML, ready to be sent to `kubectl apply -f -` or `helm -f -`.
+
+    Args:
+        manifest (dict | list[dict]): document or list of documents.
+
+    Returns:
+        str: YAML text, documents separated by `---`.
+    """
+    import yaml
+    documents = manifest if isinstance(manifest, list) else [manifest]
+    return yaml.safe_dump_all(documents, default_flow_style=False, sort_keys=False)
+
+
+def load_documents(name: str) -> list[dict]:
+    """Read every document of a packaged YAML file.
+
+    Args:
+        name (str): file name inside the resources folder.
+
+    Returns:
+        list[dict]: new copies of the documents, safe to modify.
+    """
+    return copy.deepcopy(list(_parse(name)))
@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from subprocess import CompletedProcess
+from typing import Callable, Iterator
+import click
+from .tracing import get_tracer
+
+DEFAULT_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+
+# stderr fragments of failures that usually go away by themselves, compared in lower case
+RETRYABLE_ERRORS = (
+    # API server overloaded, restarting or behind a load balancer that is not ready
+    '(toomanyrequests)', '(internalerror)', '(serviceunavailable)',
+    'the server is currently unable to handle the request', '(servertimeout)', '(timeout)',
+    'etcdserver: request timed out', 'etcdserver: leader changed',
+    # network
+    'unable to connect to the server', 'connect: connection refused', 'connection reset by peer', 'i/o timeout',
+    'tls handshake timeout', 'context deadline exceeded', 'http2: client connection lost',
+    # admission webhooks and CRDs registered a moment ago
+    'failed calling webhook', 'no endpoints available for service', 'ensure crds are installed first',
+    # optimistic concurrency
+    'the object has been modified',
+    # helm repositories
+    'kubernetes cluster unreachable', 'is not a valid chart repository or cannot be reached', 'failed to fetch http',
+)
+# programs whose calls are retried, they talk to the control plane
+RETRYABLE_PROGRAMS = ('kubectl', 'helm')
+# kubectl subcommands that run or stream something in a pod, running them again could repeat their work
+NOT_RETRYABLE_SUBCOMMANDS = ('exec', 'attach', 'run', 'cp', 'port-forward', 'logs', 'proxy')
+# global options of kubectl and helm written before the subcommand with their value in the next word
+VALUE_OPTIONS = ('-n', '--namespace', '--context', '--kube-context', '--kubeconfig', '-s', '--server', '--cluster',
+                 '--user', '--token', '--as', '--request-timeout', '--cache-dir')
+
+
+def retryable_command(commands: list) -> bool:
+    """Tell whether a command can be run again after a transient failure: kubectl and helm control plane calls,
+    not `kubectl exec` and the other subcommands that run something in a pod, such as a producer.
+    """
+    if not commands or os.path.basename(str(commands[0])) not in RETRYABLE_PROGRAMS:
+        return False
+    return subcommand(commands) not in NOT_RETRYABLE_SUBCOMMANDS
+
+
+def subcommand(commands: list) -> str:
+    """First word after the program that is not an option or the value of an option, None when there is none.
+    """
+    words = iter(map(str, commands[1:]))
+    for word in words:
+        if word == '--':
+            return None
+        if word in VALUE_OPTIONS:
+            next(words, None)
+        elif not word.startswith('-'):
+            return word
+    return None
+
+
+def retry_reason(result: CompletedProcess[bytes]) -> str:
+    """Tell whether a failed command is worth running again.
+
+    Args:
+        result (CompletedProcess[bytes]): result of kubectl or helm.
+
+    Returns:
+        str: the transient error found in stderr, None for successful commands and fatal errors.
+    """
+    if result.returncode == 0 or not result.stderr:
+        return None
+    stderr = result.stderr if isinstance(result.stderr, str) else result.stderr.decode('utf-8', errors='replace')
+    stderr = stderr.lower()
+    return next((error for error in RETRYABLE_ERRORS if error in stderr), None)
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter: the n-th retry waits a random time between 0 and
+    min(max_delay, base_delay * 2 ** n), so many clients failing together don't retry together.
+
+    Args:
+        attempts (int, optional): total number of runs, 1 disables the retries. Defaults to 4.
+        base_delay (float, optional): seconds of the first backoff window. Defaults to 1.
+        max_delay (float, optional): maximum seconds between two runs. Defaults to 30.
+        random (Callable[[], float], optional): random number in [0, 1). Defaults to random.random.
+        sleep (Callable[[float], None], optional): sleep function. Defaults to time.sleep.
+    """
+
+    def __init__(self, attempts: int = DEFAULT_ATTEMPTS, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY, random: Callable[[], float] = random.random,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.attempts = max(int(attempts), 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = random
+        self._sleep = sleep
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicy':
+        """Policy configured with $DP_RETRY_ATTEMPTS, $DP_RETRY_BASE_DELAY and $DP_RETRY_MAX_DELAY.
+        """
+        return cls(int(os.environ.get('DP_RETRY_ATTEMPTS', DEFAULT_ATTEMPTS)),
+                   float(os.environ.get('DP_RETRY_BASE_DELAY', DEFAULT_BASE_DELAY)),
+                   float(os.environ.get('DP_RETRY_MAX_DELAY', DEFAULT_MAX_DELAY)))
+
+    def delay(self, retry: int) -> float:
+        """Seconds to wait before the retry number `retry`, starting at 0.
+        """
+        return self._random() * min(self.max_delay, self.base_delay * 2 ** retry)
+
+    def run(self, call: Callable[[], CompletedProcess[bytes]], name: str = '') -> CompletedProcess[bytes]:
+        """Run a command until it succeeds, fails with a fatal error or runs out of attempts.
+
+        Args:
+            call (Callable[[], CompletedProcess[bytes]]): runs the command once.
+            name (str, optional): short name of the command for the messages, e.g. 'helm upgrade'.
+
+        Returns:
+            CompletedProcess[bytes]: result of the last run.
+        """
+        for retry in range(self.attempts):
+            result = call()
+            reason = retry_reason(result)
+            if reason is None or retry == self.attempts - 1:
+                return result
+            delay = self.delay(retry)
+            click.echo(f'{name or "command"} failed with "{reason}", retry {retry + 1}/{self.attempts - 1} '
+                       f'in {delay:.1f}s', err=True)
+            with get_tracer().span(f'retry {name}'.rstrip(), 'retry', reason=reason, retry=retry + 1):
+                self._sleep(delay)
+            stats.record(name, delay)
+        return result
+
+
+class RetryStats:
+    """Retries and backoff time of the whole dp command, shared by every thread.
+    """
+
+    def __init__(self):
+        self.retries = 0
+        self.backoff = 0.0
+        self.commands: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, delay: float) -> None:
+        with self._lock:
+            self.retries += 1
+            self.backoff += delay
+            self.commands[name] = self.commands.get(name, 0) + 1
+
+    def summary(self) -> str:
+        """One line with the retries of every command, empty when nothing was retried.
+        """
+        with self._lock:
+            if not self.retries:
+                return ''
+            commands = ', '.join(f'{name or "command"} x{count}' for name, count in
+                                 sorted(self.commands.items(), key=lambda item: -item[1]))
+            return f'{self.retries} retries after transient errors ({self.backoff:.1f}s of backoff): {commands}'
+
+
+stats = RetryStats()
+_local = threading.local()
+
+
+def current_policy() -> RetryPolicy:
+    """Policy of the running plan step, or the global one read from the environment.
+    """
+    return getattr(_local, 'policy', None) or RetryPolicy.from_env()
+
+
+@contextmanager
+def using(policy: RetryPolicy) -> Iterator[RetryPolicy]:
+    """Use a policy for the commands run by the current thread inside the block, e.g. in a single plan step.
+    """
+    previous = getattr(_local, 'policy', None)
+    _local.policy = policy
+    try:
+        yield policy
+    finally:
+        _local.policy = previous
+
+
+def run_with_retry(call: Callable[[], CompletedProcess[bytes]], name: str = '') -> CompletedProcess[bytes]:
+    return current_policy().run(call, name)
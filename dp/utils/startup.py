@@ -0,0 +1,128 @@
+"""Cold-start benchmark of the dp CLI, from source and from the PyInstaller binary.
+
+    python -m dp.utils.startup -n 20 -- flinkop --help
+    python -m dp.utils.startup --binary dist/dp --importtime -- kafkaop --help
+
+Every measurement is appended to a history file and compared with the previous one of the same command.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import click
+from os import path
+from pathlib import Path
+from . import perf
+
+DP_SCRIPT = path.join(str(Path(__file__).parent.parent), 'dp.py')
+HISTORY_FILE = os.environ.get('DP_STARTUP_HISTORY', path.join(str(Path.home()), '.cache', 'dp', 'startup.jsonl'))
+
+
+def measure(command: list, runs: int = 10, env: dict = None) -> dict:
+    """Run a command several times and return its wall-clock statistics.
+
+    Args:
+        command (list): command and arguments.
+        runs (int, optional): number of runs. Defaults to 10.
+        env (dict, optional): environment of the command. Defaults to the current one.
+
+    Raises:
+        SystemError: the command fails.
+
+    Returns:
+        dict: runs, min, median, p95 and max in milliseconds.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+        times.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise SystemError(result.stderr)
+    return summarize(times)
+
+
+def summarize(times: list[float]) -> dict:
+    ordered = sorted(times)
+    return {'runs': len(ordered), 'min_ms': round(ordered[0], 1), 'median_ms': round(statistics.median(ordered), 1),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+            'max_ms': round(ordered[-1], 1)}
+
+
+def previous_results(results: dict, history: list[dict]) -> dict:
+    """Latest measurement in the history of the same arguments, None when there is no such measurement.
+    """
+    for candidate in reversed(history):
+        if candidate.get('args') == results['args']:
+            return candidate
+    return None
+
+
+def compare(results: dict, previous: dict) -> dict:
+    """Percentage change of the median and p95 of every measured program against a previous measurement.
+    """
+    changes = {}
+    for program in ('source', 'binary'):
+        new, old = results.get(program) or {}, previous.get(program) or {}
+        program_changes = {key: round((new[key] - old[key]) / old[key] * 100, 1)
+                           for key in ('median_ms', 'p95_ms') if key in new and old.get(key)}
+        if program_changes:
+            changes[program] = program_changes
+    return changes
+
+
+def parse_importtime(stderr: str, top: int = 15) -> list[tuple[str, int]]:
+    """Slowest imports from the output of `python -X importtime`.
+
+    Args:
+        stderr (str): stderr of the interpreter.
+        top (int, optional): number of modules returned. Defaults to 15.
+
+    Returns:
+        list[tuple[str, int]]: module and cumulative import time in microseconds, slowest first.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        modules.append((parts[2].strip(), int(parts[1])))
+    return sorted(modules, key=lambda module: -module[1])[:top]
+
+
+@click.command()
+@click.option('--runs', '-n', default=10, type=int, help='Runs of every command')
+@click.option('--binary', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='PyInstaller binary measured besides the source')
+@click.option('--importtime', is_flag=True, help='Print the slowest imports of the source run')
+@click.option('--history', 'history_file', default=HISTORY_FILE, help='JSON lines file where the measurements are stored')
+@click.argument('args', nargs=-1)
+def main(runs: int, binary: str, importtime: bool, history_file: str, args: tuple):
+    """Measure the cold-start time of `dp ARGS`, by default `dp --help`."""
+    args = list(args) or ['--help']
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    results = {'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'args': args,
+               'source': measure([sys.executable, DP_SCRIPT, *args], runs, env)}
+    if binary is not None:
+        results['binary'] = measure([path.abspath(binary), *args], runs)
+    previous = previous_results(results, perf.load_history(history_file))
+    perf.append_history(results, history_file)
+    click.echo(json.dumps(results, indent=2))
+    if previous is not None:
+        click.echo('-------------------------------------------')
+        click.echo(f'Change against the measurement of {previous.get("time")} (%):')
+        click.echo(json.dumps(compare(results, previous), indent=2))
+        click.echo('-------------------------------------------')
+    if importtime:
+        result = subprocess.run([sys.executable, '-X', 'importtime', DP_SCRIPT, *args], stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True)
+        for module, microseconds in parse_importtime(result.stderr):
+            click.echo(f'{microseconds / 1000:8.1f} ms  {module}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+import asyncio
+import time
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+CHUNK_SIZE = 64 * 1024
+REPORT_INTERVAL = 5
+
+
+def generate_messages(message: str, count: int, key: str = None, separator: str = ':') -> Iterator[bytes]:
+    """Messages built on the fly, so the payload never lives in memory as a whole.
+
+    Args:
+        message (str): text of the messages, the message number is appended to it.
+        count (int): number of messages.
+        key (str, optional): key template, `{i}` is replaced with the message number, e.g. 'user-{i}'.
+        separator (str, optional): text between the key and the value. Defaults to ':'.
+
+    Returns:
+        Iterator[bytes]: newline terminated messages.
+    """
+    for i in range(1, count + 1):
+        line = f'{message} {i}\n'
+        if key is not None:
+            line = f'{key.format(i=i)}{separator}{line}'
+        yield bytes(line, 'utf-8')
+
+
+def read_messages(stream: BinaryIO) -> Iterator[bytes]:
+    """Messages read line by line from a file or the console, every line is a message.
+
+    Args:
+        stream (BinaryIO): file opened in binary mode.
+
+    Returns:
+        Iterator[bytes]: newline terminated messages, empty lines are skipped.
+    """
+    for line in stream:
+        if line.strip():
+            yield line if line.endswith(b'\n') else line + b'\n'
+
+
+class RateLimiter:
+    """Pace a producer so it never goes over a number of messages per second on average.
+
+    Args:
+        rate (float): maximum messages per second, None or 0 disables the limit.
+        clock (Callable[[], float], optional): monotonic clock. Defaults to time.monotonic.
+        sleep (Callable[[float], None], optional): sleep function. Defaults to time.sleep.
+    """
+
+    def __init__(self, rate: float = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate or None
+        self._clock = clock
+        self._sleep = sleep
+        self._start = None
+        self._sent = 0
+
+    def acquire(self, messages: int) -> None:
+        """Wait until `messages` more messages can be sent without going over the rate.
+        """
+        if self.rate is None:
+            return
+        if self._start is None:
+            self._start = self._clock()
+        self._sent += messages
+        ahead = self._sent / self.rate - (self._clock() - self._start)
+        if ahead > 0:
+            self._sleep(ahead)
+
+
+class Throughput:
+    """Count the messages and bytes sent and report the rate every few seconds.
+
+    Args:
+        report (Callable[[str], None], optional): receives the progress lines. Defaults to None (no progress).
+        interval (float, optional): seconds between progress lines. Defaults to 5.
+        clock (Callable[[], float], optional): monotonic clock. Defaults to time.monotonic.
+        action (str, optional): verb used in the progress lines. Defaults to 'sent'.
+    """
+
+    def __init__(self, report: Callable[[str], None] = None, interval: float = REPORT_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic, action: str = 'sent'):
+        self.report = report
+        self.interval = interval
+        self.action = action
+        self._clock = clock
+        self.start = clock()
+        self.messages = 0
+        self.bytes = 0
+        self._last_report = self.start
+
+    def add(self, messages: int, size: int) -> None:
+        self.messages += messages
+        self.bytes += size
+        now = self._clock()
+        if self.report is not None and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report(self.status(now))
+
+    def rate(self, now: float = None) -> float:
+        elapsed = (now or self._clock()) - self.start
+        return self.messages / elapsed if elapsed > 0 else 0.0
+
+    def byte_rate(self, now: float = None) -> float:
+        elapsed = (now or self._clock()) - self.start
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def status(self, now: float = None) -> str:
+        now = now or self._clock()
+        return (f'{self.messages} messages {self.action}, {self.rate(now):.0f} msgs/sec, '
+                f'{self.byte_rate(now) / 1024:.1f} KiB/sec')
+
+    def summary(self) -> str:
+        elapsed = self._clock() - self.start
+        return (f'{self.messages} messages ({self.bytes / 1024 / 1024:.2f} MB) in {elapsed:.1f}s, '
+                f'{self.rate():.0f} msgs/sec')
+
+
+def chunk_messages(messages: Iterable[bytes], chunk_size: int = CHUNK_SIZE, limiter: RateLimiter = None,
+                   meter: Throughput = None) -> Iterator[bytes]:
+    """Group messages in chunks written to the producer stdin at once, only one chunk is in memory at a time.
+
+    With a rate limit the chunks also hold at most a tenth of a second of messages, so the pace stays smooth.
+
+    Args:
+        messages (Iterable[bytes]): newline terminated messages.
+        chunk_size (int, optional): maximum size of a chunk in bytes. Defaults to 64 KiB.
+        limiter (RateLimiter, optional): rate limit applied before every chunk. Defaults to None.
+        meter (Throughput, optional): counts the messages of every chunk. Defaults to None.
+
+    Returns:
+        Iterator[bytes]: chunks of whole messages.
+    """
+    max_messages = max(int(limiter.rate / 10), 1) if limiter is not None and limiter.rate else None
+    chunk = []
+    size = 0
+    for message in messages:
+        chunk.append(message)
+        size += len(message)
+        if size >= chunk_size or (max_messages is not None and len(chunk) >= max_messages):
+            yield _flush(chunk, size, limiter, meter)
+            chunk = []
+            size = 0
+    if chunk:
+        yield _flush(chunk, size, limiter, meter)
+
+
+def _flush(chunk: list, size: int, limiter: RateLimiter, meter: Throughput) -> bytes:
+    if limiter is not None:
+        limiter.acquire(len(chunk))
+    if meter is not None:
+        meter.add(len(chunk), size)
+    return b''.join(chunk)
+
+
+class LineSink:
+    """Write the lines of a process output to a file in big blocks, out of the event loop.
+
+    `write` is meant to be an `on_stdout` callback of the executor: while a block is being written to disk the
+    process output is not read, so a slow disk slows the process down instead of filling the memory.
+
+    Args:
+        stream (BinaryIO): file opened in binary mode.
+        transform (Callable[[bytes], bytes], optional): converts every line before it is written, e.g. to JSON.
+        meter (Throughput, optional): counts the lines. Defaults to None.
+        buffer_size (int, optional): bytes kept before a block is written. Defaults to 64 KiB.
+        flush_each_block (bool, optional): flush the stream after every block, so the lines written to a console
+            show up at once instead of when its buffer is full. Defaults to False.
+    """
+
+    def __init__(self, stream: BinaryIO, transform: Callable[[bytes], bytes] = None, meter: Throughput = None,
+                 buffer_size: int = CHUNK_SIZE, flush_each_block: bool = False):
+        self.stream = stream
+        self.transform = transform
+        self.meter = meter
+        self.buffer_size = buffer_size
+        self.flush_each_block = flush_each_block
+        self._buffer = []
+        self._size = 0
+
+    async def write(self, line: bytes) -> None:
+        if self.meter is not None:
+            self.meter.add(1, len(line))
+        if self.transform is not None:
+            line = self.transform(line)
+        self._buffer.append(line)
+        self._size += len(line)
+        if self._size >= self.buffer_size:
+            block = self._take()
+            await asyncio.to_thread(self._write_block, block)
+
+    def _write_block(self, block: bytes) -> None:
+        self.stream.write(block)
+        if self.flush_each_block:
+            self.stream.flush()
+
+    def flush(self) -> None:
+        """Write the lines still in the buffer, call it once the process has finished.
+        """
+        if self._buffer:
+            self.stream.write(self._take())
+        self.stream.flush()
+
+    def _take(self) -> bytes:
+        block = b''.join(self._buffer)
+        self._buffer = []
+        self._size = 0
+        return block
@@ -1,10 +1,22 @@
 #from pathlib import Path
 #import pkg_resources
-import time
 import click
-from subprocess import CompletedProcess, run, Popen, PIPE
+import hashlib
+import json
+from functools import partial
+from subprocess import CompletedProcess
 from os import path
 from pathlib import Path
+from .executor import get_executor, write_line
+from . import constants as c
+from . import readiness
+from . import helm_cache
+from . import render
+from . import kube_api
+from . import retry
+from .tracing import command_name
+
+FINGERPRINT_PREFIX = 'dp-fingerprint='
 
 def create_ns(namespace: str)-> CompletedProcess[bytes]:
     """ Command that create a new namespace in kubernetes
@@ -20,20 +32,29 @@ def create_ns(namespace: str)-> CompletedProcess[bytes]:
     """
     
     create_ns = ['kubectl', 'create', 'ns', namespace]
-    result = __run_subprocess(create_ns)
+    if kube_api.enabled():
+        result = kube_api.call(create_ns, lambda client: client.create_namespace(namespace))
+    else:
+        result = __run_subprocess(create_ns)
     return __print_output(result=result,ok_msg=[f'{namespace} namespace created'], fail_msg=[f'Failed creating the namespace: {namespace}'])
 
-def delete_ns(namespace: str) -> CompletedProcess[bytes]:
+def delete_ns(namespace: str, wait: bool = True) -> CompletedProcess[bytes]:
     """Command that delete a namespace in kubernetes
 
     Args:
         namespace (str): kubernetes namespace
+        wait (bool, optional): wait in kubectl until the namespace is gone. Defaults to True.
 
     Returns:
         CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
     """
     delete_ns = ['kubectl', 'delete', 'ns', namespace]
-    result = __run_subprocess(delete_ns)
+    if not wait:
+        delete_ns += ['--wait=false']
+    if kube_api.enabled():
+        result = kube_api.call(delete_ns, lambda client: client.delete('namespaces', namespace))
+    else:
+        result = __run_subprocess(delete_ns)
     return __print_output(result=result,ok_msg=[f'{namespace} namespace deleted'], fail_msg=[f'Failed deleting the namespace: {namespace}'])
 
 def update_helm():
@@ -58,7 +79,12 @@ def add_repo(repo_name: str, repo_url: str) -> CompletedProcess[bytes]:
     """
     helm_command = ['helm', 'repo', 'add', repo_name, repo_url]
     result = __run_subprocess(helm_command)
-    return __print_output(result=result,ok_msg=[f'{repo_name} added'], fail_msg=[f'Failed adding the repository {repo_name}'])
+    result = __print_output(result=result,ok_msg=[f'{repo_name} added'],
+                            fail_msg=[f'Failed adding the repository {repo_name}'])
+    cache = helm_cache.get_cache()
+    if cache is not None:
+        cache.register_repo(repo_name, repo_url)
+    return result
 
 def delete_repo(repo_name: str) -> CompletedProcess[bytes]:
     """Command that remove a repository in helm
@@ -74,30 +100,124 @@ def delete_repo(repo_name: str) -> CompletedProcess[bytes]:
     return __print_output(result=result,ok_msg=[f'{repo_name} removed'], fail_msg=[f'Failed removing the repository {repo_name}'])
 
 
-def install_repo(namespace: str, repo_name:str, operator_name: str, values_yaml: str = None) -> CompletedProcess[bytes]:
+def install_repo(namespace: str, repo_name:str, operator_name: str, values_yaml: str = None, version: str = None,
+                 values: dict = None) -> CompletedProcess[bytes]:
     """Command for install a repo added in Helm
 
+    The chart is installed from the local helm cache when the repo was added with `add_repo`, so the tarball is
+    only downloaded the first time. The install is an upgrade-or-install: the chart and values fingerprint is stored
+    in the release description and helm is not called at all when the deployed release has the same fingerprint.
+    Without a cached chart or a version, the latest version is read with `helm show chart`, and the release is
+    always upgraded when it can't be resolved.
+
     Args:
         namespace (str): name of the namespace in kubernetes
         repo_name (str): name of the repo in helm
         operator_name (str): operator that you want to install in helm
+        values_yaml (str, optional): values file from the resources folder
+        version (str, optional): chart version. Defaults to the latest version
+        values (dict, optional): values rendered in memory and sent to helm through stdin, used instead of values_yaml
 
     Raises:
         SystemError: Error if the repo install fails
     Returns:
         CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
     """
-    if values_yaml is not None:
+    cache = helm_cache.get_cache()
+    chart = cache.resolve(operator_name, version) if cache is not None else None
+    if chart is not None and not path.exists(chart):
+        # evicted by another dp process sharing the cache, helm downloads the chart from the repo
+        chart = None
+    install_command = ['helm', '-n', namespace, 'upgrade', '--install']
+    values_text = None
+    if values is not None:
+        values_text = render.to_yaml(values)
+        install_command += ['-f', '-']
+    elif values_yaml is not None:
         absolute = str(Path(__file__).parent.parent)
         values_path = path.join(absolute, 'resources', values_yaml)
-        install_command = ['helm', '-n', namespace, 'install', '-f',
-                           values_path , repo_name, operator_name]
+        install_command += ['-f', values_path]
+        if path.exists(values_path):
+            with open(values_path) as f:
+                values_text = f.read()
+    if chart is not None:
+        # cached charts are stored under their content digest
+        chart_id = path.basename(chart)
+        install_command += [repo_name, chart]
     else:
-        install_command = ['helm', '-n', namespace, 'install', repo_name, operator_name]
-
-    result = __run_subprocess(install_command)
+        # the latest version is resolved first, so a new release of the chart changes the fingerprint
+        version = version or chart_version(operator_name)
+        chart_id = f'{operator_name}:{version}' if version is not None else None
+        install_command += [repo_name, operator_name]
+        if version is not None:
+            install_command += ['--version', version]
+
+    if chart_id is not None:
+        fingerprint = release_fingerprint(chart_id, bytes(values_text or '', 'utf-8'))
+        if deployed_fingerprint(namespace, repo_name) == fingerprint:
+            click.echo('-------------------------------------------')
+            click.echo(f'{repo_name} is up to date, nothing to install')
+            click.echo('-------------------------------------------')
+            return CompletedProcess(install_command, 0, bytes(f'{repo_name} is up to date\n', 'utf-8'), b'')
+        install_command += ['--description', f'{FINGERPRINT_PREFIX}{fingerprint}']
+    result = __run_subprocess(install_command, input=values_text if values is not None else None)
     return __print_output(result=result,ok_msg=[f'{repo_name} installed'], fail_msg=[f'Failed instaling the repository {repo_name}'])
 
+def release_fingerprint(chart_id: str, values: bytes = b'') -> str:
+    """Fingerprint of a helm release, changes when the chart or the values change
+
+    Args:
+        chart_id (str): chart digest, or chart reference and version
+        values (bytes, optional): content of the values file
+
+    Returns:
+        str: sha256 hex digest
+    """
+    digest = hashlib.sha256(bytes(chart_id, 'utf-8'))
+    digest.update(b'\0')
+    digest.update(values)
+    return digest.hexdigest()
+
+def chart_version(operator_name: str) -> str:
+    """Latest version of a chart in the repo index of helm
+
+    Args:
+        operator_name (str): chart reference, e.g. 'strimzi/strimzi-kafka-operator'
+
+    Returns:
+        str: chart version, or None when helm can't show the chart
+    """
+    result = __run_subprocess(['helm', 'show', 'chart', operator_name])
+    if result.returncode != 0:
+        return None
+    stdout = result.stdout.decode('utf-8', errors='replace') if isinstance(result.stdout, bytes) else result.stdout or ''
+    for line in stdout.splitlines():
+        if line.startswith('version:'):
+            return line.split(':', 1)[1].strip().strip('"\'') or None
+    return None
+
+def deployed_fingerprint(namespace: str, release: str) -> str:
+    """Fingerprint stored by `install_repo` in a deployed release
+
+    Args:
+        namespace (str): namespace of the release
+        release (str): name of the release
+
+    Returns:
+        str: fingerprint, or None when the release doesn't exist, is not deployed or was not installed by dp
+    """
+    result = __run_subprocess(['helm', 'status', release, '-n', namespace, '-o', 'json'])
+    if result.returncode != 0:
+        return None
+    try:
+        info = json.loads(result.stdout).get('info', {})
+    except (ValueError, TypeError, AttributeError):
+        return None
+    description = info.get('description') or ''
+    if info.get('status') != 'deployed' or not description.startswith(FINGERPRINT_PREFIX):
+        return None
+    return description[len(FINGERPRINT_PREFIX):]
+
 def uninstall_repo(namespace: str, operator_name: str) -> CompletedProcess[bytes]:
     """Command for uninstall all teh components intalled by a repo helm
     
@@ -122,18 +242,67 @@ def run_kubectl_apply(resource_yaml: str, namespace: str = None) -> CompletedPro
     Returns:
         CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
     """
+    absolute = str(Path(__file__).parent.parent)
+    resource_path = path.join(absolute, 'resources', resource_yaml)
+    command = ["kubectl", "apply", '-f', resource_path]
     if namespace is not None:
-        absolute = str(Path(__file__).parent.parent)
-        resource_path = path.join(absolute, 'resources', resource_yaml)
-        command = ["kubectl", "apply", '-f', resource_path, "--namespace", namespace]
-        result = __run_subprocess(command)
-        return __print_output(result=result,ok_msg=[f' Applying the file {resource_yaml}'], fail_msg=[f'Failed applying the file {resource_yaml}',f'Error: {result.stderr}'])
+        command += ["--namespace", namespace]
+    if kube_api.enabled():
+        result = kube_api.call(command, lambda client: client.apply(render.load_documents(resource_yaml), namespace))
     else:
-        absolute = str(Path(__file__).parent.parent)
-        resource_path = path.join(absolute, 'resources', resource_yaml)
-        command = ["kubectl", "apply", '-f', resource_path]
         result = __run_subprocess(command)
-        return __print_output(result=result,ok_msg=[f' Applying the file {resource_yaml}'], fail_msg=[f'Failed applying the file {resource_yaml}',f'Error: {result.stderr}'])
+    return __print_output(result=result,ok_msg=[f' Applying the file {resource_yaml}'],
+                   fail_msg=[f'Failed applying the file {resource_yaml}',f'Error: {result.stderr}'])
+
+def run_kubectl_apply_manifest(manifest: dict | list[dict], namespace: str = None,
+                               server_side: bool = False) -> CompletedProcess[bytes]:
+    """Helper function to apply manifests rendered in memory, they are sent to kubectl through stdin
+
+    Args:
+        manifest (dict | list[dict]): kubernetes resource or list of resources
+        namespace (str, optional): namespace where the resources are applied
+        server_side (bool, optional): use server-side apply. Defaults to False.
+
+    Returns:
+        CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
+    """
+    documents = manifest if isinstance(manifest, list) else [manifest]
+    names = ', '.join(f"{doc.get('kind')} {doc.get('metadata', {}).get('name')}" for doc in documents[:5])
+    if len(documents) > 5:
+        names += f' and {len(documents) - 5} more'
+    command = ["kubectl", "apply", '-f', '-']
+    if server_side:
+        command += ['--server-side']
+    if namespace is not None:
+        command += ["--namespace", namespace]
+    if kube_api.enabled():
+        result = kube_api.call(command, lambda client: client.apply(documents, namespace), input=render.to_yaml(documents))
+    else:
+        result = __run_subprocess(command, input=render.to_yaml(documents))
+    return __print_output(result=result,ok_msg=[f' Applying {names}'],
+                   fail_msg=[f'Failed applying {names}',f'Error: {result.stderr}'])
+
+def run_kubectl_patch(resource_type: str, resource_name: str, namespace: str, patch: dict) -> CompletedProcess[bytes]:
+    """Helper function to change some fields of a resource with a JSON merge patch.
+
+    Args:
+        resource_type (str): kind of resource, e.g. kafka
+        resource_name (str): name of the resource
+        namespace (str): namespace where is the resource
+        patch (dict): fields to change, e.g. {'metadata': {'annotations': {'strimzi.io/rebalance': 'approve'}}}
+
+    Returns:
+        CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
+    """
+    patch_command = ["kubectl", "patch", resource_type, resource_name, "--namespace", namespace, "--type", "merge",
+                     "-p", json.dumps(patch)]
+    if kube_api.enabled():
+        result = kube_api.call(patch_command, lambda client: client.patch(resource_type, resource_name, patch, namespace))
+    else:
+        result = __run_subprocess(patch_command)
+    return __print_output(result=result,ok_msg=[f' {resource_type} {resource_name} in {namespace} patched'],
+                   fail_msg=[f'Failed patching the {resource_type} {resource_name} in namespace {namespace}',
+                             f'Error: {result.stderr}'])
 
 def run_kubectl_delete_with_res(resource_type: str, namespace: str, resource_name: str = "--all") -> CompletedProcess[bytes]:
     """Helper function to run kubectl delete commands and handle errors.
@@ -147,10 +316,128 @@ def run_kubectl_delete_with_res(resource_type: str, namespace: str, resource_nam
         CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
     """
     delete_command = ["kubectl", "delete", resource_type, resource_name, "--namespace", namespace]
-    result = __run_subprocess(delete_command)
+    if kube_api.enabled():
+        name = None if resource_name == "--all" else resource_name
+        result = kube_api.call(delete_command, lambda client: client.delete(resource_type, name, namespace))
+    else:
+        result = __run_subprocess(delete_command)
     return __print_output(result=result,ok_msg=[f' {resource_type} {resource_name} in {namespace} deleted'], 
                    fail_msg=[f'Failed deleting the {resource_type} {resource_name} in namespace {namespace}',f'Error: {result.stderr}'])
  
+def run_kubectl_delete_names(resource_type: str, namespace: str, names: list[str],
+                             wait: bool = False) -> CompletedProcess[bytes]:
+    """Helper function to delete several resources of the same kind with a single kubectl call.
+
+    Args:
+        resource_type (str): kind of resource that you want to delete
+        namespace (str): namespace where are the resources
+        names (list[str]): names of the resources, the ones already deleted are ignored
+        wait (bool, optional): wait in kubectl until the finalizers are cleared. Defaults to False.
+
+    Returns:
+        CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
+    """
+    delete_command = ["kubectl", "delete", resource_type, *names, "--namespace", namespace,
+                      "--ignore-not-found", f"--wait={str(wait).lower()}"]
+    result = __run_subprocess(delete_command)
+    return __print_output(result=result,ok_msg=[f' {len(names)} {resource_type} in {namespace} deleted'],
+                   fail_msg=[f'Failed deleting {len(names)} {resource_type} in namespace {namespace}',
+                             f'Error: {result.stderr}'])
+
+def list_resource_names(resource_type: str, namespace: str) -> list[str]:
+    """Names of the resources of a kind in a namespace.
+
+    Args:
+        resource_type (str): kind of resource, e.g. kafkatopic
+        namespace (str): namespace where are the resources
+
+    Raises:
+        SystemError: return a SystemError if the resources can't be listed
+
+    Returns:
+        list[str]: names of the resources
+    """
+    command = ["kubectl", "get", resource_type, "-n", namespace, "-o", "jsonpath={.items[*].metadata.name}"]
+    if kube_api.enabled():
+        result = kube_api.call(command, lambda client: ' '.join(client.list_names(resource_type, namespace)))
+    else:
+        result = __run_subprocess(command)
+    if result.returncode != 0:
+        raise SystemError(result.stderr)
+    return result.stdout.decode('utf-8').split()
+
+def list_resources(resource_type: str, namespace: str = None, selector: str = None) -> list[dict]:
+    """Resources of a kind as dicts, like `kubectl get -o json`.
+
+    Args:
+        resource_type (str): kind of resource, e.g. node
+        namespace (str, optional): namespace where are the resources. Defaults to None for cluster scoped kinds.
+        selector (str, optional): label selector, e.g. 'scylla.scylladb.com/node-type=scylla'
+
+    Raises:
+        SystemError: return a SystemError if the resources can't be listed
+
+    Returns:
+        list[dict]: the resources
+    """
+    command = ["kubectl", "get", resource_type, "-o", "json"]
+    if namespace is not None:
+        command += ["-n", namespace]
+    if selector is not None:
+        command += ["-l", selector]
+    if kube_api.enabled():
+        result = kube_api.call(command, lambda client: json.dumps(
+            {'items': client.list_items(resource_type, namespace, selector)}))
+    else:
+        result = __run_subprocess(command)
+    if result.returncode != 0:
+        raise SystemError(result.stderr)
+    return json.loads(result.stdout).get('items') or []
+
+def get_resource(resource_type: str, resource_name: str, namespace: str) -> dict:
+    """A resource as a dict, like `kubectl get -o json`.
+
+    Args:
+        resource_type (str): kind of resource, e.g. kafkarebalance
+        resource_name (str): name of the resource
+        namespace (str): namespace where is the resource
+
+    Raises:
+        SystemError: return a SystemError if the resource can't be read
+
+    Returns:
+        dict: the resource, None when it does not exist
+    """
+    command = ["kubectl", "get", resource_type, resource_name, "-n", namespace, "-o", "json"]
+    if kube_api.enabled():
+        result = kube_api.call(command, lambda client: json.dumps(client.get(resource_type, resource_name, namespace)))
+    else:
+        result = __run_subprocess(command)
+    if result.returncode != 0:
+        if '(NotFound)' in str(result.stderr):
+            return None
+        raise SystemError(result.stderr)
+    return json.loads(result.stdout)
+
+def run_kubectl_delete_kinds(resource_types: list[str], namespace: str, force: bool = False) -> CompletedProcess[bytes]:
+    """Helper function to delete every resource of several kinds in a namespace with a single kubectl call.
+
+    Args:
+        resource_types (list[str]): kinds of resource that you want to delete, e.g. ['pod', 'pvc']
+        namespace (str): namespace where are the resources
+        force (bool, optional): skip the graceful termination of the pods. Defaults to False.
+
+    Returns:
+        CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
+    """
+    kinds = ','.join(resource_types)
+    delete_command = ["kubectl", "delete", kinds, "--all", "--namespace", namespace, "--ignore-not-found", "--wait=false"]
+    if force:
+        delete_command += ["--grace-period=0", "--force"]
+    result = __run_subprocess(delete_command)
+    return __print_output(result=result,ok_msg=[f' {kinds} in {namespace} deleted'],
+                   fail_msg=[f'Failed deleting {kinds} in namespace {namespace}',f'Error: {result.stderr}'])
+
 def run_kubectl_delete(resource_yaml:str, namespace: str = None) -> CompletedProcess[bytes]:
     """Helper function to run kubectl delete commands and handle errors.
 
@@ -189,7 +476,7 @@ def run_helm_revision(namespace: str) -> CompletedProcess[bytes]:
     return __print_output(result=result, ok_msg=[result.stdout], fail_msg=[f'Failed'])
 
 def apply_cert_manager():
-    """install the cert manager in case it is not installed.
+    """install the cert manager in case it is not installed and wait until its deployments, CRDs and webhook are ready.
     """
     command = ['kubectl', 'get', 'pods', '-n', 'cert-manager']
     result = __run_subprocess(commands=command)
@@ -201,48 +488,54 @@ def apply_cert_manager():
         click.echo("-------------------------------------------")
         click.echo("Waiting for cert-manager being up and running.")
         click.echo("-------------------------------------------")
-        time.sleep(120)
     else:
         click.echo('-------------------------------------------')
         click.echo('cert-manager already installed')
         click.echo('-------------------------------------------')
+    conditions = [readiness.deployment(name, c.CERT_MANAGER_NS) for name in c.CERT_MANAGER_DEPLOYMENTS]
+    conditions += [readiness.crd(name) for name in c.CERT_MANAGER_CRDS]
+    conditions.append(readiness.webhook(c.CERT_MANAGER_WEBHOOK))
+    readiness.wait_for(conditions)
 
 def __run_subprocess(commands: list, input: str = None, capture: bool = True) -> CompletedProcess[bytes]:
     """run a subprocess in the operating system
 
+    The command is executed by the shared asyncio executor, so calls coming from different threads run concurrently
+    up to the executor worker limit. Transient failures (API server overloaded, network, webhooks not ready yet)
+    of kubectl and helm control plane calls are retried with the policy of `retry.current_policy`; `kubectl exec`
+    runs only once, so the producers and benchmarks it starts are not repeated.
+
     Args:
         commands (list): list of command to run in the operating system.
+        input (str, optional): text sent to the stdin of the command.
+        capture (bool, optional): keep stdout and stderr in the result. Defaults to True.
 
     Returns:
         CompletedProcess[bytes]: return a class that contains some fields: args, returncode, stderr, stdout
     """
-    #This block if else is to check if the run command exectued by the redpanda prodcuce message function. This function send a message in input parameter.
-    if input == None:
-        result = run(commands, shell=True, capture_output=capture)
-    else:
-        result = run(commands, shell=True, capture_output=capture, input=bytes(input,'utf-8'))
-
-    return result
+    run = partial(get_executor().run_sync, commands, input=input, capture=capture)
+    if not retry.retryable_command(commands):
+        return run()
+    return retry.run_with_retry(run, command_name(commands))
 
 def __run_Popen(commands: list, text=True) -> None:
-    """run a Popen subprocess in the operating system
+    """run a subprocess in the operating system streaming its output to the console
+
+    stdout and stderr are drained at the same time, so the process never blocks on a full pipe.
 
     Args:
         commands (list): list of command to run in the operating system.
-        text (boolean): It specifies whether the input and output streams of the process should be text (True). False to handle inputs and outputs as byte sequences.
+        text (boolean): It specifies whether the output lines are printed as text (True) or as byte sequences (False).
 
     """
-    process = Popen(commands, stdout=PIPE, stderr=PIPE, text=text)
-    try:
-        while True:
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
-                break
-            if output:
-                print(output.strip())
-    finally:
-        process.stdout.close()
-        process.stderr.close()
+    on_stdout = __echo_text if text else __echo_bytes
+    get_executor().run_sync(commands, capture=False, on_stdout=on_stdout, on_stderr=partial(write_line, err=True))
+
+def __echo_text(line: bytes) -> None:
+    click.echo(line.decode('utf-8', errors='replace').rstrip())
+
+def __echo_bytes(line: bytes) -> None:
+    click.echo(line.rstrip())
  
 
 def __print_output(result: CompletedProcess[bytes], ok_msg: list[str], fail_msg: list[str]) -> CompletedProcess[bytes]:
@@ -0,0 +1,112 @@
+import json
+import re
+import click
+from . import readiness
+from . import subprocess_com as utils
+from .executor import get_executor
+
+DEFAULT_TIMEOUT = 300
+NAMESPACE_LABEL = 'kubernetes.io/metadata.name'
+# conditions set by the namespace controller while it can't finish the deletion
+NAMESPACE_CONDITIONS = ('NamespaceContentRemaining', 'NamespaceFinalizersRemaining', 'NamespaceDeletionDiscoveryFailure',
+                        'NamespaceDeletionContentFailure', 'NamespaceDeletionGroupVersionParsingFailure')
+REMAINING_PATTERN = re.compile(r'([\w.-]+) has \d+ resource instances')
+
+
+def delete_namespace(namespace: str, timeout: float = DEFAULT_TIMEOUT, fast: bool = False,
+                     deadline: readiness.Deadline = None) -> None:
+    """Delete a namespace and wait until the namespace controller has removed everything inside it.
+
+    The delete returns at once and a single watch waits for the namespace to disappear. When it is still
+    terminating at the deadline, the resources blocking it and their finalizers are reported.
+
+    Args:
+        namespace (str): kubernetes namespace.
+        timeout (float, optional): seconds to wait until the namespace is gone. Defaults to 300.
+        fast (bool, optional): kill the pods without graceful termination, for throwaway clusters. Defaults to False.
+        deadline (readiness.Deadline, optional): deadline shared with other waits. Defaults to now plus the timeout.
+
+    Raises:
+        SystemError: the namespace is still terminating at the deadline.
+    """
+    deadline = deadline or readiness.Deadline(timeout)
+    utils.delete_ns(namespace, wait=False)
+    if fast:
+        # the namespace is terminating, so the controllers can't create the pods again
+        utils.run_kubectl_delete_kinds(['pod'], namespace, force=True)
+    try:
+        readiness.wait_for_deleted('namespace', [namespace], namespace, deadline=deadline,
+                                   selector=f'{NAMESPACE_LABEL}={namespace}')
+    except readiness.WaitTimeout:
+        click.echo('-------------------------------------------')
+        click.echo(f'Namespace {namespace} is still terminating')
+        for line in stuck_resources(namespace):
+            click.echo(f'  {line}')
+        click.echo('Resources are usually stuck when the operator owning their finalizers was removed first, remove them with')
+        click.echo(f'  kubectl patch <kind> <name> -n {namespace} --type merge -p \'{{"metadata":{{"finalizers":null}}}}\'')
+        click.echo('-------------------------------------------')
+        raise SystemError(f'namespace {namespace} not deleted after {deadline.seconds:.0f}s')
+
+
+def delete_kinds(namespace: str, kinds: list[str], fast: bool = False) -> None:
+    """Delete every resource of several kinds with one kubectl call, without waiting for them.
+    """
+    utils.run_kubectl_delete_kinds(kinds, namespace, force=fast)
+
+
+def stuck_resources(namespace: str) -> list[str]:
+    """Describe why a namespace is still terminating: the namespace conditions and the resources with finalizers.
+
+    Args:
+        namespace (str): terminating namespace.
+
+    Returns:
+        list[str]: lines of the report, empty when the namespace is gone.
+    """
+    executor = get_executor()
+    result = executor.run_sync(['kubectl', 'get', 'namespace', namespace, '--output', 'json'])
+    if result.returncode != 0:
+        return []
+    resource = json.loads(result.stdout)
+    lines = namespace_report(resource)
+    types = remaining_types(resource)
+    if types:
+        result = executor.run_sync(['kubectl', 'get', ','.join(types), '--namespace', namespace, '--output', 'json'])
+        if result.returncode == 0:
+            lines += finalizer_holders(json.loads(result.stdout).get('items') or [])
+    return lines
+
+
+def namespace_report(resource: dict) -> list[str]:
+    """Messages of the namespace conditions explaining why the deletion is not finished.
+    """
+    return [condition['message'] for condition in resource.get('status', {}).get('conditions') or []
+            if condition.get('type') in NAMESPACE_CONDITIONS and condition.get('status') == 'True'
+            and condition.get('message')]
+
+
+def remaining_types(resource: dict) -> list[str]:
+    """Resource types still in a terminating namespace, e.g. ['kafkatopics.kafka.strimzi.io', 'pods'].
+    """
+    for condition in resource.get('status', {}).get('conditions') or []:
+        if condition.get('type') == 'NamespaceContentRemaining' and condition.get('status') == 'True':
+            return [name.rstrip('.') for name in REMAINING_PATTERN.findall(condition.get('message', ''))]
+    return []
+
+
+def finalizer_holders(items: list[dict], limit: int = 20) -> list[str]:
+    """Resources kept by finalizers, as `kind/name (finalizers: ...)` lines.
+
+    Args:
+        items (list[dict]): kubernetes resources.
+        limit (int, optional): maximum number of resources listed. Defaults to 20.
+
+    Returns:
+        list[str]: one line per resource with finalizers.
+    """
+    holders = [f"{item.get('kind', '').lower()}/{item['metadata']['name']} "
+               f"(finalizers: {', '.join(item['metadata']['finalizers'])})"
+               for item in items if item.get('metadata', {}).get('finalizers')]
+    if len(holders) > limit:
+        holders = holders[:limit] + [f'and {len(holders) - limit} more']
+    return holders
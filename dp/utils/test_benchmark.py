@@ -0,0 +1,16 @@
+from unittest import TestCase, main
+from .benchmark import split
+
+
+class TestSplit(TestCase):
+    def test_first_clients_take_the_remainder(self):
+        self.assertEqual(split(10, 3), [4, 3, 3])
+        self.assertEqual(split(2, 4), [1, 1, 0, 0])
+
+    def test_no_clients(self):
+        with self.assertRaises(ValueError):
+            split(100, 0)
+
+
+if __name__ == '__main__':
+    main()
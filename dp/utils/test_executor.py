@@ -0,0 +1,112 @@
+import asyncio
+import sys
+import time
+from functools import partial
+from subprocess import TimeoutExpired
+from unittest import TestCase, mock, main
+from .executor import CommandExecutor, run_parallel, with_context
+
+PYTHON = sys.executable
+
+
+class TestCommandExecutor(TestCase):
+    def setUp(self):
+        self.executor = CommandExecutor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.close()
+
+    def test_run_sync_captures_output(self):
+        result = self.executor.run_sync([PYTHON, '-c', 'import sys; print("out"); print("err", file=sys.stderr)'])
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.strip(), b'out')
+        self.assertEqual(result.stderr.strip(), b'err')
+
+    def test_non_zero_exit_code(self):
+        result = self.executor.run_sync([PYTHON, '-c', 'import sys; sys.exit(3)'])
+        self.assertEqual(result.returncode, 3)
+
+    def test_input_is_sent_to_stdin(self):
+        result = self.executor.run_sync([PYTHON, '-c', 'import sys; print(sys.stdin.read().upper())'], input='message')
+        self.assertEqual(result.stdout.strip(), b'MESSAGE')
+
+    def test_iterable_input_is_streamed(self):
+        produced = []
+
+        def chunks():
+            for i in range(1000):
+                produced.append(i)
+                yield f'{i}\n' if i % 2 else bytes(f'{i}\n', 'utf-8')
+
+        result = self.executor.run_sync([PYTHON, '-c', 'import sys; print(sum(1 for _ in sys.stdin))'], input=chunks())
+        self.assertEqual(result.stdout.strip(), b'1000')
+        self.assertEqual(len(produced), 1000)
+
+    def test_streaming_callbacks_receive_lines(self):
+        stdout, stderr = [], []
+        script = 'import sys\nfor i in range(3):\n    print(i)\n    print("e", i, file=sys.stderr)'
+        self.executor.run_sync([PYTHON, '-c', script], on_stdout=stdout.append, on_stderr=stderr.append)
+        self.assertEqual(stdout, [b'0\n', b'1\n', b'2\n'])
+        self.assertEqual(len(stderr), 3)
+
+    def test_async_callbacks_are_awaited(self):
+        lines = []
+
+        async def slow_sink(line: bytes):
+            await asyncio.sleep(0.01)
+            lines.append(line)
+
+        self.executor.run_sync([PYTHON, '-c', 'for i in range(5): print(i)'], capture=False, on_stdout=slow_sink)
+        self.assertEqual(lines, [b'0\n', b'1\n', b'2\n', b'3\n', b'4\n'])
+
+    def test_chatty_stderr_does_not_block(self):
+        script = 'import sys\nsys.stderr.write("x" * 1024 * 1024)\nprint("done")'
+        result = self.executor.run_sync([PYTHON, '-c', script], timeout=30)
+        self.assertEqual(result.stdout.strip(), b'done')
+        self.assertEqual(len(result.stderr), 1024 * 1024)
+
+    def test_timeout_kills_the_process(self):
+        with self.assertRaises(TimeoutExpired):
+            self.executor.run_sync([PYTHON, '-c', 'import time; time.sleep(30)'], timeout=0.5)
+
+    def test_worker_limit(self):
+        start = time.monotonic()
+        futures = [self.executor.submit(self.executor.run([PYTHON, '-c', 'import time; time.sleep(0.5)']))
+                   for _ in range(4)]
+        for future in futures:
+            future.result()
+        self.assertGreaterEqual(time.monotonic() - start, 1.0)
+
+    def test_run_all_keeps_order(self):
+        commands = [[PYTHON, '-c', f'print({i})'] for i in range(5)]
+        results = self.executor.submit(self.executor.run_all(commands)).result()
+        self.assertEqual([result.stdout.strip() for result in results], [b'0', b'1', b'2', b'3', b'4'])
+
+
+class TestContext(TestCase):
+    def test_context_option_is_added(self):
+        self.assertEqual(with_context(['kubectl', 'get', 'pods'], 'dev'), ['kubectl', '--context', 'dev', 'get', 'pods'])
+        self.assertEqual(with_context(['/usr/bin/helm', 'list'], 'dev'), ['/usr/bin/helm', '--kube-context', 'dev', 'list'])
+
+    def test_other_commands_are_unchanged(self):
+        self.assertEqual(with_context(['rpk', 'topic', 'list'], 'dev'), ['rpk', 'topic', 'list'])
+        self.assertEqual(with_context(['kubectl', '--context=prod', 'get', 'pods'], 'dev'),
+                         ['kubectl', '--context=prod', 'get', 'pods'])
+        with mock.patch.dict('os.environ', {}, clear=True):
+            self.assertEqual(with_context(['kubectl', 'get', 'pods']), ['kubectl', 'get', 'pods'])
+
+
+class TestRunParallel(TestCase):
+    def test_results_in_order(self):
+        results = run_parallel(partial(pow, 2, 3), partial(pow, 3, 2))
+        self.assertEqual(results, [8, 9])
+
+    def test_raises_first_error(self):
+        def fail():
+            raise SystemError('failed')
+        with self.assertRaises(SystemError):
+            run_parallel(partial(pow, 2, 3), fail)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import sys
+import tempfile
+from os import path
+from unittest import TestCase, mock, main
+from .fanout import ContextRun, child_args, read_contexts, run_contexts, summary
+
+# fake dp: prints its context and fails for the 'broken' one
+FAKE_DP = [sys.executable, '-c',
+           'import sys; print("hello from", sys.argv[2], sys.argv[3:]); sys.exit(sys.argv[2] == "broken")']
+
+
+class TestFanOut(TestCase):
+    def test_contexts_from_options_and_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            contexts_file = path.join(directory, 'contexts')
+            with open(contexts_file, 'w') as f:
+                f.write('# team clusters\nteam-a\n\nteam-b  # staging\ndev\n')
+            self.assertEqual(read_contexts(('dev',), contexts_file), ['dev', 'team-a', 'team-b'])
+
+    def test_parent_options_are_removed(self):
+        argv = ['--context', 'a', '--profile', '--backend', 'api', '--contexts-file=ctx.txt', '--max-parallel', '2',
+                'kafkaop', 'create-topic', '--context', 'kept']
+        self.assertEqual(child_args(argv, 'kafkaop'), ['--backend', 'api', 'kafkaop', 'create-topic', '--context', 'kept'])
+
+    def test_output_is_prefixed_and_summarized(self):
+        lines = []
+        with mock.patch('dp.utils.fanout.dp_command', return_value=FAKE_DP), \
+                mock.patch('dp.utils.fanout.click.echo', side_effect=lambda line, err=False: lines.append(line)):
+            runs = run_contexts(['dev', 'broken'], ['status'], max_parallel=1)
+        self.assertEqual([(run.context, run.ok) for run in runs], [('dev', True), ('broken', False)])
+        self.assertIn("[dev]    hello from dev ['status']", lines)
+        self.assertIn("[broken] hello from broken ['status']", lines)
+
+    def test_summary(self):
+        lines = summary([ContextRun('dev', 0, 1.25), ContextRun('prod', 2, 3.0)], 3.1)
+        self.assertEqual(lines[1], 'dev      ok               1.2s')
+        self.assertEqual(lines[2], 'prod     failed (exit 2)  3.0s')
+        self.assertEqual(lines[-1], '2 contexts: 1 ok, 1 failed in 3.1s')
+
+
+if __name__ == '__main__':
+    main()
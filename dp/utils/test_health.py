@@ -0,0 +1,84 @@
+import json
+import tempfile
+from os import path
+from subprocess import CompletedProcess
+from unittest import TestCase, mock, main
+from .health import COMPONENTS, Check, StatusCache, evaluate, fetch, format_table, healthy, scylla_health
+
+
+def ok(command: list, document) -> CompletedProcess:
+    return CompletedProcess(command, 0, json.dumps(document).encode('utf-8'), b'')
+
+
+def deployment(name: str, available: int, replicas: int = 1) -> dict:
+    return {'metadata': {'name': name, 'generation': 1}, 'spec': {'replicas': replicas},
+            'status': {'observedGeneration': 1, 'updatedReplicas': available, 'availableReplicas': available}}
+
+
+class TestEvaluate(TestCase):
+    def test_ready_component(self):
+        checks = COMPONENTS['kafkaop']
+        kafka = {'metadata': {'name': 'my-cluster'}, 'status': {'conditions': [{'type': 'Ready', 'status': 'True'}]}}
+        results = {
+            tuple(checks[0].command()): ok(checks[0].command(), [{'name': 'strimzi', 'chart': 'strimzi-kafka-operator-0.39.0',
+                                                                   'revision': '1', 'status': 'deployed'}]),
+            tuple(checks[1].command()): ok(checks[1].command(), {'items': [deployment('strimzi-cluster-operator', 1)]}),
+            tuple(checks[2].command()): ok(checks[2].command(), {'items': [kafka]}),
+        }
+        rows = evaluate(checks, results)
+        self.assertEqual([row['name'] for row in rows], ['strimzi', 'strimzi-cluster-operator', 'my-cluster'])
+        self.assertTrue(healthy(rows))
+        self.assertEqual(rows[1]['detail'], '1/1 available')
+
+    def test_not_installed_component_is_reported_once(self):
+        checks = COMPONENTS['sparkop']
+        results = {tuple(check.command()): ok(check.command(), []) for check in checks}
+        rows = evaluate(checks, results)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['ready'], rows[0]['detail']), (None, 'not installed'))
+        self.assertTrue(healthy(rows))
+
+    def test_missing_operator_and_crd(self):
+        checks = COMPONENTS['flinkop']
+        missing_crd = CompletedProcess(checks[2].command(), 1, b'',
+                                       b'error: the server doesn\'t have a resource type "flinkdeployment"\n')
+        results = {
+            tuple(checks[0].command()): ok(checks[0].command(), [{'name': 'flink-operator', 'status': 'failed'}]),
+            tuple(checks[1].command()): ok(checks[1].command(), {'items': [deployment('other', 1)]}),
+            tuple(checks[2].command()): missing_crd,
+        }
+        rows = evaluate(checks, results)
+        self.assertEqual([row['detail'] for row in rows][1:], ['not found', 'CRD not installed'])
+        self.assertFalse(healthy(rows))
+
+    def test_scylla_racks(self):
+        cluster = {'status': {'racks': {'a': {'members': 3, 'readyMembers': 2}}}}
+        self.assertEqual(scylla_health(cluster), (False, '2/3 members ready'))
+
+    def test_table_is_aligned(self):
+        rows = [{'component': 'redpanda', 'kind': 'statefulset', 'namespace': 'redpanda', 'name': 'redpanda',
+                 'ready': True, 'detail': '3/3 ready'}]
+        header, line = format_table(rows)
+        self.assertEqual(header.index('STATUS'), line.index('ready'))
+
+
+class TestFetch(TestCase):
+    def test_queries_are_cached(self):
+        clock = mock.Mock(return_value=100.0)
+        checks = [Check('a', 'deployment', 'ns', 'x'), Check('a', 'deployment', 'ns', 'y')]
+        with tempfile.TemporaryDirectory() as directory:
+            cache = StatusCache(path.join(directory, 'status.json'), ttl=10, clock=clock)
+            with mock.patch('dp.utils.health._run_queries',
+                            side_effect=lambda commands: [ok(command, {'items': []}) for command in commands]) as run:
+                fetch(checks, cache)
+                fetch(checks, cache)
+                self.assertEqual(run.call_count, 1)
+                self.assertEqual(len(run.call_args[0][0]), 1)
+                clock.return_value = 111.0
+                fetch(checks, cache)
+                fetch(checks, cache, refresh=True)
+            self.assertEqual(run.call_count, 3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import io
+import os
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase, main, mock
+from .helm_cache import HelmCache
+
+INDEX = '''apiVersion: v1
+entries:
+  operator:
+  - name: operator
+    version: 1.1.0
+    urls:
+    - operator-1.1.0.tgz
+  - name: operator
+    version: 1.0.0
+    urls:
+    - operator-1.0.0.tgz
+'''
+
+
+def chart_tarball(version: str) -> bytes:
+    data = f'name: operator\nversion: {version}\n'.encode()
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        info = tarfile.TarInfo('operator/Chart.yaml')
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class TestHelmCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        repo = Path(self.directory.name, 'repo')
+        repo.mkdir()
+        (repo / 'index.yaml').write_text(INDEX)
+        for version in ('1.0.0', '1.1.0'):
+            (repo / f'operator-{version}.tgz').write_bytes(chart_tarball(version))
+        self.repo = repo
+        self.repo_url = repo.as_uri()
+        self.cache = HelmCache(os.path.join(self.directory.name, 'cache'), ttl=60, max_bytes=10 * 1024 * 1024)
+        self.cache.register_repo('local', self.repo_url)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_latest_chart_is_cached(self):
+        chart = self.cache.resolve('local/operator')
+        self.assertEqual(Path(chart).read_bytes(), (self.repo / 'operator-1.1.0.tgz').read_bytes())
+
+    def test_chart_version(self):
+        chart = self.cache.resolve('local/operator', '1.0.0')
+        self.assertEqual(Path(chart).read_bytes(), (self.repo / 'operator-1.0.0.tgz').read_bytes())
+
+    def test_cached_chart_is_used_without_the_repo(self):
+        first = self.cache.resolve('local/operator', '1.0.0')
+        (self.repo / 'operator-1.0.0.tgz').unlink()
+        (self.repo / 'index.yaml').unlink()
+        self.assertEqual(self.cache.resolve('local/operator', '1.0.0'), first)
+
+    def test_index_is_refreshed_after_ttl(self):
+        self.cache.index(self.repo_url)
+        (self.repo / 'index.yaml').write_text(INDEX.replace('1.1.0', '2.0.0'))
+        self.assertIn('1.1.0', str(self.cache.index(self.repo_url)))
+        with mock.patch('dp.utils.helm_cache.time.time', return_value=time.time() + 120):
+            self.assertIn('2.0.0', str(self.cache.index(self.repo_url)))
+
+    def test_unknown_repo_or_chart(self):
+        self.assertIsNone(self.cache.resolve('unknown/operator'))
+        self.assertIsNone(self.cache.resolve('local/missing'))
+        self.assertIsNone(self.cache.resolve('local/operator', '9.9.9'))
+
+    def test_least_recently_used_blobs_are_evicted(self):
+        self.cache.resolve('local/operator', '1.0.0')
+        self.cache.resolve('local/operator', '1.1.0')
+        self.cache.max_bytes = len(INDEX) + len(chart_tarball('1.1.0'))
+        self.cache.in_use_seconds = 0
+        removed = self.cache.evict()
+        self.assertEqual(removed, [f'chart:{self.repo_url}:operator:1.0.0'])
+        self.assertIsNotNone(self.cache.resolve('local/operator', '1.1.0'))
+
+    def test_blobs_in_use_are_kept(self):
+        chart = self.cache.resolve('local/operator', '1.0.0')
+        self.cache.max_bytes = 0
+        self.assertEqual(self.cache.evict(), [])
+        self.assertTrue(os.path.exists(chart))
+
+    def test_blob_bigger_than_the_cache(self):
+        self.cache.max_bytes = 0
+        self.cache.in_use_seconds = 0
+        chart = self.cache.resolve('local/operator', '1.0.0')
+        self.assertEqual(Path(chart).read_bytes(), (self.repo / 'operator-1.0.0.tgz').read_bytes())
+
+    def test_lookups_do_not_write_the_refs(self):
+        self.cache.resolve('local/operator', '1.0.0')
+        refs = Path(self.cache.directory, 'refs.json')
+        written = refs.read_bytes()
+        with mock.patch('dp.utils.helm_cache.time.time', return_value=time.time() + 30):
+            self.cache.resolve('local/operator', '1.0.0')
+        self.assertEqual(refs.read_bytes(), written)
+        self.cache.save()
+        self.assertNotEqual(refs.read_bytes(), written)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path
+from subprocess import CompletedProcess
+from unittest import TestCase, main, mock
+from . import kube_api
+from .kube_api import ApiError, ExecCredential, KubeClient, KubeConfig, call
+
+DISCOVERY = {
+    '/apis': {'groups': [{'preferredVersion': {'groupVersion': 'kafka.strimzi.io/v1beta2'}}]},
+    '/api/v1': {'resources': [
+        {'name': 'namespaces', 'singularName': 'namespace', 'kind': 'Namespace', 'namespaced': False, 'shortNames': ['ns']},
+        {'name': 'namespaces/status', 'singularName': '', 'kind': 'Namespace', 'namespaced': False},
+    ]},
+    '/apis/kafka.strimzi.io/v1beta2': {'resources': [
+        {'name': 'kafkatopics', 'singularName': 'kafkatopic', 'kind': 'KafkaTopic', 'namespaced': True, 'shortNames': ['kt']},
+    ]},
+}
+
+
+class StubApiServer(BaseHTTPRequestHandler):
+    """API server answering the discovery, namespaces and kafkatopics, every request is recorded.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PATCH(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        server = self.server
+        server.requests.append({'method': self.command, 'path': self.path, 'body': body,
+                                'content_type': self.headers.get('Content-Type'), 'port': self.client_address[1]})
+        url = self.path.split('?')[0]
+        if url in DISCOVERY:
+            return self._reply(200, DISCOVERY[url])
+        if self.command == 'POST' and url == '/api/v1/namespaces':
+            name = body['metadata']['name']
+            if name in server.namespaces:
+                return self._reply(409, {'kind': 'Status', 'reason': 'AlreadyExists',
+                                         'message': f'namespaces "{name}" already exists'})
+            server.namespaces.add(name)
+            return self._reply(201, body)
+        if url.endswith('/kafkatopics') and self.command == 'GET':
+            return self._reply(200, {'items': [{'metadata': {'name': 'orders'}}, {'metadata': {'name': 'users'}}]})
+        if self.command == 'PATCH':
+            return self._reply(200, body)
+        self._reply(404, {'kind': 'Status', 'reason': 'NotFound', 'message': f'{url} not found'})
+
+    def _reply(self, status: int, document: dict):
+        data = json.dumps(document).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestKubeClient(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubApiServer)
+        self.server.requests = []
+        self.server.namespaces = {'default'}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.cache = tempfile.TemporaryDirectory()
+        self.config = KubeConfig(f'http://127.0.0.1:{self.server.server_address[1]}', {'Authorization': 'Bearer t'})
+        self.client = KubeClient(self.config, discovery_dir=self.cache.name)
+
+    def tearDown(self):
+        self.client.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache.cleanup()
+
+    def test_resources_are_found_by_kind_plural_and_short_name(self):
+        for name in ('KafkaTopic', 'kafkatopics', 'kt'):
+            resource = self.client.resource(name)
+            self.assertEqual(resource.path('kafka', 'orders'),
+                             '/apis/kafka.strimzi.io/v1beta2/namespaces/kafka/kafkatopics/orders')
+        self.assertEqual(self.client.resource('ns').path(), '/api/v1/namespaces')
+        with self.assertRaises(LookupError):
+            self.client.resource('pods')
+
+    def test_discovery_is_cached_on_disk(self):
+        self.client.resource('kafkatopic')
+        discovery_requests = len(self.server.requests)
+        other = KubeClient(self.config, discovery_dir=self.cache.name)
+        other.resource('kafkatopic')
+        other.pool.close()
+        self.assertEqual(len(self.server.requests), discovery_requests)
+        self.assertTrue(path.exists(self.client.discovery_file))
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.client.list_names('kafkatopic', 'kafka')
+        self.assertEqual(self.client.pool.connections_opened, 1)
+        self.assertEqual(len({request['port'] for request in self.server.requests}), 1)
+
+    def test_server_side_apply(self):
+        topic = {'apiVersion': 'kafka.strimzi.io/v1beta2', 'kind': 'KafkaTopic', 'metadata': {'name': 'orders'}}
+        self.assertEqual(self.client.apply([topic], 'kafka'), ['kafkatopics/orders serverside-applied'])
+        patch = self.server.requests[-1]
+        self.assertEqual(patch['method'], 'PATCH')
+        self.assertEqual(patch['path'],
+                         '/apis/kafka.strimzi.io/v1beta2/namespaces/kafka/kafkatopics/orders?fieldManager=dp&force=true')
+        self.assertEqual(patch['content_type'], 'application/apply-patch+yaml')
+        self.assertEqual(patch['body'], topic)
+
+    def test_api_errors_look_like_kubectl_errors(self):
+        with self.assertRaises(ApiError):
+            self.client.create_namespace('default')
+        previous, kube_api._client = kube_api._client, self.client
+        try:
+            created = call(['kubectl', 'create', 'ns', 'kafka'], lambda client: client.create_namespace('kafka'))
+            exists = call(['kubectl', 'create', 'ns', 'kafka'], lambda client: client.create_namespace('kafka'))
+        finally:
+            kube_api._client = previous
+        self.assertEqual((created.returncode, created.stdout), (0, b'namespace/kafka created\n'))
+        self.assertEqual(exists.returncode, 1)
+        self.assertIn(b'(AlreadyExists)', exists.stderr)
+
+
+class TestKubeConfig(TestCase):
+    def test_context_is_read_from_the_kubeconfig(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_file = path.join(directory, 'config')
+            with open(config_file, 'w') as f:
+                json.dump({'current-context': 'dev', 'contexts': [
+                    {'name': 'dev', 'context': {'cluster': 'dev', 'user': 'dev'}},
+                    {'name': 'prod', 'context': {'cluster': 'prod', 'user': 'prod'}}],
+                    'clusters': [{'name': 'dev', 'cluster': {'server': 'https://dev:6443',
+                                                             'insecure-skip-tls-verify': True}},
+                                 {'name': 'prod', 'cluster': {'server': 'https://prod:6443',
+                                                              'certificate-authority': 'ca.crt'}}],
+                    'users': [{'name': 'dev', 'user': {'token': 'abc'}}, {'name': 'prod', 'user': {'token': 'xyz'}}]}, f)
+            dev = KubeConfig.load(config_file)
+            prod = KubeConfig.load(config_file, context='prod')
+        self.assertEqual((dev.server, dev.insecure, dev.request_headers()),
+                         ('https://dev:6443', True, {'Authorization': 'Bearer abc'}))
+        self.assertEqual((prod.server, prod.ca_file), ('https://prod:6443', path.join(directory, 'ca.crt')))
+
+    def test_inline_credentials_are_removed_on_close(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_file = path.join(directory, 'config')
+            with open(config_file, 'w') as f:
+                json.dump({'current-context': 'dev',
+                           'contexts': [{'name': 'dev', 'context': {'cluster': 'dev', 'user': 'dev'}}],
+                           'clusters': [{'name': 'dev', 'cluster': {'server': 'https://dev:6443',
+                                                                    'certificate-authority-data': 'Y2E='}}],
+                           'users': [{'name': 'dev', 'user': {'client-certificate-data': 'Y2VydA==',
+                                                              'client-key-data': 'a2V5'}}]}, f)
+            config = KubeConfig.load(config_file)
+        files = [config.ca_file, config.cert_file, config.key_file]
+        self.assertEqual(len({path.dirname(file) for file in files}), 1)
+        with open(config.key_file, 'rb') as f:
+            self.assertEqual(f.read(), b'key')
+        kube_api.close_client()
+        self.assertFalse(any(path.exists(file) for file in files))
+        self.assertFalse(path.exists(path.dirname(config.ca_file)))
+
+    def test_kubeconfig_files_are_merged(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            with open(path.join(first, 'config'), 'w') as f:
+                json.dump({'current-context': 'dev',
+                           'contexts': [{'name': 'dev', 'context': {'cluster': 'dev', 'user': 'dev'}}],
+                           'clusters': [{'name': 'dev', 'cluster': {'server': 'https://dev:6443'}}],
+                           'users': [{'name': 'dev', 'user': {'token': 'abc'}}]}, f)
+            with open(path.join(second, 'config'), 'w') as f:
+                json.dump({'current-context': 'prod', 'contexts': [
+                    {'name': 'dev', 'context': {'cluster': 'prod', 'user': 'prod'}},
+                    {'name': 'prod', 'context': {'cluster': 'prod', 'user': 'prod'}}],
+                    'clusters': [{'name': 'prod', 'cluster': {'server': 'https://prod:6443',
+                                                              'certificate-authority': 'ca.crt'}}],
+                    'users': [{'name': 'prod', 'user': {'token': 'xyz'}}]}, f)
+            files = f'{path.join(first, "config")}:{path.join(first, "missing")}:{path.join(second, "config")}'
+            with mock.patch.dict('os.environ', {'KUBECONFIG': files}):
+                dev = KubeConfig.load()
+                prod = KubeConfig.load(context='prod')
+        self.assertEqual((dev.server, dev.request_headers()), ('https://dev:6443', {'Authorization': 'Bearer abc'}))
+        self.assertEqual((prod.server, prod.ca_file), ('https://prod:6443', path.join(second, 'ca.crt')))
+
+
+class TestKubectlFallback(TestCase):
+    def setUp(self):
+        self.previous = kube_api._client, kube_api._fallback
+        kube_api._client, kube_api._fallback = None, False
+        self.kubectl = CompletedProcess(['kubectl'], 0, b'namespace/kafka created\n', b'')
+
+    def tearDown(self):
+        kube_api._client, kube_api._fallback = self.previous
+
+    def test_unreadable_kubeconfig_runs_kubectl(self):
+        with mock.patch.object(kube_api, 'get_client', side_effect=FileNotFoundError('no kubeconfig')), \
+                mock.patch.object(kube_api, '_run_kubectl', return_value=self.kubectl) as kubectl:
+            result = call(['kubectl', 'apply', '-f', '-'], lambda client: client.apply([], None), input='kind: Namespace')
+            call(['kubectl', 'get', 'ns'], lambda client: client.list_names('ns'))
+        self.assertEqual(result, self.kubectl)
+        self.assertEqual(kubectl.call_args_list[0].args, (['kubectl', 'apply', '-f', '-'], 'kind: Namespace'))
+        self.assertTrue(kube_api._fallback)
+
+    def test_failing_credential_plugin_runs_kubectl(self):
+        plugin = ExecCredential({'command': 'false'})
+        kube_api._client = KubeClient(KubeConfig('https://dev:6443', token_command=plugin.token), discovery_dir=None)
+        with mock.patch.object(kube_api, '_run_kubectl', return_value=self.kubectl) as kubectl:
+            result = call(['kubectl', 'create', 'ns', 'kafka'], lambda client: client.create_namespace('kafka'))
+        self.assertEqual(result, self.kubectl)
+        kubectl.assert_called_once_with(['kubectl', 'create', 'ns', 'kafka'], None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import sys
+import click
+from click.testing import CliRunner
+from unittest import TestCase, main
+from .lazy_group import LazyGroup
+
+
+@click.command()
+def hello():
+    """Say hello."""
+    click.echo('hello')
+
+
+class TestLazyGroup(TestCase):
+    def setUp(self):
+        self.group = LazyGroup('dp', lazy_subcommands={
+            'hello': f'{__name__}.hello',
+            'heavy': 'dp.utils.test_lazy_group_missing.command',
+        }, lazy_help={'heavy': 'Run the heavy command.'})
+
+    def test_only_the_dispatched_module_is_imported(self):
+        result = CliRunner().invoke(self.group, ['hello'])
+        self.assertEqual(result.output, 'hello\n')
+        self.assertNotIn('dp.utils.test_lazy_group_missing', sys.modules)
+
+    def test_commands_are_listed_without_importing(self):
+        self.assertEqual(self.group.list_commands(click.Context(self.group)), ['heavy', 'hello'])
+
+    def test_help_lists_commands_without_importing(self):
+        result = CliRunner().invoke(self.group, ['--help'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('heavy  Run the heavy command.', result.output)
+        self.assertIn('hello  Say hello.', result.output)
+        self.assertNotIn('dp.utils.test_lazy_group_missing', sys.modules)
+
+    def test_unknown_command(self):
+        result = CliRunner().invoke(self.group, ['other'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('No such command', result.output)
+
+
+if __name__ == '__main__':
+    main()
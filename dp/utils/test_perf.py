@@ -0,0 +1,88 @@
+import os
+import tempfile
+from unittest import TestCase, main
+from . import perf
+
+PRODUCER_OUTPUT = ('249985 records sent, 49997.0 records/sec (4.77 MB/sec), 2.8 ms avg latency, 241.0 ms max latency.\n'
+                   '250070 records sent, 50014.0 records/sec (4.77 MB/sec), 1.2 ms avg latency, 12.0 ms max latency.\n'
+                   '500000 records sent, 49975.012494 records/sec (4.77 MB/sec), 2.05 ms avg latency, 241.00 ms max latency, '
+                   '1 ms 50th, 4 ms 95th, 27 ms 99th, 198 ms 99.9th.\n')
+
+CONSUMER_OUTPUT = ('WARNING: option [timeout] is deprecated\n'
+                   'start.time, end.time, data.consumed.in.MB, MB.sec, data.consumed.in.nMsg, nMsg.sec, '
+                   'rebalance.time.ms, fetch.time.ms, fetch.MB.sec, fetch.nMsg.sec\n'
+                   '2024-03-01 10:00:00:000, 2024-03-01 10:00:05:000, 47.6837, 9.5367, 500000, 100000.0000, '
+                   '3012, 1988, 23.9858, 251509.0543\n')
+
+
+class TestParsers(TestCase):
+    def test_producer_summary(self):
+        result = perf.parse_producer(PRODUCER_OUTPUT)
+        self.assertEqual(result['records'], 500000)
+        self.assertAlmostEqual(result['records_per_sec'], 49975.012494)
+        self.assertEqual((result['p50'], result['p95'], result['p99'], result['p999']), (1, 4, 27, 198))
+
+    def test_producer_without_summary(self):
+        with self.assertRaises(ValueError):
+            perf.parse_producer(PRODUCER_OUTPUT.splitlines()[0])
+
+    def test_consumer_report(self):
+        self.assertEqual(perf.parse_consumer(CONSUMER_OUTPUT),
+                         {'records': 500000, 'records_per_sec': 100000.0, 'mb': 47.6837, 'mb_per_sec': 9.5367})
+
+    def test_consumer_without_report(self):
+        with self.assertRaises(ValueError):
+            perf.parse_consumer('')
+
+
+class TestAggregate(TestCase):
+    def test_parallel_producers(self):
+        first = perf.parse_producer(PRODUCER_OUTPUT)
+        second = dict(first, records=100000, avg_latency_ms=10.0, p99=50.0)
+        combined = perf.aggregate([first, second])
+        self.assertEqual(combined['clients'], 2)
+        self.assertEqual(combined['records'], 600000)
+        self.assertAlmostEqual(combined['records_per_sec'], 2 * 49975.012494, places=2)
+        self.assertAlmostEqual(combined['avg_latency_ms'], (2.05 * 500000 + 10 * 100000) / 600000, places=3)
+        self.assertEqual(combined['p99'], 50.0)
+
+    def test_parallel_consumers(self):
+        result = perf.parse_consumer(CONSUMER_OUTPUT)
+        combined = perf.aggregate([result, result])
+        self.assertEqual(combined['records'], 1000000)
+        self.assertNotIn('p99', combined)
+
+
+class TestEndToEndLatency(TestCase):
+    def test_messages_carry_the_generation_time(self):
+        messages = list(perf.benchmark_messages(2, 64, clock=lambda: 1_000_000_000))
+        self.assertEqual(len(messages[0]), 65)
+        self.assertEqual(perf.message_latency_ms(messages[1].rstrip(), 1_005_000_000), 5.0)
+        self.assertIsNone(perf.message_latency_ms(b'other record', 0))
+
+    def test_latency_stats(self):
+        stats = perf.latency_stats([float(i) for i in range(1, 1001)])
+        self.assertEqual((stats['p50'], stats['p95'], stats['p99'], stats['p999']), (500, 950, 990, 999))
+        self.assertEqual(stats['max_latency_ms'], 1000)
+        self.assertEqual(perf.latency_stats([]), {})
+
+
+class TestHistory(TestCase):
+    def test_runs_are_compared_with_the_previous_one(self):
+        with tempfile.TemporaryDirectory() as directory:
+            history_file = os.path.join(directory, 'history', 'runs.jsonl')
+            params = {'record_size': 100}
+            old = perf.new_run('kafka', params, {'records_per_sec': 1000.0, 'p99': 20.0}, None)
+            perf.append_history(old, history_file)
+            perf.append_history(perf.new_run('kafka', {'record_size': 1}, {'records_per_sec': 1.0}, None), history_file)
+            run = perf.new_run('kafka', params, {'records_per_sec': 1500.0, 'p99': 10.0}, None)
+            previous = perf.previous_run(run, perf.load_history(history_file))
+        self.assertEqual(previous, old)
+        self.assertEqual(perf.compare(run, previous), {'producer': {'records_per_sec': 50.0, 'p99': -50.0}})
+
+    def test_missing_history(self):
+        self.assertEqual(perf.load_history('/nonexistent/history.jsonl'), [])
+
+
+if __name__ == '__main__':
+    main()
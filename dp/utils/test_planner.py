@@ -0,0 +1,86 @@
+import threading
+import time
+from unittest import TestCase, main
+from .planner import InstallPlan
+
+
+class TestInstallPlan(TestCase):
+    def build_plan(self, calls: list) -> InstallPlan:
+        plan = InstallPlan('test')
+        plan.add('ns-a', lambda: calls.append('ns-a'))
+        plan.add('ns-b', lambda: calls.append('ns-b'))
+        plan.add('repo', lambda: calls.append('repo'), estimate=2)
+        plan.add('cert-manager', lambda: calls.append('cert-manager'), estimate=120)
+        plan.add('install', lambda: calls.append('install'), after=['ns-a', 'repo', 'cert-manager'], estimate=10)
+        return plan
+
+    def test_stages(self):
+        plan = self.build_plan([])
+        self.assertEqual(plan.stages(), [['ns-a', 'ns-b', 'repo', 'cert-manager'], ['install']])
+
+    def test_critical_path(self):
+        path, total = self.build_plan([]).critical_path()
+        self.assertEqual(path, ['cert-manager', 'install'])
+        self.assertEqual(total, 130)
+
+    def test_critical_path_with_measured_durations(self):
+        path, total = self.build_plan([]).critical_path({'cert-manager': 1, 'repo': 5})
+        self.assertEqual(path, ['repo', 'install'])
+        self.assertEqual(total, 15)
+
+    def test_run_respects_dependencies(self):
+        calls = []
+        durations = self.build_plan(calls).run()
+        self.assertEqual(calls[-1], 'install')
+        self.assertEqual(set(durations), {'ns-a', 'ns-b', 'repo', 'cert-manager', 'install'})
+
+    def test_independent_steps_run_in_parallel(self):
+        barrier = threading.Barrier(3, timeout=5)
+        plan = InstallPlan('parallel')
+        for name in ('a', 'b', 'c'):
+            plan.add(name, barrier.wait)
+        start = time.monotonic()
+        plan.run()
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_shared_step_is_added_once(self):
+        calls = []
+        plan = self.build_plan(calls)
+        plan.add('cert-manager', lambda: calls.append('cert-manager again'), after=['ns-b'])
+        plan.run()
+        self.assertEqual(calls.count('cert-manager'), 1)
+        self.assertNotIn('cert-manager again', calls)
+        self.assertEqual(plan.steps['cert-manager'].after, ['ns-b'])
+
+    def test_failure_stops_dependent_steps(self):
+        calls = []
+        plan = self.build_plan(calls)
+
+        def fail():
+            raise SystemError('repo failed')
+        plan.steps['repo'].action = fail
+        with self.assertRaises(SystemError):
+            plan.run()
+        self.assertNotIn('install', calls)
+
+    def test_cycle_is_rejected(self):
+        plan = InstallPlan('cycle')
+        plan.add('a', print, after=['b'])
+        plan.add('b', print, after=['a'])
+        with self.assertRaises(ValueError):
+            plan.validate()
+
+    def test_unknown_dependency_is_rejected(self):
+        plan = InstallPlan('unknown')
+        plan.add('a', print, after=['missing'])
+        with self.assertRaises(ValueError):
+            plan.validate()
+
+    def test_render(self):
+        rendered = self.build_plan([]).render()
+        self.assertIn('Stage 2:', rendered)
+        self.assertIn('Critical path (~130.0s): cert-manager -> install', rendered)
+
+
+if __name__ == '__main__':
+    main()
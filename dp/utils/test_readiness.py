@@ -0,0 +1,144 @@
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase, main, mock
+from . import readiness
+
+FAKE_KUBECTL = '''
+import json, sys, time
+scenario = json.load(open(sys.argv[1]))
+kind = sys.argv[3]
+if '--watch' not in sys.argv:
+    print(' '.join(scenario.get(f'{kind}:list', [])))
+    sys.exit(0)
+if '--field-selector' in sys.argv:
+    name = sys.argv[sys.argv.index('--field-selector') + 1].split('=', 1)[1]
+    events = scenario.get(f'{kind}/{name}')
+else:
+    events = scenario.get(kind)
+if events is None:
+    print(f'error: the server doesn\\'t have a resource type "{kind}"', file=sys.stderr)
+    sys.exit(1)
+for event in events:
+    time.sleep(event.get('after', 0))
+    document = {'type': event['type'], 'object': event['object']} if 'type' in event else event['object']
+    print(json.dumps(document, indent=4 if event.get('pretty', True) else None), flush=True)
+time.sleep(60)
+'''
+
+
+def deployment(replicas: int, available: int) -> dict:
+    return {'metadata': {'name': 'op', 'generation': 1}, 'spec': {'replicas': replicas},
+            'status': {'observedGeneration': 1, 'updatedReplicas': available, 'availableReplicas': available}}
+
+
+class TestReadiness(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fake = Path(self.directory.name, 'kubectl.py')
+        self.fake.write_text(FAKE_KUBECTL)
+        self.scenario = Path(self.directory.name, 'scenario.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def kubectl(self, scenario: dict) -> list:
+        self.scenario.write_text(json.dumps(scenario))
+        return [sys.executable, str(self.fake), str(self.scenario)]
+
+    def test_waits_until_deployment_available(self):
+        kubectl = self.kubectl({'deployment/op': [
+            {'object': deployment(1, 0)},
+            {'after': 0.3, 'object': deployment(1, 1)},
+        ]})
+        waited = readiness.wait_for([readiness.deployment('op', 'ns')], timeout=10, kubectl=kubectl)
+        self.assertGreaterEqual(waited['deployment ns/op'], 0.3)
+
+    def test_waits_several_conditions_concurrently(self):
+        crd = {'metadata': {'name': 'kafkas.kafka.strimzi.io'},
+               'status': {'conditions': [{'type': 'Established', 'status': 'True'}]}}
+        hook = {'metadata': {'name': 'hook'}, 'webhooks': [{'clientConfig': {'caBundle': 'Y2E='}}]}
+        kubectl = self.kubectl({
+            'customresourcedefinition/kafkas.kafka.strimzi.io': [{'after': 0.5, 'object': crd, 'pretty': False}],
+            'validatingwebhookconfiguration/hook': [{'after': 0.5, 'object': hook}],
+        })
+        start = time.monotonic()
+        waited = readiness.wait_for([readiness.crd('kafkas.kafka.strimzi.io'), readiness.webhook('hook')],
+                                    timeout=10, kubectl=kubectl)
+        self.assertEqual(len(waited), 2)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_timeout_when_never_ready(self):
+        kubectl = self.kubectl({'kafka/my-cluster': [
+            {'object': {'status': {'conditions': [{'type': 'Ready', 'status': 'False'}]}}},
+        ]})
+        with self.assertRaises(readiness.WaitTimeout):
+            readiness.wait_for([readiness.custom_resource('kafka', 'my-cluster', 'kafka')], timeout=1, kubectl=kubectl)
+
+    def test_watch_is_restarted_until_resource_type_exists(self):
+        kubectl = self.kubectl({})
+        with mock.patch.object(readiness, 'RETRY_INTERVAL', 0.1):
+            with self.assertRaises(readiness.WaitTimeout) as error:
+                readiness.wait_for([readiness.statefulset('redpanda', 'redpanda')], timeout=1, kubectl=kubectl)
+        self.assertIn("doesn't have a resource type", str(error.exception))
+
+    def test_collection_uses_a_single_watch(self):
+        def topic(name: str, status: str) -> dict:
+            return {'metadata': {'name': name}, 'status': {'conditions': [{'type': 'Ready', 'status': status}]}}
+        kubectl = self.kubectl({'kafkatopic': [
+            {'object': topic('a', 'True')},
+            {'object': topic('b', 'False')},
+            {'object': topic('other', 'True')},
+            {'after': 0.2, 'object': topic('b', 'True')},
+        ]})
+        waited = readiness.wait_for_collection('kafkatopic', ['a', 'b'], 'kafka', timeout=10, kubectl=kubectl,
+                                               selector='strimzi.io/cluster=my-cluster')
+        self.assertEqual(set(waited), {'a', 'b'})
+        self.assertGreater(waited['b'], waited['a'])
+
+    def test_collection_timeout_lists_missing_resources(self):
+        kubectl = self.kubectl({'kafkatopic': []})
+        with self.assertRaises(readiness.WaitTimeout) as error:
+            readiness.wait_for_collection('kafkatopic', ['a', 'b'], 'kafka', timeout=1, kubectl=kubectl)
+        self.assertIn('2 kafkatopic not ready', str(error.exception))
+
+    def test_waits_until_resources_are_deleted(self):
+        topic = {'metadata': {'name': 'a', 'finalizers': ['strimzi.io/topic-operator']}}
+        kubectl = self.kubectl({'kafkatopic': [
+            {'type': 'ADDED', 'object': topic},
+            {'after': 0.2, 'type': 'DELETED', 'object': topic},
+        ], 'kafkatopic:list': ['a']})
+        waited = readiness.get_executor().submit(readiness.wait_deleted(
+            'kafkatopic', ['a', 'already-gone'], 'kafka', readiness.Deadline(10), kubectl=kubectl)).result()
+        self.assertEqual(set(waited), {'a', 'already-gone'})
+        self.assertGreater(waited['a'], waited['already-gone'])
+
+    def test_delete_timeout_reports_finalizers(self):
+        topic = {'metadata': {'name': 'a', 'finalizers': ['strimzi.io/topic-operator']}}
+        kubectl = self.kubectl({'kafkatopic': [{'type': 'MODIFIED', 'object': topic}], 'kafkatopic:list': ['a']})
+        with self.assertRaises(readiness.WaitTimeout) as error:
+            readiness.wait_for_deleted('kafkatopic', ['a'], 'kafka', timeout=1, kubectl=kubectl)
+        self.assertIn('a (finalizers: strimzi.io/topic-operator)', str(error.exception))
+
+
+class TestPredicates(TestCase):
+    def test_deployment_with_old_generation_is_not_available(self):
+        resource = deployment(1, 1)
+        resource['metadata']['generation'] = 2
+        self.assertFalse(readiness.deployment_available(resource))
+
+    def test_webhook_without_ca_bundle(self):
+        self.assertFalse(readiness.webhook_ready({'webhooks': [{'clientConfig': {}}]}))
+
+    def test_json_stream_with_several_documents(self):
+        stream = readiness.JsonStream()
+        documents = []
+        for line in b'{\n    "a": 1\n}\n{"b": 2}\n'.splitlines(keepends=True):
+            documents += stream.feed(line)
+        self.assertEqual(documents, [{'a': 1}, {'b': 2}])
+
+
+if __name__ == '__main__':
+    main()
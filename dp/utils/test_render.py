@@ -0,0 +1,19 @@
+import yaml
+from unittest import TestCase, main
+from .render import load_template, to_yaml
+
+
+class TestRender(TestCase):
+    def test_template_copies_are_independent(self):
+        topic = load_template('kafka-topic-create.yaml')
+        topic['metadata']['name'] = 'changed'
+        self.assertNotEqual(load_template('kafka-topic-create.yaml')['metadata']['name'], 'changed')
+
+    def test_several_documents(self):
+        text = to_yaml([{'kind': 'KafkaTopic', 'metadata': {'name': 'a'}}, {'kind': 'KafkaTopic', 'metadata': {'name': 'b'}}])
+        documents = list(yaml.safe_load_all(text))
+        self.assertEqual([doc['metadata']['name'] for doc in documents], ['a', 'b'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+from subprocess import CompletedProcess
+from unittest import TestCase, mock, main
+from .retry import RetryPolicy, RetryStats, current_policy, retry_reason, retryable_command, using
+
+
+def failed(stderr: bytes) -> CompletedProcess:
+    return CompletedProcess([], 1, b'', stderr)
+
+
+class TestClassify(TestCase):
+    def test_transient_errors(self):
+        self.assertEqual(retry_reason(failed(b'Error from server (TooManyRequests): '
+                                             b'the server has received too many requests')),
+                         '(toomanyrequests)')
+        self.assertIsNotNone(retry_reason(failed(b'Internal error occurred: '
+                                                 b'failed calling webhook "webhook.scylla.scylladb.com"')))
+        self.assertIsNotNone(retry_reason(failed(b'Unable to connect to the server: '
+                                                 b'dial tcp 10.0.0.1:6443: i/o timeout')))
+
+    def test_fatal_errors(self):
+        self.assertIsNone(retry_reason(failed(b'Error from server (Forbidden): namespaces is forbidden')))
+        self.assertIsNone(retry_reason(failed(b'Error: INSTALLATION FAILED: chart "nope" not found')))
+        self.assertIsNone(retry_reason(CompletedProcess([], 0, b'', b'Warning: connection refused')))
+        self.assertIsNone(retry_reason(failed(b'org.apache.kafka.common.errors.TimeoutException: unexpected EOF')))
+
+    def test_only_control_plane_commands_are_retried(self):
+        self.assertTrue(retryable_command(['kubectl', 'apply', '-f', '-']))
+        self.assertTrue(retryable_command(['helm', '-n', 'kafka', 'upgrade', '--install', 'strimzi', 'strimzi/strimzi']))
+        self.assertFalse(retryable_command(['kubectl', '-n', 'kafka', 'exec', '-i', 'kafka-client', '--', 'produce']))
+        self.assertFalse(retryable_command(['rpk', 'topic', 'produce']))
+        self.assertTrue(retryable_command(['kubectl', 'get', 'pods', '--', 'exec']))
+        self.assertTrue(retryable_command(['kubectl', 'delete', 'kafkatopic', 'logs', '-n', 'kafka']))
+        self.assertTrue(retryable_command(['kubectl', '-n', 'run', 'get', 'pods']))
+        self.assertFalse(retryable_command(['kubectl', '--context=prod', '--namespace', 'kafka', 'logs', 'kafka-0']))
+
+
+class TestPolicy(TestCase):
+    def test_backoff_is_capped(self):
+        policy = RetryPolicy(base_delay=1, max_delay=5, random=lambda: 1.0)
+        self.assertEqual([policy.delay(retry) for retry in range(5)], [1, 2, 4, 5, 5])
+        self.assertEqual(RetryPolicy(random=lambda: 0.5).delay(2), 2.0)
+
+    def test_transient_failures_are_retried(self):
+        sleeps = []
+        results = [failed(b'etcdserver: request timed out'), failed(b'dial tcp 10.0.0.1:6443: connect: connection refused'),
+                   CompletedProcess([], 0, b'ok', b'')]
+        policy = RetryPolicy(attempts=4, random=lambda: 1.0, sleep=sleeps.append)
+        with mock.patch('dp.utils.retry.stats', RetryStats()) as stats, mock.patch('dp.utils.retry.click.echo'):
+            result = policy.run(lambda: results.pop(0), 'kubectl apply')
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(sleeps, [1.0, 2.0])
+        self.assertEqual((stats.retries, stats.backoff, stats.commands), (2, 3.0, {'kubectl apply': 2}))
+        self.assertIn('2 retries', stats.summary())
+
+    def test_attempts_are_limited(self):
+        calls = []
+        policy = RetryPolicy(attempts=3, random=lambda: 0.0, sleep=lambda delay: None)
+        with mock.patch('dp.utils.retry.stats', RetryStats()), mock.patch('dp.utils.retry.click.echo'):
+            result = policy.run(lambda: calls.append(1) or failed(b'(ServiceUnavailable)'))
+        self.assertEqual((len(calls), result.returncode), (3, 1))
+
+    def test_fatal_errors_are_not_retried(self):
+        calls = []
+        policy = RetryPolicy(sleep=lambda delay: None)
+        policy.run(lambda: calls.append(1) or failed(b'Error from server (Invalid): bad spec'))
+        self.assertEqual(len(calls), 1)
+
+    def test_step_policy(self):
+        step_policy = RetryPolicy(attempts=8)
+        with mock.patch.dict('os.environ', {'DP_RETRY_ATTEMPTS': '2'}):
+            self.assertEqual(current_policy().attempts, 2)
+            with using(step_policy):
+                self.assertIs(current_policy(), step_policy)
+            self.assertEqual(current_policy().attempts, 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+from unittest import TestCase, main
+from .startup import compare, parse_importtime, previous_results, summarize
+
+IMPORTTIME = '''import time: self [us] | cumulative | imported package
+import time:       703 |      22223 |       yaml
+import time:       608 |      46846 |       asyncio
+import time:      1086 |      58932 | click
+'''
+
+
+class TestStartup(TestCase):
+    def test_slowest_imports_first(self):
+        self.assertEqual(parse_importtime(IMPORTTIME, top=2), [('click', 58932), ('asyncio', 46846)])
+
+    def test_summary(self):
+        summary = summarize([30.0, 10.0, 20.0])
+        self.assertEqual((summary['min_ms'], summary['median_ms'], summary['max_ms']), (10.0, 20.0, 30.0))
+
+    def test_compared_with_the_previous_measurement_of_the_same_args(self):
+        older = {'args': ['--help'], 'source': {'median_ms': 200.0, 'p95_ms': 250.0}}
+        other = {'args': ['kafkaop', '--help'], 'source': {'median_ms': 400.0, 'p95_ms': 500.0}}
+        results = {'args': ['--help'], 'source': {'median_ms': 150.0, 'p95_ms': 200.0}}
+        previous = previous_results(results, [older, other])
+        self.assertIs(previous, older)
+        self.assertEqual(compare(results, previous), {'source': {'median_ms': -25.0, 'p95_ms': -20.0}})
+        self.assertIsNone(previous_results(results, [other]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import asyncio
+import io
+from unittest import TestCase, main
+from .streaming import LineSink, RateLimiter, Throughput, chunk_messages, generate_messages, read_messages
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class TestMessages(TestCase):
+    def test_generated_messages(self):
+        self.assertEqual(list(generate_messages('hello', 2)), [b'hello 1\n', b'hello 2\n'])
+
+    def test_generated_messages_with_key(self):
+        self.assertEqual(list(generate_messages('v', 1, key='user-{i}', separator='|')), [b'user-1|v 1\n'])
+
+    def test_generator_is_lazy(self):
+        messages = generate_messages('m', 10 ** 12)
+        self.assertEqual(next(messages), b'm 1\n')
+
+    def test_read_messages_skips_empty_lines(self):
+        stream = io.BytesIO(b'a\n\nb')
+        self.assertEqual(list(read_messages(stream)), [b'a\n', b'b\n'])
+
+
+class TestChunks(TestCase):
+    def test_chunks_hold_whole_messages(self):
+        chunks = list(chunk_messages(generate_messages('m', 100), chunk_size=20))
+        self.assertTrue(all(chunk.endswith(b'\n') for chunk in chunks))
+        self.assertEqual(b''.join(chunks).count(b'\n'), 100)
+
+    def test_rate_limit(self):
+        clock = FakeClock()
+        limiter = RateLimiter(100, clock=clock, sleep=clock.sleep)
+        meter = Throughput(clock=clock)
+        chunks = list(chunk_messages(generate_messages('m', 500), limiter=limiter, meter=meter))
+        self.assertEqual(len(chunks), 50)
+        self.assertAlmostEqual(clock.now, 5.0)
+        self.assertEqual(meter.messages, 500)
+        self.assertAlmostEqual(meter.rate(), 100)
+
+    def test_progress_is_reported(self):
+        clock = FakeClock()
+        lines = []
+        limiter = RateLimiter(10, clock=clock, sleep=clock.sleep)
+        meter = Throughput(report=lines.append, interval=5, clock=clock)
+        list(chunk_messages(generate_messages('m', 100), limiter=limiter, meter=meter))
+        self.assertEqual(lines[0], '50 messages sent, 10 msgs/sec, 0.0 KiB/sec')
+
+
+class TestLineSink(TestCase):
+    def test_lines_are_written_in_blocks(self):
+        stream = io.BytesIO()
+        meter = Throughput(action='received')
+        sink = LineSink(stream, transform=bytes.upper, meter=meter, buffer_size=8)
+
+        async def write():
+            for line in (b'ab\n', b'cd\n', b'ef\n', b'gh\n'):
+                await sink.write(line)
+
+        asyncio.run(write())
+        self.assertEqual(stream.getvalue(), b'AB\nCD\nEF\n')
+        sink.flush()
+        self.assertEqual(stream.getvalue(), b'AB\nCD\nEF\nGH\n')
+        self.assertEqual((meter.messages, meter.bytes), (4, 12))
+
+    def test_console_lines_are_flushed_at_once(self):
+        raw = io.BytesIO()
+        stream = io.BufferedWriter(raw, buffer_size=8192)
+        sink = LineSink(stream, buffer_size=1, flush_each_block=True)
+        asyncio.run(sink.write(b'first\n'))
+        self.assertEqual(raw.getvalue(), b'first\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,20 @@
 from unittest import TestCase, mock, main
-from .subprocess_com import create_ns, add_repo, install_repo, delete_ns, delete_repo, uninstall_repo
+from .subprocess_com import create_ns, add_repo, install_repo, delete_ns, delete_repo, uninstall_repo, release_fingerprint
+from .subprocess_com import run_kubectl_apply_manifest, run_kubectl_delete_names, run_kubectl_delete_kinds, run_kubectl_patch
+from .subprocess_com import get_resource, list_resources
 from subprocess import CompletedProcess
+import json
 from pathlib import Path
 
+# keep the tests away from the helm cache in the home directory
+_cache_patch = mock.patch("dp.utils.subprocess_com.helm_cache.get_cache", return_value=None)
+
+def setUpModule():
+    _cache_patch.start()
+
+def tearDownModule():
+    _cache_patch.stop()
+
 class TestCreateNs(TestCase):
     @mock.patch("dp.utils.subprocess_com.__run_subprocess")
     def test_create_ns(self, mock_run):
@@ -102,6 +114,121 @@ class TestInstallRepo(TestCase):
           mock_run.return_value = expected
           install_repo("flink-operator", "flink-operator-repo", "flink-op-1.8.0", "flink-values.yaml")
 
+class TestInstallRepoFingerprint(TestCase):
+    def release_status(self, status: str, fingerprint: str) -> CompletedProcess:
+        info = {"info": {"status": status, "description": f"dp-fingerprint={fingerprint}"}}
+        return CompletedProcess(args="", returncode=0, stdout=json.dumps(info).encode())
+
+    def chart(self, version: str) -> CompletedProcess:
+        return CompletedProcess(args="", returncode=0,
+                                stdout=f"apiVersion: v2\nname: spark-operator\nversion: {version}\n".encode())
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_unchanged_release_is_skipped(self, mock_run):
+        fingerprint = release_fingerprint("spark-operator/spark-operator:1.4.5")
+        mock_run.side_effect = [self.chart("1.4.5"), self.release_status("deployed", fingerprint)]
+        response = install_repo("spark-operator", "spark-operator", "spark-operator/spark-operator")
+        self.assertEqual(response.returncode, 0)
+        self.assertEqual(mock_run.call_count, 2)
+        self.assertEqual(mock_run.call_args_list[0].args[0], ["helm", "show", "chart", "spark-operator/spark-operator"])
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_new_chart_release_is_installed(self, mock_run):
+        fingerprint = release_fingerprint("spark-operator/spark-operator:1.4.5")
+        installed = CompletedProcess(args="", returncode=0, stdout=b"Repo installed")
+        mock_run.side_effect = [self.chart("1.4.6"), self.release_status("deployed", fingerprint), installed]
+        install_repo("spark-operator", "spark-operator", "spark-operator/spark-operator")
+        command = mock_run.call_args.args[0]
+        self.assertEqual(command[command.index("--version") + 1], "1.4.6")
+        self.assertIn(f"dp-fingerprint={release_fingerprint('spark-operator/spark-operator:1.4.6')}", command)
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_unknown_version_is_always_installed(self, mock_run):
+        installed = CompletedProcess(args="", returncode=0, stdout=b"Repo installed")
+        mock_run.side_effect = [CompletedProcess(args="", returncode=1, stderr=b"Error: repo not found"), installed]
+        install_repo("spark-operator", "spark-operator", "spark-operator/spark-operator")
+        self.assertEqual(mock_run.call_count, 2)
+        self.assertNotIn("--description", mock_run.call_args.args[0])
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_changed_release_is_upgraded(self, mock_run):
+        installed = CompletedProcess(args="", returncode=0, stdout=b"Repo installed")
+        mock_run.side_effect = [self.release_status("deployed", "old"), installed]
+        response = install_repo("spark-operator", "spark-operator", "spark-operator/spark-operator", version="1.4.5")
+        self.assertEqual(response, installed)
+        command = mock_run.call_args.args[0]
+        self.assertEqual(command[3:5], ["upgrade", "--install"])
+        self.assertIn("--version", command)
+        self.assertIn(f"dp-fingerprint={release_fingerprint('spark-operator/spark-operator:1.4.5')}", command)
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_failed_release_is_installed_again(self, mock_run):
+        fingerprint = release_fingerprint("spark-operator/spark-operator:1.4.5")
+        installed = CompletedProcess(args="", returncode=0, stdout=b"Repo installed")
+        mock_run.side_effect = [self.chart("1.4.5"), self.release_status("failed", fingerprint), installed]
+        install_repo("spark-operator", "spark-operator", "spark-operator/spark-operator")
+        self.assertEqual(mock_run.call_count, 3)
+
+    def test_fingerprint_depends_on_values(self):
+        self.assertNotEqual(release_fingerprint("chart", b"a: 1"), release_fingerprint("chart", b"a: 2"))
+
+class TestApplyManifest(TestCase):
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_manifest_is_sent_through_stdin(self, mock_run):
+        mock_run.return_value = CompletedProcess(args="", returncode=0, stdout=b"kafkatopic created")
+        topic = {"apiVersion": "kafka.strimzi.io/v1beta2", "kind": "KafkaTopic", "metadata": {"name": "topic1"}}
+        run_kubectl_apply_manifest(topic, namespace="kafka")
+        command = mock_run.call_args.args[0]
+        self.assertEqual(command[:4], ["kubectl", "apply", "-f", "-"])
+        self.assertIn("name: topic1", mock_run.call_args.kwargs["input"])
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_values_are_sent_through_stdin(self, mock_run):
+        mock_run.return_value = CompletedProcess(args="", returncode=0, stdout=b"installed")
+        install_repo("redpanda", "redpanda", "redpanda/redpanda", values={"statefulset": {"replicas": 3}})
+        self.assertIn("-", mock_run.call_args.args[0])
+        self.assertIn("replicas: 3", mock_run.call_args.kwargs["input"])
+
+class TestDeleteNames(TestCase):
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_several_names_in_one_call(self, mock_run):
+        mock_run.return_value = CompletedProcess(args="", returncode=0, stdout=b"deleted")
+        run_kubectl_delete_names("kafkatopic", "kafka", ["a", "b"])
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(mock_run.call_args.args[0],
+                         ["kubectl", "delete", "kafkatopic", "a", "b", "--namespace", "kafka",
+                          "--ignore-not-found", "--wait=false"])
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_several_kinds_in_one_call(self, mock_run):
+        mock_run.return_value = CompletedProcess(args="", returncode=0, stdout=b"deleted")
+        run_kubectl_delete_kinds(["pod", "pvc"], "redpanda", force=True)
+        self.assertEqual(mock_run.call_args.args[0],
+                         ["kubectl", "delete", "pod,pvc", "--all", "--namespace", "redpanda", "--ignore-not-found",
+                          "--wait=false", "--grace-period=0", "--force"])
+
+class TestPatchAndGet(TestCase):
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_merge_patch(self, mock_run):
+        mock_run.return_value = CompletedProcess(args="", returncode=0, stdout=b"patched")
+        run_kubectl_patch("kafka", "my-cluster", "kafka", {"spec": {"cruiseControl": {}}})
+        self.assertEqual(mock_run.call_args.args[0], ["kubectl", "patch", "kafka", "my-cluster", "--namespace", "kafka",
+                                                      "--type", "merge", "-p", '{"spec": {"cruiseControl": {}}}'])
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_missing_resource_is_none(self, mock_run):
+        mock_run.return_value = CompletedProcess(args="", returncode=1, stdout=b"",
+                                                 stderr=b'Error from server (NotFound): kafkarebalances "r" not found')
+        self.assertIsNone(get_resource("kafkarebalance", "r", "kafka"))
+        mock_run.return_value = CompletedProcess(args="", returncode=0, stdout=b'{"kind": "KafkaRebalance"}')
+        self.assertEqual(get_resource("kafkarebalance", "r", "kafka"), {"kind": "KafkaRebalance"})
+
+    @mock.patch("dp.utils.subprocess_com.__run_subprocess")
+    def test_list_cluster_resources(self, mock_run):
+        mock_run.return_value = CompletedProcess(args="", returncode=0, stdout=b'{"items": [{"kind": "Node"}]}')
+        self.assertEqual(list_resources("node", selector="dedicated=scylla"), [{"kind": "Node"}])
+        self.assertEqual(mock_run.call_args.args[0], ["kubectl", "get", "node", "-o", "json", "-l", "dedicated=scylla"])
+
 class TestUninstallRepo(TestCase):
     @mock.patch("dp.utils.subprocess_com.__run_subprocess")
     def test_uninstall_repo(self, mock_run):
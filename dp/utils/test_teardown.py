@@ -0,0 +1,60 @@
+import json
+from subprocess import CompletedProcess
+from unittest import TestCase, mock, main
+from .readiness import WaitTimeout
+from .teardown import delete_namespace, finalizer_holders, namespace_report, remaining_types
+
+TERMINATING = {'metadata': {'name': 'kafka'}, 'status': {'phase': 'Terminating', 'conditions': [
+    {'type': 'NamespaceDeletionDiscoveryFailure', 'status': 'False', 'message': 'All resources successfully discovered'},
+    {'type': 'NamespaceContentRemaining', 'status': 'True',
+     'message': 'Some resources are remaining: kafkatopics.kafka.strimzi.io has 2 resource instances, '
+                'pods. has 1 resource instances'},
+    {'type': 'NamespaceFinalizersRemaining', 'status': 'True',
+     'message': 'Some content in the namespace has finalizers remaining: strimzi.io/topic-operator in 2 resource instances'},
+]}}
+
+
+class TestStuckNamespace(TestCase):
+    def test_report_lists_the_active_conditions(self):
+        self.assertEqual(len(namespace_report(TERMINATING)), 2)
+        self.assertIn('strimzi.io/topic-operator', namespace_report(TERMINATING)[1])
+
+    def test_remaining_types(self):
+        self.assertEqual(remaining_types(TERMINATING), ['kafkatopics.kafka.strimzi.io', 'pods'])
+        self.assertEqual(remaining_types({'status': {'phase': 'Active'}}), [])
+
+    def test_finalizer_holders(self):
+        items = [{'kind': 'KafkaTopic', 'metadata': {'name': 'orders', 'finalizers': ['strimzi.io/topic-operator']}},
+                 {'kind': 'Pod', 'metadata': {'name': 'kafka-0'}}]
+        self.assertEqual(finalizer_holders(items), ['kafkatopic/orders (finalizers: strimzi.io/topic-operator)'])
+        self.assertEqual(finalizer_holders(items * 3, limit=2)[-1], 'and 1 more')
+
+
+class TestDeleteNamespace(TestCase):
+    @mock.patch("dp.utils.teardown.readiness.wait_for_deleted")
+    @mock.patch("dp.utils.teardown.utils")
+    def test_fast_mode_kills_the_pods(self, mock_utils, mock_wait):
+        delete_namespace('kafka', timeout=5, fast=True)
+        mock_utils.delete_ns.assert_called_once_with('kafka', wait=False)
+        mock_utils.run_kubectl_delete_kinds.assert_called_once_with(['pod'], 'kafka', force=True)
+        self.assertEqual(mock_wait.call_args.kwargs['selector'], 'kubernetes.io/metadata.name=kafka')
+
+    @mock.patch("dp.utils.teardown.get_executor")
+    @mock.patch("dp.utils.teardown.readiness.wait_for_deleted", side_effect=WaitTimeout('1 namespace not deleted'))
+    @mock.patch("dp.utils.teardown.utils")
+    def test_stuck_resources_are_reported(self, mock_utils, mock_wait, mock_executor):
+        topics = {'items': [{'kind': 'KafkaTopic',
+                             'metadata': {'name': 'orders', 'finalizers': ['strimzi.io/topic-operator']}}]}
+        mock_executor.return_value.run_sync.side_effect = [
+            CompletedProcess([], 0, json.dumps(TERMINATING).encode('utf-8'), b''),
+            CompletedProcess([], 0, json.dumps(topics).encode('utf-8'), b'')]
+        with mock.patch("dp.utils.teardown.click.echo") as echo, self.assertRaises(SystemError):
+            delete_namespace('kafka', timeout=5)
+        printed = [call.args[0] for call in echo.call_args_list]
+        self.assertIn('  kafkatopic/orders (finalizers: strimzi.io/topic-operator)', printed)
+        mock_utils.run_kubectl_delete_kinds.assert_not_called()
+        self.assertEqual(mock_executor.return_value.run_sync.call_args.args[0][2], 'kafkatopics.kafka.strimzi.io,pods')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import threading
+from unittest import TestCase, main
+from .tracing import Tracer, command_name
+
+
+class TestTracer(TestCase):
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer()
+        with tracer.span('kubectl get', 'command') as span:
+            self.assertIsNone(span)
+        self.assertEqual(tracer.spans, [])
+
+    def test_concurrent_spans_get_different_lanes(self):
+        tracer = Tracer(enabled=True)
+        first = tracer.start('helm upgrade', 'command')
+        second = tracer.start('kubectl get', 'command')
+        tracer.finish(first, exit_code=0)
+        third = tracer.start('kubectl apply', 'command')
+        tracer.finish(second)
+        tracer.finish(third)
+        self.assertEqual((first.lane, second.lane, third.lane), (0, 1, 0))
+        self.assertEqual(first.args, {'exit_code': 0})
+
+    def test_failed_block_is_recorded(self):
+        tracer = Tracer(enabled=True)
+        with self.assertRaises(SystemError):
+            with tracer.span('wait', 'wait'):
+                raise SystemError('timeout')
+        self.assertEqual(tracer.spans[0].args['error'], 'SystemError')
+
+    def test_breakdown_and_chrome_trace(self):
+        tracer = Tracer(enabled=True)
+        threads = [threading.Thread(target=lambda: tracer.finish(tracer.start('kubectl get', 'command')))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with tracer.span('install:kafka', 'step'):
+            pass
+        lines = tracer.breakdown()
+        self.assertTrue(any(line.startswith('command      4 spans') for line in lines))
+        with tempfile.TemporaryDirectory() as directory:
+            trace_file = os.path.join(directory, 'trace.json')
+            tracer.export(trace_file)
+            with open(trace_file) as f:
+                events = json.load(f)['traceEvents']
+        self.assertEqual(len(events), 5)
+        self.assertTrue(all(event['ph'] == 'X' and event['dur'] >= 0 for event in events))
+
+
+class TestCommandName(TestCase):
+    def test_options_are_skipped(self):
+        self.assertEqual(command_name(['helm', '-n', 'kafka', 'upgrade', '--install', 'strimzi']), 'helm upgrade strimzi')
+        self.assertEqual(command_name(['kubectl', '-n', 'kafka', 'exec', 'kafka-client', '--', 'bin/x.sh']),
+                         'kubectl exec kafka-client')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# kubectl and helm options followed by a value, skipped when a command is named
+VALUE_OPTIONS = {'-n', '--namespace', '-c', '--container', '--context', '--kube-context', '-f', '-o', '--output'}
+
+
+class Span:
+    """Timed operation: a command, a readiness wait or an install step.
+
+    Args:
+        name (str): short name shown in the breakdown, e.g. 'helm upgrade'.
+        category (str): kind of operation, e.g. 'command', 'wait' or 'step'.
+        args (dict, optional): details of the operation, such as the full command or the exit code.
+    """
+
+    def __init__(self, name: str, category: str, args: dict = None):
+        self.name = name
+        self.category = category
+        self.args = dict(args or {})
+        self.start = time.perf_counter()
+        self.end = None
+        self.lane = 0
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Tracer:
+    """Collect spans from every thread and the executor event loop.
+
+    Spans running at the same time get different lanes, so they are drawn in separate rows of the trace viewer
+    even when they come from the same thread.
+
+    Args:
+        enabled (bool, optional): record spans. A disabled tracer costs a single attribute check. Defaults to False.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.spans: list[Span] = []
+        self._busy_lanes: set[int] = set()
+        self._lock = threading.Lock()
+
+    def start(self, name: str, category: str, **args) -> Span:
+        """Open a span, returns None when the tracer is disabled.
+        """
+        if not self.enabled:
+            return None
+        span = Span(name, category, args)
+        with self._lock:
+            span.lane = next(lane for lane in range(len(self._busy_lanes) + 1) if lane not in self._busy_lanes)
+            self._busy_lanes.add(span.lane)
+        return span
+
+    def finish(self, span: Span, **args) -> None:
+        """Close a span returned by `start` and keep it, None spans are ignored.
+        """
+        if span is None:
+            return
+        span.end = time.perf_counter()
+        span.args.update(args)
+        with self._lock:
+            self._busy_lanes.discard(span.lane)
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[Span]:
+        """Record the block as a span, failures are stored in the `error` arg.
+        """
+        span = self.start(name, category, **args)
+        try:
+            yield span
+        except BaseException as e:
+            self.finish(span, error=type(e).__name__)
+            raise
+        self.finish(span)
+
+    def breakdown(self, limit: int = 20) -> list[str]:
+        """Lines with the total time of every category and the slowest spans, slowest first.
+
+        Args:
+            limit (int, optional): maximum number of spans listed. Defaults to 20.
+
+        Returns:
+            list[str]: lines of the breakdown.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return []
+        lines = []
+        totals = {}
+        for span in spans:
+            count, total = totals.get(span.category, (0, 0.0))
+            totals[span.category] = (count + 1, total + span.duration)
+        for category, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{category:<8} {count:5d} spans {total:9.2f}s')
+        lines.append('')
+        for span in sorted(spans, key=lambda span: -span.duration)[:limit]:
+            status = span.args.get('exit_code', span.args.get('error', ''))
+            lines.append(f'{span.duration:8.2f}s  {span.category:<8} {span.name} {status}'.rstrip())
+        return lines
+
+    def chrome_trace(self) -> dict:
+        """Spans in the Chrome trace event format, it can be opened in chrome://tracing or ui.perfetto.dev.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        events = [{'name': span.name, 'cat': span.category, 'ph': 'X', 'pid': os.getpid(), 'tid': span.lane,
+                   'ts': round((span.start - self.origin) * 1e6), 'dur': round(span.duration * 1e6),
+                   'args': span.args}
+                  for span in sorted(spans, key=lambda span: span.start)]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, trace_file: str) -> None:
+        with open(trace_file, 'w') as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+
+def command_name(commands: list) -> str:
+    """Short name of a command for the breakdown: the program and its first two subcommands, without options.
+    """
+    words = [os.path.basename(str(commands[0]))] if commands else []
+    skip = False
+    for word in map(str, commands[1:]):
+        if skip:
+            skip = False
+        elif word == '--' or len(words) == 3:
+            break
+        elif word.startswith('-'):
+            skip = word in VALUE_OPTIONS
+        else:
+            words.append(word)
+    return ' '.join(words)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Return the tracer shared by all the dp commands, disabled until `enable` is called.
+    """
+    return _tracer
+
+
+def enable() -> Tracer:
+    _tracer.enabled = True
+    return _tracer